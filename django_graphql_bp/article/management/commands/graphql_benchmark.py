@@ -0,0 +1,135 @@
+import django
+import json
+import random
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpRequest
+from django.test.utils import override_settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from django_graphql_bp.article.models import Article, ArticleImage
+from django_graphql_bp.graphql.tests.benchmarks import Benchmark
+from django_graphql_bp.user.models import User
+from graphql_relay import offset_to_cursor
+from importlib import import_module
+
+PASSWORD = 'benchmark'
+STAFF_EMAIL = 'benchmark-staff@example.com'
+WORDS = ['api', 'boilerplate', 'cache', 'django', 'graphene', 'graphql', 'index', 'mutation', 'node', 'postgres',
+         'query', 'relay', 'schema', 'search', 'storage', 'user']
+
+NODE = '{ pk title }'
+OPERATIONS = [
+    ('articles_first_page', 'query { articles(first: 20) { edges { node %s } } }' % NODE, None),
+    ('articles_deep_offset',
+     'query ($after: String) { articles(first: 20, after: $after) { edges { node %s } } }' % NODE, 'deep_offset'),
+    ('articles_search', 'query { articles(first: 20, query: "graphql postgres") { edges { node %s } } }' % NODE, None),
+    ('articles_total_count', 'query { articles(first: 20) { totalCount edges { node { pk } } } }', None),
+    ('articles_nested',
+     'query { articles(first: 20) { edges { node { pk author { pk name } images { edges { node { pk } } } } } } }',
+     None),
+    ('create_article', 'mutation { createArticle(input: {content: "benchmark", title: "Benchmark"}) { ok } }', 'staff'),
+    ('update_article', 'mutation ($pk: Int!) { updateArticle(input: {pk: $pk, title: "Benchmark updated"}) { ok } }',
+     'staff'),
+    ('login_user', 'mutation ($email: String!) { loginUser(input: {email: $email, password: "%s"}) { ok } }' % PASSWORD,
+     'login'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Seeds test database with users, articles and images at given scales, measures GraphQL operations and ' \
+           'prints results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', action='append', dest='scales', type=int,
+                            help='Number of articles, can be repeated, e.g. --scale 1000 --scale 100000.')
+        parser.add_argument('--repeat', default=5, type=int, help='Number of measured runs of every operation.')
+        parser.add_argument('--batch-size', default=5000, type=int, help='Number of rows inserted with one query.')
+        parser.add_argument('--keepdb', action='store_true', help='Keep seeded test database for next runs.')
+        parser.add_argument('--output', help='File to write JSON to instead of standard output.')
+
+    def handle(self, *args, **options):
+        scales = sorted(options['scales'] or [1000])
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        report = {'database': connection.vendor, 'django': django.get_version(), 'scales': []}
+
+        try:
+            benchmark = Benchmark(import_string(settings.GRAPHENE['SCHEMA']), max(options['repeat'], 1))
+
+            # login is repeated with the same email, throttles would reject it instead of measuring password hashing
+            with override_settings(GRAPHQL_THROTTLING=False):
+                for scale in scales:
+                    self.seed(scale, options['batch_size'])
+                    report['scales'].append({'scale': scale, 'operations': self.run_operations(benchmark, scale)})
+        finally:
+            if not options['keepdb']:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        output = json.dumps(report, indent=2, sort_keys=True)
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def get_context(self, user=None) -> HttpRequest:
+        context = HttpRequest()
+        context.FILES = {}
+        context.session = import_module(settings.SESSION_ENGINE).SessionStore(None)
+        context.user = AnonymousUser() if user is None else user
+        return context
+
+    def run_operations(self, benchmark: Benchmark, scale: int) -> [dict]:
+        staff = User.objects.get(email=STAFF_EMAIL)
+        article = Article.objects.order_by('pk').first()
+        results = []
+
+        for name, operation, kind in OPERATIONS:
+            context_factory = self.get_context
+            variables = None
+
+            if kind == 'deep_offset':
+                variables = {'after': offset_to_cursor(max(scale - 21, 0))}
+            elif kind == 'staff':
+                context_factory = lambda: self.get_context(staff)
+                variables = {'pk': article.pk} if name == 'update_article' else None
+            elif kind == 'login':
+                variables = {'email': STAFF_EMAIL}
+
+            results.append(benchmark.run(name, operation, context_factory, variables, scale=scale))
+
+        return results
+
+    def seed(self, scale: int, batch_size: int):
+        """ Inserts missing rows up to scale: one user per 100 articles (at least 10) and one image per article """
+        password = make_password(PASSWORD)
+
+        if not User.objects.filter(email=STAFF_EMAIL).exists():
+            User.objects.create_user(STAFF_EMAIL, PASSWORD, is_staff=True, name='Benchmark staff')
+
+        users_count = User.objects.filter(email__startswith='benchmark-user-').count()
+        User.objects.bulk_create([
+            User(email='benchmark-user-{}@example.com'.format(index), name='Benchmark user {}'.format(index),
+                 password=password)
+            for index in range(users_count, max(scale // 100, 10))
+        ], batch_size)
+        authors = list(User.objects.filter(email__startswith='benchmark-user-').values_list('pk', flat=True))
+        now = timezone.now()
+
+        for start in range(Article.objects.count(), scale, batch_size):
+            articles = []
+
+            for index in range(start, min(start + batch_size, scale)):
+                words = random.Random(index).choices(WORDS, k=60)
+                articles.append(Article(
+                    author_id=authors[index % len(authors)], content=' '.join(words), pub_date=now,
+                    slug='benchmark-article-{}'.format(index), subtitle=' '.join(words[:8]),
+                    title='Benchmark article {} {}'.format(index, ' '.join(words[:3]))))
+
+            Article.objects.bulk_create(articles)
+            ArticleImage.objects.bulk_create(
+                [ArticleImage(article=article, image='benchmark/{}.png'.format(article.slug)) for article in articles])
@@ -1,5 +1,8 @@
-from autoslug import AutoSlugField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+import re
 from django.db import models
+from django.db.models import Q
 from django.template.defaultfilters import slugify
 from django.utils import timezone
 from uuid_upload_path import upload_to
@@ -12,24 +15,128 @@ class Article(models.Model):
     is_active = models.BooleanField(default=True)
     last_modified = models.DateTimeField(auto_now=True)
     pub_date = models.DateTimeField(null=True)
-    slug = AutoSlugField(always_update=True, populate_from='title', unique=True, unique_with='title')
+    # filled by database trigger, see django_graphql_bp.core.search.SearchVectorTrigger
+    search_vector = SearchVectorField(editable=False, null=True)
+    slug = models.SlugField(editable=False, max_length=255, unique=True)
     subtitle = models.CharField(blank=True, max_length=255)
     title = models.CharField(max_length=255)
 
+    class Meta:
+        indexes = [GinIndex(fields=['search_vector'], name='article_search_vector_gin')]
+
     def __init__(self, *args, **kwargs):
         super(Article, self).__init__(*args, **kwargs)
-        self.__init_is_active = self.is_active
+        self.set_initial_values()
+
+    @classmethod
+    def get_unique_slugs(cls, titles: [str], exclude_pks: list = ()) -> [str]:
+        """
+        Returns unique slug for each title with one query of slugs equal to the same base or to base with "-<index>"
+        suffix. Slugs are also unique among given titles, so instances of bulk_create get different slugs. Concurrent
+        saves of the same slug are not retried, the unique index rejects them with IntegrityError.
+        """
+        if not titles:
+            return []
+
+        # leaves room for "-<index>" suffix
+        max_length = cls._meta.get_field('slug').max_length - 10
+        bases = [slugify(title)[:max_length].strip('-') or cls._meta.model_name for title in titles]
+        condition = Q()
+
+        for base in set(bases):
+            # prefix lookup uses index of slug, other slugs starting with base (e.g. "base-title") are not loaded
+            condition |= Q(slug__startswith=base, slug__regex=r'^{}(-[0-9]+)?$'.format(re.escape(base)))
+
+        taken = set(cls._base_manager.filter(condition).exclude(pk__in=exclude_pks).values_list('slug', flat=True))
+        slugs = []
+
+        for base in bases:
+            slug = base
+            index = 1
+
+            while slug in taken:
+                index += 1
+                slug = '{}-{}'.format(base, index)
+
+            taken.add(slug)
+            slugs.append(slug)
+
+        return slugs
+
+    def is_slug_outdated(self) -> bool:
+        if not self.pk or ('slug' not in self.get_deferred_fields() and not self.slug):
+            return True
+
+        return 'title' not in self.get_deferred_fields() and self.title != self.__init_title
+
+    @classmethod
+    def prepare_bulk_save(cls, instances: ['Article']):
+        """ Prepares instances for bulk_create or bulk_update, slugs of all of them are generated with one query """
+        outdated = [instance for instance in instances if instance.is_slug_outdated()]
+        slugs = cls.get_unique_slugs(
+            [instance.title for instance in outdated], [instance.pk for instance in outdated if instance.pk])
+
+        for instance, slug in zip(outdated, slugs):
+            instance.slug = slug
+
+        cls.prepare_pub_dates(instances)
+
+    @classmethod
+    def prepare_pub_dates(cls, instances: ['Article']):
+        """
+        Sets pub_date of new or activated instances. If is_active was deferred on load and has been set since then,
+        initial values are read with one query.
+        """
+        changed = [instance for instance in instances if 'is_active' not in instance.get_deferred_fields()]
+        unknown_pks = [instance.pk for instance in changed
+                       if instance.pk and instance.__init_is_active is None and instance.is_active]
+        inactive_pks = set(cls._base_manager.filter(pk__in=unknown_pks, is_active=False).values_list(
+            'pk', flat=True)) if unknown_pks else set()
+
+        for instance in changed:
+            if instance.is_active and (not instance.pk or instance.__init_is_active is False or
+                                       instance.pk in inactive_pks):
+                instance.pub_date = timezone.now()
+
+    def prepare_save(self):
+        """ Sets fields calculated on save, slug is generated only for new instance or changed title """
+        if self.is_slug_outdated():
+            self.slug = self.get_unique_slugs([self.title], [self.pk] if self.pk else [])[0]
+
+        self.prepare_pub_dates([self])
 
     def save(self, *args: tuple, **kwargs: dict):
-        self.slug = slugify(self.title)
+        # deferred fields are not read, they are written only if they are set on save
+        pub_date = self.__dict__.get('pub_date')
+        slug = self.__dict__.get('slug')
+        self.prepare_save()
+
+        if kwargs.get('update_fields') is not None:
+            # fields calculated on save are written along with fields they depend on
+            update_fields = set(kwargs['update_fields'])
+
+            if self.__dict__.get('slug') != slug:
+                update_fields.add('slug')
 
-        if self.is_active and (not self.__init_is_active or not self.pk):
-            self.pub_date = timezone.now()
+            if self.__dict__.get('pub_date') != pub_date:
+                update_fields.add('pub_date')
+
+            kwargs['update_fields'] = update_fields
 
         super(Article, self).save(*args, **kwargs)
+        self.set_initial_values()
+
+    def set_initial_values(self):
+        # deferred field (e.g. loaded with only()) is not read to avoid query per instance
+        deferred_fields = self.get_deferred_fields()
+        self.__init_is_active = None if 'is_active' in deferred_fields else self.is_active
+        self.__init_title = None if 'title' in deferred_fields else self.title
 
 
 class ArticleImage(models.Model):
     article = models.ForeignKey('article.Article', on_delete=models.SET_NULL, null=True, related_name='images')
-    image = models.ImageField(upload_to=upload_to)
+    # one file is not attached to several images, see MutationConfirmUpload
+    image = models.ImageField(unique=True, upload_to=upload_to)
+    # width of original image, set when renditions are generated, see core.renditions
+    image_width = models.PositiveIntegerField(editable=False, null=True)
     is_featured = models.BooleanField(default=False)
\ No newline at end of file
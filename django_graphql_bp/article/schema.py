@@ -1,26 +1,45 @@
 import graphene
 from django import forms
-from django_graphql_bp.graphql.operations import connections, fields, interfaces, mutations
+from django.conf import settings
+from django_graphql_bp.graphql.operations import connections, fields, interfaces, loaders, mutations
 from django_graphql_bp.article.forms import ArticleForm, ArticleImageForm
 from django_graphql_bp.article.models import Article, ArticleImage
-from graphene_django import DjangoObjectType
+from django_graphql_bp.core import renditions as image_renditions
 from graphql.execution.base import ResolveInfo
 
 
-class ArticleNode(DjangoObjectType):
+class ArticleNode(loaders.DjangoBatchObjectType):
     class Meta:
         connection_class = connections.CountableConnection
+        exclude_fields = ['search_vector']
         filter_fields = ['is_active', 'slug']
         interfaces = (graphene.relay.Node, interfaces.DjangoPkInterface)
         model = Article
 
 
-class ArticleImageNode(DjangoObjectType):
+class ImageRenditionType(graphene.ObjectType):
+    name = graphene.String()
+    url = graphene.String()
+    width = graphene.Int()
+
+
+class ArticleImageNode(loaders.DjangoBatchObjectType):
+    renditions = graphene.List(ImageRenditionType)
+    srcset = graphene.String()
+
+    field_dependencies = {'renditions': ('image', 'image_width'), 'srcset': ('image', 'image_width')}
+
     class Meta:
         filter_fields = ['id']
         interfaces = (graphene.relay.Node, interfaces.DjangoPkInterface)
         model = ArticleImage
 
+    def resolve_renditions(self, info: ResolveInfo, **input: dict) -> [image_renditions.Rendition]:
+        return image_renditions.get_file_renditions(self.image)
+
+    def resolve_srcset(self, info: ResolveInfo, **input: dict) -> str:
+        return image_renditions.get_srcset(self.image)
+
 
 class ArticleInput:
     content = graphene.String()
@@ -34,6 +53,53 @@ class ArticleImageInput:
     is_featured = graphene.Boolean()
 
 
+class ArticleItemInput(ArticleInput, graphene.InputObjectType):
+    pass
+
+
+class ArticleUpdateItemInput(ArticleInput, graphene.InputObjectType):
+    pk = graphene.Int(required=True)
+
+
+class ArticleImageItemInput(ArticleImageInput, graphene.InputObjectType):
+    pass
+
+
+class ArticleImageUpdateItemInput(ArticleImageInput, graphene.InputObjectType):
+    pk = graphene.Int(required=True)
+
+
+class ArticleImageRenditions:
+    """ Generates renditions of created or changed image after commit """
+    @classmethod
+    def after_save(cls, info: ResolveInfo, input: dict, form: forms.ModelForm):
+        if cls.is_create or 'image' in form.changed_data:
+            image_renditions.schedule(form.instance.image)
+
+        return super(ArticleImageRenditions, cls).after_save(info, input, form)
+
+
+class ArticleImageBulkRenditions:
+    """ Generates renditions of created or changed images of bulk mutation after commit """
+    @classmethod
+    def save(cls, info: ResolveInfo, input: dict, forms_list: [forms.ModelForm]) -> [ArticleImage]:
+        instances = super(ArticleImageBulkRenditions, cls).save(info, input, forms_list)
+
+        for form in forms_list:
+            if cls.is_create or 'image' in form.changed_data:
+                image_renditions.schedule(form.instance.image)
+
+        return instances
+
+
+class ArticleBulkSave:
+    """ Generates slugs of bulk mutation with one query """
+    @classmethod
+    def save(cls, info: ResolveInfo, input: dict, forms_list: [forms.ModelForm]) -> [Article]:
+        Article.prepare_bulk_save([form.instance for form in forms_list])
+        return super(ArticleBulkSave, cls).save(info, input, forms_list)
+
+
 class CreateArticle(mutations.MutationAccess, mutations.MutationCreate, graphene.relay.ClientIDMutation):
     form = ArticleForm
     node = graphene.Field(ArticleNode)
@@ -66,7 +132,8 @@ class DeleteArticle(mutations.MutationAccess, mutations.MutationDelete, graphene
         pk = graphene.Int(required=True)
 
 
-class CreateArticleImage(mutations.MutationAccess, mutations.MutationCreate, graphene.relay.ClientIDMutation):
+class CreateArticleImage(ArticleImageRenditions, mutations.MutationAccess, mutations.MutationCreate,
+                         graphene.relay.ClientIDMutation):
     form = ArticleImageForm
     is_create = True
     node = graphene.Field(ArticleImageNode)
@@ -75,7 +142,8 @@ class CreateArticleImage(mutations.MutationAccess, mutations.MutationCreate, gra
         pass
 
 
-class UpdateArticleImage(mutations.MutationAccess, mutations.MutationUpdate, graphene.relay.ClientIDMutation):
+class UpdateArticleImage(ArticleImageRenditions, mutations.MutationAccess, mutations.MutationUpdate,
+                         graphene.relay.ClientIDMutation):
     form = ArticleImageForm
     is_update = True
     model = ArticleImage
@@ -94,8 +162,115 @@ class DeleteArticleImage(mutations.MutationAccess, mutations.MutationDelete, gra
         pk = graphene.Int(required=True)
 
 
+class RequestArticleImageUpload(mutations.MutationAccess, mutations.MutationRequestUpload,
+                                graphene.relay.ClientIDMutation):
+    allowed_extension = ['gif', 'jpeg', 'jpg', 'png', 'webp']
+    field = 'image'
+    is_create = True
+    max_size = getattr(settings, 'ARTICLE_IMAGE_MAX_SIZE', None)
+    model = ArticleImage
+
+    class Input:
+        content_type = graphene.String()
+        filename = graphene.String(required=True)
+
+
+class ConfirmArticleImageUpload(ArticleImageRenditions, mutations.MutationAccess, mutations.MutationConfirmUpload,
+                                graphene.relay.ClientIDMutation):
+    field = 'image'
+    form = ArticleImageForm
+    is_create = True
+    node = graphene.Field(ArticleImageNode)
+
+    class Input(ArticleImageInput):
+        key = graphene.String(required=True)
+
+
+class CreateArticles(ArticleBulkSave, mutations.MutationAccess, mutations.MutationBulkCreate,
+                     graphene.relay.ClientIDMutation):
+    form = ArticleForm
+    nodes = graphene.List(ArticleNode)
+
+    class Input:
+        items = graphene.List(ArticleItemInput, required=True)
+
+    @classmethod
+    def get_form(cls, info: ResolveInfo, input: dict, item: dict, index: int, instance: Article = None):
+        item.update({'author': info.context.user.pk})
+        return super(CreateArticles, cls).get_form(info, input, item, index, instance)
+
+
+class UpdateArticles(ArticleBulkSave, mutations.MutationAccess, mutations.MutationBulkUpdate,
+                     graphene.relay.ClientIDMutation):
+    form = ArticleForm
+    is_update = True
+    model = Article
+    nodes = graphene.List(ArticleNode)
+
+    class Input:
+        items = graphene.List(ArticleUpdateItemInput, required=True)
+
+    @classmethod
+    def get_update_fields(cls, input: dict, forms_list: [forms.ModelForm]) -> [str]:
+        """ Fields calculated on save are written along with submitted fields they depend on """
+        fields = set(super(UpdateArticles, cls).get_update_fields(input, forms_list))
+
+        if 'title' in fields:
+            fields.add('slug')
+
+        if 'is_active' in fields:
+            fields.add('pub_date')
+
+        return sorted(fields)
+
+
+class DeleteArticles(mutations.MutationAccess, mutations.MutationBulkDelete, graphene.relay.ClientIDMutation):
+    is_delete = True
+    model = Article
+
+    class Input:
+        pks = graphene.List(graphene.Int, required=True)
+
+
+class CreateArticleImages(ArticleImageBulkRenditions, mutations.MutationAccess, mutations.MutationBulkCreate,
+                          graphene.relay.ClientIDMutation):
+    form = ArticleImageForm
+    is_create = True
+    nodes = graphene.List(ArticleImageNode)
+
+    class Input:
+        items = graphene.List(ArticleImageItemInput, required=True)
+
+
+class UpdateArticleImages(ArticleImageBulkRenditions, mutations.MutationAccess, mutations.MutationBulkUpdate,
+                          graphene.relay.ClientIDMutation):
+    form = ArticleImageForm
+    is_update = True
+    model = ArticleImage
+    nodes = graphene.List(ArticleImageNode)
+
+    class Input:
+        items = graphene.List(ArticleImageUpdateItemInput, required=True)
+
+
+class DeleteArticleImages(mutations.MutationAccess, mutations.MutationBulkDelete, graphene.relay.ClientIDMutation):
+    is_delete = True
+    model = ArticleImage
+
+    class Input:
+        pks = graphene.List(graphene.Int, required=True)
+
+
+class ArticleSearchVector(fields.ConnectionSearchVector):
+    search_field = 'search_vector'
+    vector = {'title': 'A', 'subtitle': 'B', 'content': 'C'}
+
+
 class Query:
-    articles = fields.SearchConnectionField(ArticleNode, pk=graphene.Int(), sort=graphene.Argument(graphene.String))
+    articles = fields.SearchConnectionField(
+        ArticleNode, cache_models=(ArticleImage,), cache_timeout=getattr(settings, 'ARTICLES_CACHE_TIMEOUT', None),
+        search_vector_class=ArticleSearchVector, pk=graphene.Int(), query=graphene.String(),
+        sort=graphene.Argument(graphene.String))
 
 
 class Mutation:
@@ -106,3 +281,14 @@ class Mutation:
     create_article_image = CreateArticleImage.Field()
     update_article_image = UpdateArticleImage.Field()
     delete_article_image = DeleteArticleImage.Field()
+
+    request_article_image_upload = RequestArticleImageUpload.Field()
+    confirm_article_image_upload = ConfirmArticleImageUpload.Field()
+
+    create_articles = CreateArticles.Field()
+    update_articles = UpdateArticles.Field()
+    delete_articles = DeleteArticles.Field()
+
+    create_article_images = CreateArticleImages.Field()
+    update_article_images = UpdateArticleImages.Field()
+    delete_article_images = DeleteArticleImages.Field()
@@ -1,7 +1,48 @@
+import graphene
+import hashlib
+import json
+import re
 from django.contrib.auth.models import AnonymousUser
+from django.contrib.postgres.search import SearchVectorField
+from django.core import signing
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection, models, transaction
+from django.db.backends.utils import CursorWrapper
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext, isolate_apps
+from django.utils import timezone
+from django_graphql_bp.article.schema import ArticleNode, ArticleSearchVector, ConfirmArticleImageUpload, Query, \
+    UpdateArticles
+from django_graphql_bp.core import renditions
+from django_graphql_bp.core.models import SoftDeleteIndex, SoftDeleteManager, SoftDeleteModel
+from django_graphql_bp.core.search import SearchVectorTrigger
+from django_graphql_bp.core.storages import S3MediaStorage
+from django_graphql_bp.graphql import cache, tracing
+from django_graphql_bp.graphql.backends import GraphQLCachedBackend, get_backend
+from django_graphql_bp.graphql.operations import connections, fields, loaders, policies
+from django_graphql_bp.graphql.tests.benchmarks import Benchmark
+from django_graphql_bp.graphql.views import GraphQLView, MetricsView
 from django_graphql_bp.graphql.tests import constructors, cases
+from django_graphql_bp.user.models import User
 from django_graphql_bp.user.tests import UserTestCase
 from django_graphql_bp.article.models import Article, ArticleImage
+from graphene.test import Client
+from graphql import parse
+from io import BytesIO
+from PIL import Image
+from storages.backends.s3boto3 import S3Boto3Storage
+from unittest import mock, skipIf
+
+try:
+    import boto3
+
+    try:
+        from moto import mock_aws
+    except ImportError:  # moto < 5
+        from moto import mock_s3 as mock_aws
+except ImportError:
+    mock_aws = None
 
 
 class _BaseArticleTestCase(UserTestCase):
@@ -19,6 +60,72 @@ class ArticleImageTestCase(_BaseArticleTestCase):
     model_class = ArticleImage
 
 
+class ArticleSlugTestCase(ArticleTestCase):
+    def test_slug_collision(self):
+        with CaptureQueriesContext(connection) as queries:
+            article = Article.objects.create(author=self.user, content='article', title='Article')
+
+        self.assertEqual(article.slug, 'article-2', 'Check if slug is unique')
+        self.assertEqual(
+            len([query for query in queries if query['sql'].startswith('SELECT')]), 1,
+            'Check if collisions are resolved with one query')
+
+    def test_slug_concurrent_save(self):
+        # slug "article" is generated before concurrent save of self.article takes it
+        with mock.patch.object(Article, 'get_unique_slugs', return_value=['article']):
+            with self.assertRaises(IntegrityError, msg='Check if slug taken concurrently is rejected by unique index'):
+                with transaction.atomic():
+                    Article.objects.create(author=self.user, content='article', title='Article')
+
+    def test_slug_suffix(self):
+        Article.objects.create(author=self.user, content='article', title='Article 3')
+        Article.objects.create(author=self.user, content='article', title='Article Title')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(Article.get_unique_slugs(['Article', 'Article']), ['article-2', 'article-4'])
+
+        self.assertIn('~', queries[0]['sql'], 'Check if only slugs with "-<index>" suffix are loaded')
+
+    def test_slug_empty_titles(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(Article.get_unique_slugs([]), [], 'Check if slugs are not queried without titles')
+
+    def test_slug_not_changed_title(self):
+        self.article.content = 'ArticleSlugTestCase'
+
+        with CaptureQueriesContext(connection) as queries:
+            self.article.save()
+
+        self.assertEqual(len(queries), 1, 'Check if slug is not generated if title has not been changed')
+        self.article.title = 'ArticleSlugTestCase'
+        self.article.save()
+        self.assertEqual(self.article.slug, 'articleslugtestcase', 'Check if slug is generated for changed title')
+
+    def test_slug_bulk(self):
+        articles = [Article(author=self.user, content='article', title='article') for _ in range(3)]
+        Article.prepare_bulk_save(articles)
+        self.assertEqual(
+            [article.slug for article in articles], ['article-2', 'article-3', 'article-4'],
+            'Check if slugs are unique within batch')
+
+    def test_pub_date_deferred_is_active(self):
+        Article.objects.filter(pk=self.article.pk).update(is_active=False, pub_date=None)
+        article = Article.objects.only('title').get(pk=self.article.pk)
+        article.is_active = True
+
+        with self.assertNumQueries(2):
+            article.save()
+
+        self.assertIsNotNone(article.pub_date, 'Check if pub_date is set if deferred is_active has been set')
+        pub_date = article.pub_date
+        article = Article.objects.only('title').get(pk=self.article.pk)
+        article.is_active = True
+        article.save()
+        self.assertEqual(
+            Article.objects.get(pk=self.article.pk).pub_date, pub_date,
+            'Check if pub_date is not changed if article has already been active')
+
+
 class CreateArticleTestCase(ArticleTestCase, cases.MutationTestCase):
     def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
         return constructors.Mutation('createArticle', {'ok': '', 'validationErrors': ''}, {
@@ -56,6 +163,18 @@ class UpdateArticleTestCase(ArticleTestCase, cases.MutationTestCase):
     def test_update_article_by_staff(self):
         self.update_success_test(self.article, 'title', self.get_context_value(self.staff))
 
+    def test_update_article_writes_submitted_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assert_success(self.get_mutation_result(self.get_context_value(self.staff), {}))
+
+        updates = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1, 'Check if article has been updated with one query')
+        self.assertIn('"title"', updates[0], 'Check if submitted column has been written')
+        self.assertNotIn('"content"', updates[0], 'Check if not submitted column has not been written')
+        self.assertTrue(
+            any(query['sql'].endswith('FOR UPDATE OF "article_article"') for query in queries),
+            'Check if article is locked until it is written')
+
 
 class DeleteArticleTestCase(ArticleTestCase, cases.MutationTestCase):
     def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
@@ -72,6 +191,110 @@ class DeleteArticleTestCase(ArticleTestCase, cases.MutationTestCase):
         self.delete_success_test(self.get_context_value(self.staff))
 
 
+class CreateArticlesTestCase(ArticleTestCase, cases.MutationTestCase):
+    def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
+        return constructors.Mutation('createArticles', {'ok': '', 'validationErrors': ''}, {
+            'items': kwargs.get('items', [
+                {'content': 'CreateArticlesTestCase', 'title': 'CreateArticlesTestCase 1'},
+                {'content': 'CreateArticlesTestCase', 'title': 'CreateArticlesTestCase 2'}
+            ])
+        })
+
+    def test_create_articles_by_not_staff(self):
+        self.create_raised_error_test(self.get_forbidden_access_message(), self.get_context_value(self.user))
+
+    def test_create_articles_by_staff(self):
+        count = Article.objects.count()
+
+        with CaptureQueriesContext(connection) as queries:
+            result = self.get_mutation_result(self.get_context_value(self.staff), {})
+
+        self.assert_success(result)
+        self.assertEqual(Article.objects.count(), count + 2, 'Check if articles have been created')
+        self.assertEqual(
+            len([query for query in queries if query['sql'].startswith('INSERT')]), 1,
+            'Check if articles have been created with one query')
+
+    def test_create_articles_validation_errors(self):
+        count = Article.objects.count()
+        result = self.get_mutation_result(self.get_context_value(self.staff), {'items': [
+            {'content': 'CreateArticlesTestCase', 'title': 'CreateArticlesTestCase'},
+            {'content': 'CreateArticlesTestCase'}
+        ]})
+        errors = self.get_operation_field_value(result, 'createArticles', 'validationErrors')
+        self.assertIsNone(errors[0], 'Check if valid item has no validation errors')
+        self.assertIn('title', json.loads(errors[1]), 'Check if invalid item has validation errors')
+        self.assertEqual(Article.objects.count(), count, 'Check if articles have not been created')
+
+
+class UpdateArticlesTestCase(ArticleTestCase, cases.MutationTestCase):
+    def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
+        return constructors.Mutation('updateArticles', {'ok': '', 'validationErrors': ''}, {
+            'items': kwargs.get('items', [{'pk': self.article.pk, 'title': 'UpdateArticlesTestCase'}])
+        })
+
+    def test_update_articles_by_not_staff(self):
+        self.update_raised_error_test(
+            self.article, 'title', self.get_forbidden_access_message(), self.get_context_value(self.user))
+
+    def test_update_articles_by_staff(self):
+        self.update_success_test(self.article, 'title', self.get_context_value(self.staff))
+        self.assertEqual(
+            Article.objects.get(pk=self.article.pk).content, self.article.content,
+            'Check if not submitted fields have not been updated')
+
+    def test_update_articles_writes_submitted_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assert_success(self.get_mutation_result(self.get_context_value(self.staff), {
+                'items': [{'pk': self.article.pk, 'content': 'UpdateArticlesTestCase'}]}))
+
+        update = [query['sql'] for query in queries if query['sql'].startswith('UPDATE')][0]
+        self.assertIn('"content"', update, 'Check if submitted column is written')
+        self.assertNotIn('"slug"', update, 'Check if slug is not written if title has not been submitted')
+        self.assertNotIn('"pub_date"', update, 'Check if pub_date is not written if is_active has not been submitted')
+
+    def test_update_articles_duplicate_pks(self):
+        result = self.get_mutation_result(self.get_context_value(self.staff), {'items': [
+            {'pk': self.article.pk, 'title': 'UpdateArticlesTestCase 1'},
+            {'pk': self.article.pk, 'title': 'UpdateArticlesTestCase 2'}
+        ]})
+        self.assertFalse(self.get_operation_field_value(result, 'updateArticles', 'ok'))
+        self.assertTrue(
+            all(self.get_operation_field_value(result, 'updateArticles', 'validationErrors')),
+            'Check if items with the same pk have validation errors')
+        self.assertEqual(Article.objects.get(pk=self.article.pk).title, self.article.title)
+
+    def test_update_articles_not_available_by_policy(self):
+        article = Article.objects.create(author=self.staff, content='article', title='article')
+
+        with mock.patch.object(UpdateArticles, 'policy', policies.OwnerPolicy('author')):
+            self.assert_raised_error(
+                self.get_mutation_result(self.get_context_value(self.user), {'items': [
+                    {'pk': self.article.pk, 'title': 'UpdateArticlesTestCase'},
+                    {'pk': article.pk, 'title': 'UpdateArticlesTestCase'}
+                ]}), self.get_forbidden_access_message())
+
+        self.assertEqual(
+            Article.objects.get(pk=self.article.pk).title, self.article.title,
+            'Check if available article has not been updated either')
+
+
+class DeleteArticlesTestCase(ArticleTestCase, cases.MutationTestCase):
+    def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
+        return constructors.Mutation('deleteArticles', {'ok': ''}, {'pks': kwargs.get('pks', [self.article.pk])})
+
+    def test_delete_articles_by_not_staff(self):
+        self.delete_raised_error_test(self.get_forbidden_access_message(), self.get_context_value(self.user))
+
+    def test_delete_articles_by_staff(self):
+        self.delete_success_test(self.get_context_value(self.staff))
+
+    def test_delete_articles_not_existing(self):
+        result = self.get_mutation_result(self.get_context_value(self.staff), {'pks': [self.article.pk, 0]})
+        self.assert_raised_error(result, 'Article matching query does not exist.')
+        self.assertTrue(Article.objects.filter(pk=self.article.pk).exists(), 'Check if no article has been deleted')
+
+
 class CreateArticleImageTestCase(ArticleImageTestCase, cases.MutationTestCase):
     def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
         return constructors.Mutation(
@@ -90,6 +313,20 @@ class CreateArticleImageTestCase(ArticleImageTestCase, cases.MutationTestCase):
         self.create_success_test(self.get_context_value(self.staff, {'image': 'test.png'}))
 
 
+class CreateArticleImagesTestCase(ArticleImageTestCase, cases.MutationTestCase):
+    def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
+        return constructors.Mutation(
+            'createArticleImages', {'ok': '', 'validationErrors': ''}, {'items': [{'article': self.article.pk}]})
+
+    def test_create_article_images_renditions(self):
+        with mock.patch('django_graphql_bp.article.schema.image_renditions.schedule') as schedule:
+            result = self.get_mutation_result(
+                self.get_context_value(self.staff, {'image.0.originFileObj': 'test.png'}), {})
+
+        self.assert_success(result)
+        self.assertEqual(schedule.call_count, 1, 'Check if renditions of created image have been scheduled')
+
+
 class UpdateArticleImageTestCase(ArticleImageTestCase, cases.MutationTestCase):
     def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
         return constructors.Mutation('updateArticleImage', {'ok': '', 'validationErrors': ''}, {
@@ -128,6 +365,175 @@ class DeleteArticleImageTestCase(ArticleImageTestCase, cases.MutationTestCase):
         self.delete_success_test(self.get_context_value(self.staff))
 
 
+@skipIf(mock_aws is None, 'moto is required for direct upload tests')
+@override_settings(AWS_ACCESS_KEY_ID='test', AWS_MEDIA_BUCKET_NAME='test-media', AWS_S3_REGION_NAME='us-east-1',
+                   AWS_SECRET_ACCESS_KEY='test')
+class _BaseArticleImageUploadTestCase(ArticleImageTestCase, cases.MutationTestCase):
+    def setUp(self):
+        super(_BaseArticleImageUploadTestCase, self).setUp()
+        self.s3 = mock_aws()
+        self.s3.start()
+        self.addCleanup(self.s3.stop)
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket='test-media')
+        storage_patch = mock.patch.object(ArticleImage._meta.get_field('image'), 'storage', S3MediaStorage())
+        storage_patch.start()
+        self.addCleanup(storage_patch.stop)
+
+    def get_upload_key(self, name: str) -> str:
+        return signing.dumps(name, salt='django_graphql_bp.upload.article.articleimage.image')
+
+
+class RequestArticleImageUploadTestCase(_BaseArticleImageUploadTestCase):
+    def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
+        return constructors.Mutation(
+            'requestArticleImageUpload', {'ok': '', 'key': '', 'uploadFields': '', 'url': ''},
+            {'filename': kwargs.get('filename', 'test.png')})
+
+    def test_request_article_image_upload_by_not_staff(self):
+        self.assert_raised_error(
+            self.get_mutation_result(self.get_context_value(self.user), {}), self.get_forbidden_access_message())
+
+    def test_request_article_image_upload_by_staff(self):
+        result = self.get_mutation_result(self.get_context_value(self.staff), {})
+        self.assert_success(result)
+        key = self.get_operation_field_value(result, 'requestArticleImageUpload', 'key')
+        fields = json.loads(self.get_operation_field_value(result, 'requestArticleImageUpload', 'uploadFields'))
+        self.assertEqual(fields['key'], signing.loads(key, salt='django_graphql_bp.upload.article.articleimage.image'),
+                         'Check if file is uploaded under signed name')
+        self.assertTrue(fields['key'].endswith('.png'), 'Check if name is generated by upload_to')
+
+
+class ConfirmArticleImageUploadTestCase(_BaseArticleImageUploadTestCase):
+    def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
+        return constructors.Mutation('confirmArticleImageUpload', {'ok': '', 'validationErrors': ''}, {
+            'article': kwargs.get('article', self.article.pk),
+            'key': kwargs.get('key', self.get_upload_key('article/confirm.png'))
+        })
+
+    def test_confirm_article_image_upload_by_staff(self):
+        boto3.client('s3', region_name='us-east-1').put_object(
+            Body=b'image', Bucket='test-media', Key='article/confirm.png')
+        self.create_success_test(self.get_context_value(self.staff))
+        self.assertTrue(
+            ArticleImage.objects.filter(image='article/confirm.png').exists(), 'Check if uploaded file is attached')
+
+    def test_confirm_article_image_upload_not_uploaded(self):
+        count = ArticleImage.objects.count()
+        result = self.get_mutation_result(self.get_context_value(self.staff), {})
+        self.assertFalse(self.get_operation_field_value(result, 'confirmArticleImageUpload', 'ok'))
+        self.assertIn(
+            'image', json.loads(self.get_operation_field_value(result, 'confirmArticleImageUpload', 'validationErrors')),
+            'Check if not uploaded file is rejected')
+        self.assertEqual(ArticleImage.objects.count(), count, 'Check if ArticleImage has not been created')
+
+    def test_confirm_article_image_upload_confirmed_key(self):
+        boto3.client('s3', region_name='us-east-1').put_object(
+            Body=b'image', Bucket='test-media', Key='article/confirm.png')
+        self.get_mutation_result(self.get_context_value(self.staff), {})
+        result = self.get_mutation_result(self.get_context_value(self.staff), {})
+        self.assertFalse(self.get_operation_field_value(result, 'confirmArticleImageUpload', 'ok'))
+        self.assertEqual(
+            ArticleImage.objects.filter(image='article/confirm.png').count(), 1, 'Check if key is accepted once')
+
+    def test_confirm_article_image_upload_concurrent_confirm(self):
+        boto3.client('s3', region_name='us-east-1').put_object(
+            Body=b'image', Bucket='test-media', Key='article/confirm.png')
+
+        def before_save(info, input: dict, form) -> bool:
+            # concurrent confirm of the same key inserts image after checks of this one
+            ArticleImage.objects.create(article=self.article, image='article/confirm.png')
+            return True
+
+        with mock.patch.object(ConfirmArticleImageUpload, 'before_save', side_effect=before_save):
+            result = self.get_mutation_result(self.get_context_value(self.staff), {})
+
+        self.assertIn(
+            'image', json.loads(self.get_operation_field_value(result, 'confirmArticleImageUpload', 'validationErrors')),
+            'Check if key confirmed concurrently is rejected by unique index')
+        self.assertEqual(ArticleImage.objects.filter(image='article/confirm.png').count(), 1)
+
+    def test_confirm_article_image_upload_invalid_key(self):
+        self.create_raised_error_test(
+            'Upload key is invalid or expired.', self.get_context_value(self.staff), {'key': 'article/confirm.png'})
+
+
+class S3MediaStorageTestCase(_BaseArticleImageUploadTestCase):
+    def test_shared_client(self):
+        self.assertIs(
+            S3MediaStorage().connection.meta.client, S3MediaStorage().connection.meta.client,
+            'Check if storages share client')
+
+    def test_url_cache(self):
+        storage = ArticleImage._meta.get_field('image').storage
+        client = storage.bucket.meta.client
+
+        with mock.patch.object(client, 'generate_presigned_url', wraps=client.generate_presigned_url) as generate:
+            urls = {storage.url('article/{}.png'.format(index % 2)) for index in range(10)}
+
+        self.assertEqual(len(urls), 2, 'Check if URL is generated for every name')
+        self.assertEqual(generate.call_count, 2, 'Check if URLs are cached')
+
+    def test_url_http_method(self):
+        storage = ArticleImage._meta.get_field('image').storage
+
+        with mock.patch.object(S3Boto3Storage, 'url', return_value='url') as url:
+            storage.url('article/0.png', http_method='PUT')
+            storage.url('article/0.png')
+
+        self.assertEqual(
+            url.call_args_list, [mock.call('article/0.png', None, storage.querystring_expire, 'PUT'),
+                                 mock.call('article/0.png', None, storage.querystring_expire)],
+            'Check if HTTP method is passed through and URLs of methods are cached separately')
+
+
+@override_settings(IMAGE_RENDITIONS={'large': {'width': 1200}, 'thumbnail': {'width': 150}})
+class ArticleImageRenditionsTestCase(ArticleImageTestCase):
+    def setUp(self):
+        super(ArticleImageRenditionsTestCase, self).setUp()
+        content = BytesIO()
+        Image.new('RGB', (800, 400)).save(content, 'PNG')
+        self.article_image.image.save('renditions.png', ContentFile(content.getvalue()))
+        self.names = [renditions.get_rendition_name(self.article_image.image.name, rendition)
+                      for rendition in renditions.get_renditions()]
+
+    def tearDown(self):
+        for name in [self.article_image.image.name] + self.names:
+            self.article_image.image.storage.delete(name)
+
+        super(ArticleImageRenditionsTestCase, self).tearDown()
+
+    def get_width(self, name: str) -> int:
+        with self.article_image.image.storage.open(name) as file:
+            return Image.open(file).width
+
+    def test_process_pool_backend(self):
+        backend = renditions.ProcessPoolBackend()
+
+        try:
+            # models can be resolved in worker only if Django has been set up there
+            self.assertEqual(
+                backend.submit(renditions.get_width_field, ArticleImage, 'image').result(timeout=60), 'image_width',
+                'Check if worker process has set up Django')
+        finally:
+            backend.executor.shutdown()
+
+        self.assertEqual(backend.executor._mp_context.get_start_method(), 'spawn',
+                         'Check if worker does not inherit connections of web server')
+
+    def test_generate_renditions(self):
+        renditions.generate_renditions('article.ArticleImage', 'image', self.article_image.image.name)
+        large, thumbnail = self.names
+        self.assertEqual(self.get_width(thumbnail), 150, 'Check if image has been resized')
+        self.assertEqual(self.get_width(large), 800, 'Check if image has not been upscaled')
+
+    def test_srcset(self):
+        renditions.generate_renditions('article.ArticleImage', 'image', self.article_image.image.name)
+        self.article_image.refresh_from_db()
+        srcset = renditions.get_srcset(self.article_image.image)
+        self.assertTrue(srcset.endswith('.large.png 800w'), 'Check if width of rendition is not upscaled one')
+        self.assertIn('.thumbnail.png 150w', srcset, 'Check if thumbnail is in srcset')
+
+
 class ArticlesTestCase(ArticleTestCase, cases.QueryTestCase):
     def get_query(self) -> constructors.Query:
         return constructors.Query('articles', {
@@ -140,3 +546,488 @@ class ArticlesTestCase(ArticleTestCase, cases.QueryTestCase):
 
     def test_articles(self):
         self.collection_success_test()
+
+    def test_articles_benchmark(self):
+        benchmark = Benchmark(self.get_schema(), repeat=2, warmup=0)
+        result = benchmark.run('articles', self.get_query().get_result(), self.get_context_value, scale=1)
+        self.assertEqual(result['runs'], 2, 'Check if operation has been measured')
+        self.assertGreater(result['queries'], 0, 'Check if queries have been counted')
+        self.assertGreater(result['peak_memory'], 0, 'Check if memory has been traced')
+        self.assertEqual(result['scale'], 1, 'Check if extra attributes are in result')
+
+    def test_articles_cost_limit(self):
+        result = Client(self.get_schema()).execute(
+            self.get_query().get_result(), backend=GraphQLCachedBackend(max_cost=100),
+            context_value=self.get_context_value())
+        self.assert_raised_error(result, 'Query cost 301 exceeds maximum allowed cost 100.')
+
+    def get_related_query_count(self) -> int:
+        query = constructors.Query('articles', {
+            'edges': {
+                'node': {
+                    'author': {
+                        'pk': ''
+                    },
+                    'images': {
+                        'edges': {
+                            'node': {
+                                'pk': ''
+                            }
+                        }
+                    }
+                }
+            }
+        })
+
+        result = self.execute_operation(query, self.get_context_value())
+        self.assert_operation_no_errors(result)
+        return len(self.captured_queries)
+
+    def test_articles_related_batching(self):
+        count = self.get_related_query_count()
+
+        for i in range(5):
+            article = Article.objects.create(author=self.user2, content='article', subtitle='article', title='article')
+            ArticleImage.objects.create(article=article, image='test{}'.format(i))
+
+        self.assertEqual(count, self.get_related_query_count(), 'Check if related objects are loaded in batches')
+        self.assert_no_duplicate_queries(self.captured_queries)
+
+    def test_articles_related_filters(self):
+        Article.objects.create(author=self.user, content='article', is_active=False, title='inactive')
+        Article.objects.create(author=self.user2, content='article', is_active=False, title='inactive')
+        query = '{ users { edges { node { pk articles(isActive: false) { edges { node { title } } } } } } }'
+
+        with CaptureQueriesContext(connection) as context:
+            result = Client(self.get_schema()).execute(query, context_value=self.get_context_value(self.staff))
+
+        self.assert_operation_no_errors(result)
+        self.assertEqual(
+            {edge['node']['pk']: [article['node']['title'] for article in edge['node']['articles']['edges']]
+             for edge in result['data']['users']['edges']},
+            {self.user.pk: ['inactive'], self.user2.pk: ['inactive'], self.staff.pk: []},
+            'Check if related articles are filtered by filterset of connection field')
+        self.assertEqual(
+            len([query for query in context.captured_queries if 'article_article' in query['sql']]), 1,
+            'Check if filtered related articles are loaded in one batch')
+
+    def test_articles_selected_columns(self):
+        query = constructors.Query('articles', {'edges': {'node': {'slug': '', 'title': ''}}})
+
+        with CaptureQueriesContext(connection) as context:
+            result = Client(self.get_schema()).execute(query.get_result(), context_value=self.get_context_value())
+
+        self.assert_operation_no_errors(result)
+        self.assertFalse(
+            any('."content"' in query['sql'] for query in context.captured_queries),
+            'Check if not requested columns are not fetched')
+
+
+class SearchVectorTestCase(TestCase):
+    @isolate_apps('django_graphql_bp.article', kwarg_name='apps')
+    def test_search_vector_trigger(self, apps):
+        class SearchArticle(models.Model):
+            content = models.TextField()
+            search_vector = SearchVectorField(editable=False, null=True)
+            title = models.CharField(max_length=255)
+
+            class Meta:
+                app_label = 'article'
+
+        class SearchArticleVector(fields.ConnectionSearchVector):
+            search_field = 'search_vector'
+            vector = {'title': 'A', 'content': 'B'}
+
+        with connection.schema_editor() as schema_editor:
+            schema_editor.create_model(SearchArticle)
+            SearchVectorTrigger('searcharticle', 'search_vector', SearchArticleVector.vector).database_forwards(
+                'article', schema_editor, None, mock.Mock(apps=apps))
+
+        SearchArticle.objects.bulk_create([
+            SearchArticle(content='graphql', title='content'), SearchArticle(content='article', title='graphql'),
+            SearchArticle(content='article', title='article')])
+        qs = SearchArticleVector.apply('graphql', SearchArticle.objects.all())
+
+        self.assertEqual(
+            list(qs.values_list('title', flat=True)), ['graphql', 'content'],
+            'Check if rows written with bulk_create are found and ordered by rank')
+        self.assertNotIn('to_tsvector', str(qs.query), 'Check if stored search vector is used')
+        SearchArticle.objects.filter(title='article').update(content='graphql')
+        self.assertEqual(qs.count(), 3, 'Check if updated rows are searchable')
+
+
+class KeysetQuery(graphene.ObjectType):
+    articles = fields.SearchConnectionField(
+        ArticleNode, keyset=('-created', '-pk'), search_vector_class=ArticleSearchVector, query=graphene.String(),
+        sort=graphene.Argument(graphene.String))
+
+
+class ArticlesSearchTestCase(ArticleTestCase):
+    def setUp(self):
+        super(ArticlesSearchTestCase, self).setUp()
+        # the latest article has lower rank, so ordering by rank differs from ordering by keyset
+        Article.objects.create(author=self.user, content='article', title='graphql')
+        Article.objects.create(author=self.user, content='graphql', title='content')
+
+    def get_titles(self, schema: graphene.Schema, arguments: str) -> [str]:
+        result = Client(schema).execute(
+            '{ articles(%s) { edges { node { title } } } }' % arguments, context_value=self.get_context_value())
+        self.assert_operation_no_errors(result)
+        return [edge['node']['title'] for edge in result['data']['articles']['edges']]
+
+    def test_articles_search_stored_vector(self):
+        with CaptureQueriesContext(connection) as context:
+            titles = self.get_titles(self.get_schema(), 'query: "graphql"')
+
+        self.assertEqual(titles, ['graphql', 'content'], 'Check if articles are ordered by rank')
+        sql = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertIn('"search_vector" @@', sql, 'Check if stored search vector is used')
+        self.assertNotIn('to_tsvector', sql, 'Check if search vector is not calculated for every row')
+
+    def test_articles_search_keyset_rank(self):
+        schema = graphene.Schema(query=KeysetQuery)
+        self.assertEqual(
+            self.get_titles(schema, 'query: "graphql"'), ['graphql', 'content'],
+            'Check if keyset pagination keeps rank ordering')
+        self.assertEqual(
+            self.get_titles(schema, 'query: "graphql", sort: "-created"'), ['content', 'graphql'],
+            'Check if sort argument overrides rank ordering')
+
+    def test_articles_search_keyset_pages(self):
+        for i in range(3):
+            Article.objects.create(author=self.user, content='graphql', title='content {}'.format(i))
+
+        schema = graphene.Schema(query=KeysetQuery)
+        titles = self.get_titles(schema, 'query: "graphql"')
+        paged_titles = []
+        after = ''
+
+        while True:
+            result = Client(schema).execute(
+                '{ articles(query: "graphql", first: 2%s) { edges { node { title } } pageInfo { endCursor '
+                'hasNextPage } } }' % after, context_value=self.get_context_value())
+            self.assert_operation_no_errors(result)
+            paged_titles += [edge['node']['title'] for edge in result['data']['articles']['edges']]
+
+            if not result['data']['articles']['pageInfo']['hasNextPage']:
+                break
+
+            after = ', after: "{}"'.format(result['data']['articles']['pageInfo']['endCursor'])
+
+        self.assertEqual(len(titles), 5, 'Check if all articles are found')
+        self.assertEqual(paged_titles, titles, 'Check if pages of rows with equal rank are not repeated or skipped')
+
+
+class ArticlesKeysetTestCase(ArticleTestCase):
+    def setUp(self):
+        super(ArticlesKeysetTestCase, self).setUp()
+
+        for i in range(4):
+            Article.objects.create(author=self.user, content='article', title='article {}'.format(i))
+
+        # equal created dates are ordered by pk, the last field of keyset
+        Article.objects.update(created=timezone.now())
+        self.pks = list(Article.objects.order_by('-pk').values_list('pk', flat=True))
+
+    def get_connection(self, arguments: str) -> dict:
+        result = Client(graphene.Schema(query=KeysetQuery)).execute(
+            '{ articles(%s) { edges { cursor node { pk } } pageInfo { hasNextPage hasPreviousPage endCursor } } }' %
+            arguments, context_value=self.get_context_value())
+        self.assert_operation_no_errors(result)
+        return result['data']['articles']
+
+    def get_pks(self, connection: dict) -> [int]:
+        return [edge['node']['pk'] for edge in connection['edges']]
+
+    def test_articles_keyset_forward(self):
+        pks = []
+        connection = self.get_connection('first: 2')
+
+        while True:
+            pks += self.get_pks(connection)
+
+            if not connection['pageInfo']['hasNextPage']:
+                break
+
+            connection = self.get_connection('first: 2, after: "{}"'.format(connection['pageInfo']['endCursor']))
+
+        self.assertEqual(pks, self.pks, 'Check if pages cover all articles once in keyset order')
+
+    def test_articles_keyset_backward(self):
+        cursors = [edge['cursor'] for edge in self.get_connection('first: 5')['edges']]
+        connection = self.get_connection('last: 2, before: "{}"'.format(cursors[3]))
+        self.assertEqual(self.get_pks(connection), self.pks[1:3], 'Check if page before cursor is returned')
+        self.assertTrue(connection['pageInfo']['hasPreviousPage'], 'Check if there are articles before the page')
+
+    def test_articles_keyset_reversed_sort(self):
+        connection = self.get_connection('first: 2, sort: "created"')
+        connection = self.get_connection(
+            'first: 2, sort: "created", after: "{}"'.format(connection['pageInfo']['endCursor']))
+        self.assertEqual(
+            self.get_pks(connection), list(reversed(self.pks))[2:4], 'Check if reversed keyset is paginated')
+
+    def test_articles_keyset_invalid_cursor(self):
+        result = Client(graphene.Schema(query=KeysetQuery)).execute(
+            '{ articles(first: 2, after: "YXJyYXljb25uZWN0aW9uOjE=") { edges { node { pk } } } }',
+            context_value=self.get_context_value())
+        self.assert_raised_error(result, 'Cursor "YXJyYXljb25uZWN0aW9uOjE=" is invalid.')
+
+
+class ArticlesCountTestCase(ArticleTestCase):
+    def setUp(self):
+        super(ArticlesCountTestCase, self).setUp()
+        caches['default'].clear()  # counts cached by other tests
+
+        for i in range(4):
+            Article.objects.create(author=self.user, content='article', title='article {}'.format(i))
+
+    def get_connection(self, strategy: str, **attributes: dict) -> connections.CountableConnection:
+        meta = type('Meta', (), {'node': ArticleNode, 'name': '{}Connection'.format(strategy.title())})
+        connection_class = type('ArticleConnection', (connections.CountableConnection,), dict(
+            attributes, Meta=meta, count_strategy=strategy))
+        connection = connection_class(edges=[], page_info=None)
+        connection.iterable = Article.objects.all()
+        return connection
+
+    def get_connection_result(self, arguments: str) -> (dict, [str]):
+        with CaptureQueriesContext(connection) as context:
+            result = Client(self.get_schema()).execute(
+                '{ articles(%s) { totalCount edges { node { pk } } } }' % arguments,
+                context_value=self.get_context_value())
+
+        self.assert_operation_no_errors(result)
+        return result['data']['articles'], [query['sql'] for query in context.captured_queries]
+
+    def test_count_exact(self):
+        self.assertEqual(self.get_connection('exact').get_total_count(), (5, True, 'exact'))
+
+    def test_count_capped(self):
+        self.assertEqual(
+            self.get_connection('capped', count_cap=3).get_total_count(), (3, False, 'capped'),
+            'Check if count over cap is returned as lower bound')
+        self.assertEqual(self.get_connection('capped', count_cap=10).get_total_count(), (5, True, 'capped'))
+
+    def test_count_cached(self):
+        self.assertEqual(self.get_connection('cached').get_total_count(), (5, True, 'cached'))
+        Article.objects.create(author=self.user, content='article', title='cached')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.get_connection('cached').get_total_count(), (5, True, 'cached'), 'Check if count is cached')
+
+    def test_count_estimate_small_set(self):
+        self.assertEqual(
+            self.get_connection('estimate').get_total_count(), (5, True, 'estimate'),
+            'Check if exact count is used below threshold')
+
+    def test_count_last_page(self):
+        articles, queries = self.get_connection_result('first: 10')
+        self.assertEqual(articles['totalCount'], 5, 'Check if total count is returned')
+        self.assertFalse(any('COUNT(' in sql for sql in queries), 'Check if count of fetched last page is reused')
+
+    def test_count_next_page(self):
+        articles, queries = self.get_connection_result('first: 2')
+        self.assertEqual(len(articles['edges']), 2, 'Check if page is sliced')
+        self.assertEqual(articles['totalCount'], 5, 'Check if total count is returned')
+        self.assertEqual(len([sql for sql in queries if 'COUNT(' in sql]), 1, 'Check if rows are counted once')
+
+
+class SoftDeleteTestCase(TestCase):
+    @isolate_apps('django_graphql_bp.article')
+    def test_soft_delete_manager(self):
+        class SoftDeleteArticle(SoftDeleteModel):
+            title = models.CharField(max_length=255)
+
+            class Meta:
+                app_label = 'article'
+                indexes = [SoftDeleteIndex(fields=['title'], name='soft_delete_article_title')]
+
+        with connection.schema_editor() as schema_editor:
+            schema_editor.create_model(SoftDeleteArticle)
+
+        SoftDeleteArticle.objects.bulk_create([SoftDeleteArticle(title='article {}'.format(i)) for i in range(3)])
+        SoftDeleteArticle.objects.filter(title='article 0').update(is_deleted=True)
+
+        self.assertEqual(SoftDeleteArticle.objects.count(), 2, 'Check if deleted rows are not counted')
+        self.assertEqual(SoftDeleteArticle.objects.with_deleted().count(), 3, 'Check if deleted rows can be included')
+        self.assertEqual(list(SoftDeleteArticle.objects.with_deleted().deleted().values_list('title', flat=True)),
+                         ['article 0'], 'Check if deleted rows can be selected')
+        self.assertIsInstance(
+            SoftDeleteArticle._default_manager, SoftDeleteManager, 'Check if connection fields get filtered manager')
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT indexdef FROM pg_indexes WHERE indexname = %s', ['soft_delete_article_title'])
+            self.assertIn('WHERE (is_deleted = false)', cursor.fetchone()[0], 'Check if index is partial')
+
+    @isolate_apps('django_graphql_bp.article')
+    def test_soft_delete_attribute(self):
+        class RemovedArticle(SoftDeleteModel):
+            is_deleted = None
+            is_deleted_attribute = 'is_removed'
+            is_removed = models.BooleanField(default=False)
+
+            class Meta:
+                app_label = 'article'
+                indexes = [SoftDeleteIndex(
+                    fields=['is_removed'], is_deleted_attribute='is_removed', name='removed_article_idx')]
+
+        with connection.schema_editor() as schema_editor:
+            schema_editor.create_model(RemovedArticle)
+
+        RemovedArticle.objects.bulk_create([RemovedArticle(), RemovedArticle(is_removed=True)])
+        self.assertEqual(RemovedArticle.objects.count(), 1, 'Check if rows are filtered by is_deleted_attribute')
+        self.assertEqual(RemovedArticle.objects.with_deleted().deleted().count(), 1)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT indexdef FROM pg_indexes WHERE indexname = %s', ['removed_article_idx'])
+            self.assertIn('WHERE (is_removed = false)', cursor.fetchone()[0], 'Check if index matches querysets')
+
+
+class _BaseArticlesViewTestCase(ArticleTestCase, cases.QueryTestCase):
+    def get_query(self) -> constructors.Query:
+        return constructors.Query('articles', {
+            'edges': {
+                'node': {
+                    'title': ''
+                }
+            }
+        })
+
+    def get_view_response(self, **data: dict):
+        request = RequestFactory().post('/graphql', json.dumps(dict({'query': self.get_query().get_result()}, **data)),
+                                        content_type='application/json')
+        request.user = AnonymousUser()
+        return GraphQLView.as_view(schema=self.get_schema())(request)
+
+    def get_view_result(self, **data: dict) -> dict:
+        return json.loads(self.get_view_response(**data).content.decode())
+
+    def get_titles(self, result: dict) -> list:
+        return [edge['node']['title'] for edge in result['data']['articles']['edges']]
+
+
+class ArticlesCacheTestCase(_BaseArticlesViewTestCase):
+    def test_articles_cache(self):
+        cache.register(Article)
+
+        with mock.patch.object(Query.articles, 'cache_timeout', 60):
+            self.get_view_result()
+
+            with self.assertNumQueries(0):
+                self.get_view_result()
+
+            self.article.title = 'ArticlesCacheTestCase'
+            self.article.save()
+            self.assertIn(
+                'ArticlesCacheTestCase', self.get_titles(self.get_view_result()),
+                'Check if cache is invalidated on article save')
+
+    def test_articles_document_parsed_once(self):
+        backend = get_backend()
+
+        with mock.patch.object(Query.articles, 'cache_timeout', 60), \
+                mock.patch.object(backend, 'document_from_string', wraps=backend.document_from_string) as parse:
+            self.get_view_result()
+
+        self.assertEqual(parse.call_count, 1, 'Check if document is parsed once per request')
+
+
+class ArticlesPersistedQueryTestCase(_BaseArticlesViewTestCase):
+    def get_metrics(self, name: str) -> dict:
+        """ Samples of metric by result label, e.g. {'hit': 1, 'miss': 0} """
+        metrics = MetricsView.as_view()(RequestFactory().get('/metrics')).content.decode()
+        expression = re.compile(r'^{}{{result="(\w+)"}} (\d+)$'.format(name))
+        return {match.group(1): int(match.group(2)) for match in map(expression.match, metrics.splitlines()) if match}
+
+    def test_articles_persisted_query(self):
+        query_hash = hashlib.sha256(self.get_query().get_result().encode('utf-8')).hexdigest()
+        extensions = {'persistedQuery': {'version': 1, 'sha256Hash': query_hash}}
+        stats = self.get_metrics('graphql_persisted_queries_total')
+
+        result = self.get_view_result(query=None, extensions=extensions)
+        self.assertEqual(result['errors'][0]['message'], 'PersistedQueryNotFound', 'Check if unknown hash is rejected')
+        self.get_view_result(extensions=extensions)
+        result = self.get_view_result(query=None, extensions=extensions)
+        self.assertEqual(self.get_titles(result), ['article'], 'Check if persisted query is executed by hash')
+        self.assertEqual(
+            {'hit': stats['hit'] + 1, 'miss': stats['miss'] + 1}, self.get_metrics('graphql_persisted_queries_total'),
+            'Check if every lookup is counted once')
+
+    def test_articles_document_cache_metrics(self):
+        self.get_view_result()
+        stats = self.get_metrics('graphql_document_cache_requests_total')
+        self.get_view_result()
+        self.assertEqual(
+            {'hit': stats['hit'] + 1, 'miss': stats['miss']}, self.get_metrics('graphql_document_cache_requests_total'),
+            'Check if cached document is counted once per request')
+
+
+class ArticlesTimingTestCase(_BaseArticlesViewTestCase):
+    @override_settings(GRAPHQL_TIMING_SAMPLE_RATE=1, GRAPHQL_SERVER_TIMING=True, GRAPHQL_SLOW_OPERATION_THRESHOLD=0)
+    def test_articles_timing(self):
+        with self.assertLogs('django_graphql_bp.graphql.middleware', 'WARNING'):
+            response = self.get_view_response()
+
+        field = '{}.articles'.format(self.get_schema().get_query_type().name)
+        timing = json.loads(response.content.decode())['extensions']['timing']
+        self.assertEqual(1, timing['fields'][field]['count'])
+        self.assertGreaterEqual(timing['queries'], 1)
+        self.assertIn('{};dur='.format(field), response['Server-Timing'])
+
+    def test_articles_timing_not_sampled(self):
+        response = self.get_view_response()
+        self.assertNotIn('timing', json.loads(response.content.decode()).get('extensions', {}))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+
+@override_settings(GRAPHQL_TRACING=True, GRAPHQL_TRACING_SQL_COMMENTS=True)
+class ArticlesTracingTestCase(_BaseArticlesViewTestCase):
+    def setUp(self):
+        super(ArticlesTracingTestCase, self).setUp()
+        tracing.registry.reset()
+
+    def test_articles_tracing(self):
+        # the innermost executor gets SQL after all execute wrappers, i.e. as it is sent to the database
+        with mock.patch.object(CursorWrapper, '_execute', autospec=True, side_effect=CursorWrapper._execute) as execute:
+            self.get_view_response(operationName='articles')
+
+        queries = [call[0][1] for call in execute.call_args_list]
+        self.assertIn("/*field='articles',operation='articles'*/", queries[0])
+        self.assertEqual(len(queries), tracing.registry.fields[('articles', 'articles')][0])
+
+        metrics = MetricsView.as_view()(RequestFactory().get('/metrics')).content.decode()
+        self.assertIn('graphql_operation_duration_seconds_count{operation="articles"} 1', metrics)
+        self.assertIn('graphql_field_sql_queries_total{field="articles",operation="articles"}', metrics)
+
+    def test_articles_tracing_loaders(self):
+        request = RequestFactory().get('/graphql')
+        tracer = request.graphql_tracer = tracing.Tracer('articles')
+        operation = parse('{ articles { edges { node { ...Author } } } } fragment Author on ArticleNode { a: author { id } }')
+        info = mock.Mock(context=request, fragments={'Author': operation.definitions[1]},
+                         operation=operation.definitions[0], path=['articles', 'edges', 0, 'node', 'a'])
+
+        with connection.execute_wrapper(tracer):
+            promise = loaders.get_loader(info, loaders.ForeignKeyLoader, User, User._meta.pk).load_field(
+                info, self.user.pk)
+            self.assertEqual(promise.get(), self.user)
+
+        self.assertEqual(
+            {'articles.edges.node.author': 1}, {path: totals[0] for path, totals in tracer.fields.items()},
+            'Check if batch query is attributed to path of loaded field, not to path resolved when batch is run')
+
+    def test_articles_tracing_aliases(self):
+        for alias in ('first', 'second'):
+            self.get_view_response(
+                operationName='articles',
+                query='query articles {{ {}: articles {{ edges {{ node {{ title }} }} }} }}'.format(alias))
+
+        self.assertEqual(
+            [('articles', 'articles')], list(tracing.registry.fields),
+            'Check if fields are labeled by schema field names, not by aliases')
+
+    def test_articles_tracing_max_fields(self):
+        with override_settings(GRAPHQL_TRACING_MAX_FIELDS=1):
+            tracing.registry.fields[('articles', 'users')] = [1, 0]
+            self.get_view_response(operationName='articles')
+
+        self.assertEqual([('articles', 'users'), ('articles', tracing.OTHER)], list(tracing.registry.fields))
@@ -0,0 +1,47 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread safe in-process cache which keeps up to "max_size" recently used items. Item set with "timeout" (seconds)
+    expires after it.
+    """
+    def __init__(self, max_size: int):
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.max_size = max_size
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.items:
+                return default
+
+            value, expires = self.items[key]
+
+            if expires is not None and expires <= time.monotonic():
+                del self.items[key]
+                return default
+
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout: float = None):
+        with self.lock:
+            self.items[key] = (value, None if timeout is None else time.monotonic() + timeout)
+            self.items.move_to_end(key)
+
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
@@ -0,0 +1,45 @@
+from django.db import models
+from django.db.models import Q
+
+
+class SoftDeleteQuerySet(models.QuerySet):
+    def deleted(self) -> 'SoftDeleteQuerySet':
+        return self.filter(**{self.model.is_deleted_attribute: True})
+
+
+class SoftDeleteManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """ Excludes deleted rows from all querysets including connection fields and reverse relations """
+    def get_queryset(self) -> SoftDeleteQuerySet:
+        return super(SoftDeleteManager, self).get_queryset().filter(**{self.model.is_deleted_attribute: False})
+
+    def with_deleted(self) -> SoftDeleteQuerySet:
+        return super(SoftDeleteManager, self).get_queryset()
+
+
+class SoftDeleteModel(models.Model):
+    """
+    Model deleted by django_graphql_bp.graphql.operations.mutations.MutationSoftDelete. To use other field, set
+    "is_deleted_attribute" to its name (and "is_deleted = None" to remove inherited field).
+    """
+    is_deleted = models.BooleanField(default=False)
+    is_deleted_attribute = 'is_deleted'
+
+    objects = SoftDeleteManager()
+
+    class Meta:
+        abstract = True
+
+
+class SoftDeleteIndex(models.Index):
+    """
+    Partial index of not deleted rows (WHERE NOT is_deleted), which is smaller than full one and matches querysets of
+    SoftDeleteManager. Usage for hot lookup and sort columns:
+
+        class Meta:
+            indexes = [SoftDeleteIndex(fields=['-pub_date', 'id'], name='article_pub_date_idx')]
+
+    Model is not known when Meta is defined, so "is_deleted_attribute" of model with other field is passed as well.
+    """
+    def __init__(self, *args, is_deleted_attribute: str = SoftDeleteModel.is_deleted_attribute, **kwargs):
+        kwargs.setdefault('condition', Q(**{is_deleted_attribute: False}))
+        super(SoftDeleteIndex, self).__init__(*args, **kwargs)
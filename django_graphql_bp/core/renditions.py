@@ -0,0 +1,183 @@
+import django
+import logging
+import multiprocessing
+import os
+from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.db.models.fields.files import FieldFile
+from django.utils.module_loading import import_string
+from io import BytesIO
+from PIL import Image
+
+DEFAULT_RENDITIONS = {
+    'thumbnail': {'width': 150},
+    'medium': {'width': 600},
+    'medium_webp': {'width': 600, 'format': 'WEBP'},
+}
+
+Rendition = namedtuple('Rendition', ['name', 'url', 'width'])
+
+logger = logging.getLogger(__name__)
+
+
+def setup_worker():
+    django.setup()
+
+
+def call_in_worker(function, *args):
+    try:
+        return function(*args)
+    finally:
+        close_old_connections()
+
+
+class ProcessPoolBackend:
+    """
+    Runs tasks in pool of worker processes (IMAGE_RENDITIONS_WORKERS, number of CPUs by default) of web server. Workers
+    are spawned, not forked, and set up Django on start, so they open own database connections and storage clients
+    instead of sharing sockets of the web server process.
+    """
+    def __init__(self):
+        self.executor = None
+
+    def submit(self, function, *args) -> Future:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                getattr(settings, 'IMAGE_RENDITIONS_WORKERS', None), mp_context=multiprocessing.get_context('spawn'),
+                initializer=setup_worker)
+
+        future = self.executor.submit(call_in_worker, function, *args)
+        future.add_done_callback(self.log_error)
+        return future
+
+    def log_error(self, future):
+        if future.exception() is not None:
+            logger.error('Renditions have not been generated.', exc_info=future.exception())
+
+
+class SyncBackend:
+    """ Runs tasks in current process, e.g. for tests or if function is already called by task queue """
+    def submit(self, function, *args):
+        function(*args)
+
+
+_backend = None
+
+
+def get_backend():
+    """ Process-wide backend of IMAGE_RENDITIONS_BACKEND setting, backend is a class with submit(function, *args) """
+    global _backend
+
+    if _backend is None:
+        _backend = import_string(getattr(
+            settings, 'IMAGE_RENDITIONS_BACKEND', 'django_graphql_bp.core.renditions.ProcessPoolBackend'))()
+
+    return _backend
+
+
+def get_renditions() -> dict:
+    """ IMAGE_RENDITIONS setting: {name => {'width': int, 'format': Pillow format or None to keep original one}} """
+    return getattr(settings, 'IMAGE_RENDITIONS', DEFAULT_RENDITIONS)
+
+
+def get_rendition_name(name: str, rendition: str) -> str:
+    """ Renditions are stored next to original, e.g. article/image.png => article/image.thumbnail.png """
+    base, extension = os.path.splitext(name)
+    image_format = get_renditions()[rendition].get('format')
+
+    if image_format:
+        extension = '.' + image_format.lower()
+
+    return '{}.{}{}'.format(base, rendition, extension)
+
+
+def get_width_field(model: type, field_name: str) -> str:
+    """ Optional "<field>_width" column of model which keeps width of original image, e.g. image_width """
+    width_field = '{}_width'.format(field_name)
+
+    try:
+        model._meta.get_field(width_field)
+    except FieldDoesNotExist:
+        return None
+
+    return width_field
+
+
+def generate_renditions(model_label: str, field_name: str, name: str):
+    """
+    Resizes original image to configured widths (never upscaled) and saves renditions to storage of field. Width of
+    original is stored in "<field>_width" column if model has it, so srcset gets actual widths of renditions.
+    """
+    model = apps.get_model(model_label)
+    storage = model._meta.get_field(field_name).storage
+
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+
+    width_field = get_width_field(model, field_name)
+
+    if width_field:
+        model._base_manager.filter(**{field_name: name}).update(**{width_field: image.width})
+
+    for rendition, options in get_renditions().items():
+        image_format = options.get('format') or image.format
+        resized = image.copy()
+        resized.thumbnail((options['width'], image.height))
+
+        if image_format == 'JPEG' and resized.mode not in ('L', 'RGB'):
+            resized = resized.convert('RGB')
+
+        content = BytesIO()
+        resized.save(content, image_format, quality=options.get('quality', 85))
+        rendition_name = get_rendition_name(name, rendition)
+
+        if storage.exists(rendition_name):
+            storage.delete(rendition_name)
+
+        storage.save(rendition_name, ContentFile(content.getvalue()))
+
+
+def get_file_renditions(file: FieldFile) -> [Rendition]:
+    """
+    Renditions ordered by width, width is the rendered one if width of original is known (not upscaled). URLs are
+    returned right after upload, while files are still being generated, so clients should fall back to the original.
+    """
+    if not file:
+        return []
+
+    width_field = get_width_field(type(file.instance), file.field.name)
+    original_width = getattr(file.instance, width_field) if width_field else None
+    file_renditions = []
+
+    for rendition, options in get_renditions().items():
+        width = min(options['width'], original_width) if original_width else options['width']
+        file_renditions.append(Rendition(rendition, file.storage.url(get_rendition_name(file.name, rendition)), width))
+
+    return sorted(file_renditions, key=lambda item: (item.width, item.name))
+
+
+def get_srcset(file: FieldFile) -> str:
+    """
+    Renditions in format of original image for srcset attribute of img tag, e.g. "image.thumbnail.png 150w". Widths
+    are unique, so renditions limited by width of original are listed once.
+    """
+    candidates = {}
+
+    for rendition in get_file_renditions(file):
+        if not get_renditions()[rendition.name].get('format'):
+            candidates.setdefault(rendition.width, rendition.url)
+
+    return ', '.join('{} {}w'.format(url, width) for width, url in sorted(candidates.items()))
+
+
+def schedule(file: FieldFile):
+    """ Generates renditions off request path once current transaction is committed """
+    if file:
+        args = (file.instance._meta.label, file.field.name, file.name)
+        transaction.on_commit(lambda: get_backend().submit(generate_renditions, *args))
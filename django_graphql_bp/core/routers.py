@@ -0,0 +1,145 @@
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+_context = threading.local()
+_counter = itertools.count()
+_failed = {}  # alias => time (monotonic) until which replica is skipped
+
+
+def get_primary() -> str:
+    return getattr(settings, 'DATABASE_PRIMARY', DEFAULT_DB_ALIAS)
+
+
+def get_replicas() -> list:
+    """ DATABASE_REPLICAS setting: aliases of DATABASES, e.g. ['replica1', 'replica2'] """
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def get_sticky_key(viewer: str) -> str:
+    return 'database:primary:{}'.format(viewer)
+
+
+def get_sticky_cache():
+    """ Cache of pinned viewers should be shared by all processes, e.g. memcached or redis """
+    return caches[getattr(settings, 'DATABASE_PRIMARY_STICKINESS_CACHE', 'default')]
+
+
+def get_viewer_key(request) -> str:
+    """ Key of viewer whose reads are pinned to primary after writes, None if viewer can not be identified """
+    user = getattr(request, 'user', None)
+
+    if user is not None and user.is_authenticated:
+        return 'user:{}'.format(user.pk)
+
+    session = getattr(request, 'session', None)
+
+    if session is not None and session.session_key:
+        return 'session:{}'.format(session.session_key)
+
+    return None
+
+
+def is_available(alias: str) -> bool:
+    until = _failed.get(alias)
+
+    if until is not None and until > time.monotonic():
+        return False
+
+    try:
+        connections[alias].ensure_connection()  # no query if connection is open
+    except DatabaseError:
+        mark_failed(alias)
+        return False
+
+    return True
+
+
+def is_sticky(viewer: str) -> bool:
+    return viewer is not None and bool(get_sticky_cache().get(get_sticky_key(viewer)))
+
+
+def get_replica() -> str:
+    """ Next available replica (round-robin), primary if all replicas are unavailable """
+    replicas = get_replicas()
+
+    if not replicas:
+        return get_primary()
+
+    start = next(_counter)
+
+    for index in range(len(replicas)):
+        alias = replicas[(start + index) % len(replicas)]
+
+        if is_available(alias):
+            return alias
+
+    return get_primary()
+
+
+def mark_failed(alias: str):
+    """ Skips replica for DATABASE_REPLICA_RETRY seconds (30 by default), e.g. after connection error """
+    _failed[alias] = time.monotonic() + getattr(settings, 'DATABASE_REPLICA_RETRY', 30)
+
+
+def pin(viewer: str):
+    """ Pins reads of viewer to primary for DATABASE_PRIMARY_STICKINESS seconds (10 by default) """
+    if viewer is not None:
+        get_sticky_cache().set(get_sticky_key(viewer), True, getattr(settings, 'DATABASE_PRIMARY_STICKINESS', 10))
+
+
+@contextmanager
+def operation(operation_type: str, viewer: str = None):
+    """
+    Routes reads inside of the block: query operation reads from replica unless viewer has written recently, any other
+    operation (e.g. mutation) uses primary and pins viewer to it, so the viewer reads own writes.
+    """
+    if not get_replicas():
+        yield
+        return
+
+    previous = getattr(_context, 'use_replica', False), getattr(_context, 'replica', None)
+    _context.use_replica = operation_type == 'query' and not is_sticky(viewer)
+    _context.replica = None
+
+    try:
+        yield
+    finally:
+        _context.use_replica, _context.replica = previous
+
+        if operation_type == 'mutation':
+            pin(viewer)
+
+
+class ReplicaRouter:
+    """
+    Database router which sends reads of GraphQL query operations to replicas, see operation(). Writes and all other
+    reads go to primary. Usage:
+
+        DATABASE_ROUTERS = ['django_graphql_bp.core.routers.ReplicaRouter']
+        DATABASE_REPLICAS = ['replica']
+    """
+    def db_for_read(self, model: type, **hints: dict) -> str:
+        if getattr(_context, 'use_replica', False):
+            if _context.replica is None:
+                # all reads of operation use the same replica, so they see the same state
+                _context.replica = get_replica()
+
+            return _context.replica
+
+        return get_primary()
+
+    def db_for_write(self, model: type, **hints: dict) -> str:
+        return get_primary()
+
+    def allow_relation(self, obj1, obj2, **hints: dict) -> bool:
+        aliases = [get_primary()] + get_replicas()
+
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+
+        return None
@@ -0,0 +1,82 @@
+from django.db.migrations.operations.base import Operation
+
+
+class SearchVectorTrigger(Operation):
+    """
+    Migration operation which keeps stored SearchVectorField up to date on database level, so rows written with save(),
+    bulk_create(), update() or raw SQL are always searchable. Existing rows are filled on migration. Usage:
+
+        operations = [
+            migrations.AddField('article', 'search_vector', SearchVectorField(editable=False, null=True)),
+            migrations.AddIndex('article', GinIndex(fields=['search_vector'], name='article_search_vector_gin')),
+            SearchVectorTrigger('article', 'search_vector', {'title': 'A', 'subtitle': 'B', 'content': 'C'}),
+        ]
+
+    Vector and config should be the same as "vector" and "config" of related ConnectionSearchVector class.
+    """
+    reduces_to_sql = True
+    reversible = True
+
+    def __init__(self, model_name: str, search_field: str, vector: dict, config: str = None):
+        self.config = config
+        self.model_name = model_name
+        self.search_field = search_field
+        self.vector = vector
+
+    def database_backwards(self, app_label: str, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            schema_editor.execute('DROP TRIGGER IF EXISTS {trigger} ON {table}'.format(
+                table=schema_editor.quote_name(model._meta.db_table), trigger=self.get_trigger_name(model)))
+            schema_editor.execute('DROP FUNCTION IF EXISTS {function}()'.format(
+                function=self.get_trigger_name(model)))
+
+    def database_forwards(self, app_label: str, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            table = schema_editor.quote_name(model._meta.db_table)
+            column = schema_editor.quote_name(model._meta.get_field(self.search_field).column)
+            trigger = self.get_trigger_name(model)
+            columns = [schema_editor.quote_name(model._meta.get_field(field).column) for field in sorted(self.vector)]
+
+            schema_editor.execute(
+                'CREATE OR REPLACE FUNCTION {function}() RETURNS trigger AS $$ BEGIN '
+                'NEW.{column} := {expression}; RETURN NEW; END $$ LANGUAGE plpgsql'.format(
+                    column=column, expression=self.get_expression(model, schema_editor, 'NEW.'), function=trigger))
+            schema_editor.execute('DROP TRIGGER IF EXISTS {trigger} ON {table}'.format(table=table, trigger=trigger))
+            schema_editor.execute(
+                'CREATE TRIGGER {trigger} BEFORE INSERT OR UPDATE OF {columns} ON {table} '
+                'FOR EACH ROW EXECUTE PROCEDURE {function}()'.format(
+                    columns=', '.join(columns), function=trigger, table=table, trigger=trigger))
+            schema_editor.execute('UPDATE {table} SET {column} = {expression}'.format(
+                column=column, expression=self.get_expression(model, schema_editor), table=table))
+
+    def describe(self) -> str:
+        return 'Create trigger to fill search vector field {}.{}'.format(self.model_name, self.search_field)
+
+    def get_expression(self, model, schema_editor, prefix: str = '') -> str:
+        config = ''
+
+        if self.config is not None:
+            config = "'{}'::regconfig, ".format(self.config.replace("'", "''"))
+
+        expressions = []
+
+        for field, weight in sorted(self.vector.items()):
+            expression = "to_tsvector({config}COALESCE({prefix}{column}::text, ''))".format(
+                column=schema_editor.quote_name(model._meta.get_field(field).column), config=config, prefix=prefix)
+
+            if weight:
+                expression = "setweight({}, '{}')".format(expression, weight)
+
+            expressions.append(expression)
+
+        return ' || '.join(expressions)
+
+    def get_trigger_name(self, model) -> str:
+        return '{}_{}_trigger'.format(model._meta.db_table, self.search_field)
+
+    def state_forwards(self, app_label: str, state):
+        pass
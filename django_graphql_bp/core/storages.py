@@ -1,8 +1,115 @@
+import boto3
+import threading
+from botocore.config import Config
 from django.conf import settings
+from django_graphql_bp.core.cache import LRUCache
 from storages.backends.s3boto3 import S3Boto3Storage
+from storages.utils import clean_name
 
 
 class S3MediaStorage(S3Boto3Storage):
+    """
+    All instances share process-wide boto3 client with pool of AWS_S3_MAX_POOL_CONNECTIONS (10 by default) connections,
+    so new instance doesn't create new session and connections. Generated URLs are cached for AWS_S3_URL_CACHE_TIMEOUT
+    seconds (half of AWS_QUERYSTRING_EXPIRE by default, so cached signed URL is valid for at least half of its time).
+    """
+    clients = {}
+    clients_lock = threading.Lock()
+
     def __init__(self, *args, **kwargs):
         self.bucket_name = settings.AWS_MEDIA_BUCKET_NAME
         super(S3MediaStorage, self).__init__(*args, **kwargs)
+        self.config = self.config.merge(
+            Config(max_pool_connections=getattr(settings, 'AWS_S3_MAX_POOL_CONNECTIONS', 10)))
+        self.url_cache = LRUCache(getattr(settings, 'AWS_S3_URL_CACHE_SIZE', 10000))
+
+    def __getstate__(self) -> dict:
+        state = super(S3MediaStorage, self).__getstate__()
+        state.pop('url_cache', None)
+        return state
+
+    def __setstate__(self, state: dict):
+        super(S3MediaStorage, self).__setstate__(state)
+        self.url_cache = LRUCache(getattr(settings, 'AWS_S3_URL_CACHE_SIZE', 10000))
+
+    @property
+    def connection(self):
+        """ Resource of current thread around shared client, boto3 clients are thread safe unlike resources """
+        connection = getattr(self._connections, 'connection', None)
+
+        if connection is None:
+            resource_class, client = self.get_client()
+            connection = self._connections.connection = resource_class(client=client)
+
+        return connection
+
+    def get_client(self) -> tuple:
+        key = (self.access_key, self.secret_key, self.security_token, self.region_name, self.use_ssl,
+               self.endpoint_url, self.verify, self.config.max_pool_connections, self.config.signature_version,
+               str(self.config.s3))
+
+        with self.clients_lock:
+            if key not in self.clients:
+                resource = boto3.session.Session().resource(
+                    's3',
+                    aws_access_key_id=self.access_key,
+                    aws_secret_access_key=self.secret_key,
+                    aws_session_token=self.security_token,
+                    region_name=self.region_name,
+                    use_ssl=self.use_ssl,
+                    endpoint_url=self.endpoint_url,
+                    config=self.config,
+                    verify=self.verify
+                )
+                self.clients[key] = (resource.__class__, resource.meta.client)
+
+            return self.clients[key]
+
+    def get_presigned_upload(self, name: str, content_type: str = None, max_size: int = None,
+                             expires_in: int = 3600) -> dict:
+        """
+        Returns presigned POST {'url': url, 'fields': {name => value}} to upload file directly to bucket under given
+        name, client posts "fields" and "file" as multipart/form-data to "url".
+        """
+        conditions = []
+        fields = {}
+
+        if content_type:
+            conditions.append({'Content-Type': content_type})
+            fields['Content-Type'] = content_type
+
+        if max_size:
+            conditions.append(['content-length-range', 0, max_size])
+
+        return self.bucket.meta.client.generate_presigned_post(
+            self.bucket_name, self._normalize_name(clean_name(name)), Fields=fields, Conditions=conditions,
+            ExpiresIn=expires_in)
+
+    def get_url_cache_timeout(self, expire: int):
+        if not self.querystring_auth or self.custom_domain:
+            return None
+
+        return min(getattr(settings, 'AWS_S3_URL_CACHE_TIMEOUT', expire / 2), expire)
+
+    def url(self, name: str, parameters: dict = None, expire: int = None, http_method: str = None) -> str:
+        if parameters:
+            return self.get_url(name, parameters, expire, http_method)
+
+        if expire is None:
+            expire = self.querystring_expire
+
+        key = (name, expire, http_method)
+        url = self.url_cache.get(key)
+
+        if url is None:
+            url = self.get_url(name, parameters, expire, http_method)
+            self.url_cache.set(key, url, self.get_url_cache_timeout(expire))
+
+        return url
+
+    def get_url(self, name: str, parameters: dict = None, expire: int = None, http_method: str = None) -> str:
+        # http_method is supported by django-storages 1.10+, older versions sign GET URLs only
+        if http_method is None:
+            return super(S3MediaStorage, self).url(name, parameters, expire)
+
+        return super(S3MediaStorage, self).url(name, parameters, expire, http_method)
@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import weakref
+from django.conf import settings
+from django_graphql_bp.core.cache import LRUCache
+from django_graphql_bp.graphql.cost import CostAnalyzer
+from functools import partial
+from graphql import GraphQLError, GraphQLSchema
+from graphql.backend.base import GraphQLDocument
+from graphql.backend.core import GraphQLCoreBackend
+from graphql.execution import ExecutionResult, execute
+from graphql.language import ast
+from graphql.language.parser import parse
+from graphql.validation import validate
+
+_schema_versions = weakref.WeakKeyDictionary()
+
+
+def get_schema_version(schema: GraphQLSchema) -> str:
+    if schema not in _schema_versions:
+        _schema_versions[schema] = hashlib.sha1(str(schema).encode('utf-8')).hexdigest()
+
+    return _schema_versions[schema]
+
+
+class GraphQLCachedBackend(GraphQLCoreBackend):
+    """
+    Keeps parsed and validated documents in LRU cache by schema version and sha256 hash of document.
+
+    Operations which cost or depth (see CostAnalyzer) are greater than "max_cost" or "max_depth" are rejected before
+    execution, calculated cost is reported in "cost" extension of result.
+    """
+    def __init__(self, max_size: int = 1000, executor=None, max_cost: int = None, max_depth: int = None,
+                 field_costs: dict = None, default_list_size: int = 100):
+        super(GraphQLCachedBackend, self).__init__(executor)
+        self.default_list_size = default_list_size
+        self.documents = LRUCache(max_size)
+        self.field_costs = field_costs
+        self.hits = 0
+        self.max_cost = max_cost
+        self.max_depth = max_depth
+        self.misses = 0
+        self.stats_lock = threading.Lock()  # counters are shared by threads of the process
+
+    def analyze(self, schema: GraphQLSchema, document_ast: ast.Document, variables: dict,
+                operation_name: str) -> (int, int, list):
+        """ Returns cost, depth and list of errors if limits are exceeded """
+        cost, depth = CostAnalyzer(
+            schema, document_ast, variables, operation_name, self.field_costs, self.default_list_size).analyze()
+        errors = []
+
+        if self.max_cost is not None and cost > self.max_cost:
+            errors.append(GraphQLError('Query cost {} exceeds maximum allowed cost {}.'.format(cost, self.max_cost)))
+
+        if self.max_depth is not None and depth > self.max_depth:
+            errors.append(GraphQLError(
+                'Query depth {} exceeds maximum allowed depth {}.'.format(depth, self.max_depth)))
+
+        return cost, depth, errors
+
+    def create_document(self, schema: GraphQLSchema, document_string: str) -> GraphQLDocument:
+        document_ast = parse(document_string)
+        return GraphQLDocument(schema, document_string, document_ast, partial(
+            self.execute, schema, document_ast, validate(schema, document_ast), **self.execute_params))
+
+    def document_from_string(self, schema: GraphQLSchema, document_string: str) -> GraphQLDocument:
+        if isinstance(document_string, ast.Document):
+            return super(GraphQLCachedBackend, self).document_from_string(schema, document_string)
+
+        key = (get_schema_version(schema), hashlib.sha256(document_string.encode('utf-8')).hexdigest())
+        document = self.documents.get(key)
+
+        with self.stats_lock:
+            if document is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+        if document is None:
+            document = self.create_document(schema, document_string)
+            self.documents.set(key, document)
+
+        return document
+
+    def execute(self, schema: GraphQLSchema, document_ast: ast.Document, validation_errors: list, *args,
+                **kwargs) -> ExecutionResult:
+        if validation_errors:
+            return ExecutionResult(errors=validation_errors, invalid=True)
+
+        cost, depth, errors = self.analyze(
+            schema, document_ast, kwargs.get('variables', kwargs.get('variable_values')),
+            kwargs.get('operation_name'))
+
+        if errors:
+            return ExecutionResult(errors=errors, invalid=True)
+
+        result = execute(schema, document_ast, *args, **kwargs)
+
+        if isinstance(result, ExecutionResult):
+            result.extensions = dict(getattr(result, 'extensions', None) or {}, cost={
+                'requestedQueryCost': cost,
+                'maximumAvailable': self.max_cost,
+                'depth': depth
+            })
+
+        return result
+
+    def get_stats(self) -> dict:
+        with self.stats_lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self.documents)}
+
+
+_backend = None
+
+
+def get_backend() -> GraphQLCachedBackend:
+    """
+    Process-wide backend configured by settings:
+        GRAPHQL_DOCUMENT_CACHE_SIZE - number of cached documents, 1000 by default;
+        GRAPHQL_MAX_COST - maximum cost of operation, not limited by default;
+        GRAPHQL_MAX_DEPTH - maximum depth of operation, not limited by default;
+        GRAPHQL_FIELD_COSTS - costs of fields other than 1, e.g. {'Query.articles': 5};
+        GRAPHQL_DEFAULT_LIST_SIZE - estimated size of lists without "first" or "last" argument, 100 by default.
+    """
+    global _backend
+
+    if _backend is None:
+        _backend = GraphQLCachedBackend(
+            getattr(settings, 'GRAPHQL_DOCUMENT_CACHE_SIZE', 1000),
+            max_cost=getattr(settings, 'GRAPHQL_MAX_COST', None),
+            max_depth=getattr(settings, 'GRAPHQL_MAX_DEPTH', None),
+            field_costs=getattr(settings, 'GRAPHQL_FIELD_COSTS', None),
+            default_list_size=getattr(settings, 'GRAPHQL_DEFAULT_LIST_SIZE', 100)
+        )
+
+    return _backend
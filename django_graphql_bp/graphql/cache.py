@@ -0,0 +1,36 @@
+import uuid
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.db.models.signals import post_delete, post_save
+
+
+def get_cache() -> BaseCache:
+    """ Cache of responses should be shared by all processes, e.g. memcached or redis, to be invalidated everywhere """
+    return caches[getattr(settings, 'GRAPHQL_RESPONSE_CACHE', 'default')]
+
+
+def get_version_key(model: type) -> str:
+    return 'graphql:response:version:{}'.format(model._meta.label_lower)
+
+
+def get_versions(models: list) -> list:
+    """ Versions of models are parts of response cache keys, so a new version makes old responses unreachable """
+    keys = [get_version_key(model) for model in models]
+    versions = get_cache().get_many(keys)
+    return [versions.get(key) for key in keys]
+
+
+def invalidate(model: type):
+    get_cache().set(get_version_key(model), uuid.uuid4().hex, None)
+
+
+def invalidate_on_change(sender: type, **kwargs: dict):
+    invalidate(sender)
+
+
+def register(model: type):
+    """ Invalidates cached responses on save and delete of model instances """
+    dispatch_uid = 'graphql_response_cache_{}'.format(model._meta.label_lower)
+    post_delete.connect(invalidate_on_change, sender=model, dispatch_uid=dispatch_uid)
+    post_save.connect(invalidate_on_change, sender=model, dispatch_uid=dispatch_uid)
+
@@ -0,0 +1,117 @@
+from graphql import GraphQLInterfaceType, GraphQLList, GraphQLNonNull, GraphQLObjectType, GraphQLSchema
+from graphql.language import ast
+from graphql.type.definition import get_named_type
+from graphql.utils.get_operation_ast import get_operation_ast
+
+LIMIT_ARGUMENTS = ('first', 'last')
+
+
+class CostAnalyzer:
+    """
+    Calculates static cost and depth of operation before its execution. Every field costs 1 unless other cost is set
+    in "field_costs": {'Type.field' => cost}, e.g. {'Query.articles': 5}. Cost of children of connection and list
+    fields is multiplied by their "first" or "last" argument or by "default_list_size" if both are not set.
+    """
+    def __init__(self, schema: GraphQLSchema, document_ast: ast.Document, variables: dict = None,
+                 operation_name: str = None, field_costs: dict = None, default_list_size: int = 100):
+        self.default_list_size = default_list_size
+        self.document_ast = document_ast
+        self.field_costs = field_costs or {}
+        self.fragments = {
+            definition.name.value: definition for definition in document_ast.definitions
+            if isinstance(definition, ast.FragmentDefinition)
+        }
+        self.operation_name = operation_name
+        self.schema = schema
+        self.variables = variables or {}
+
+    def analyze(self) -> (int, int):
+        """ Returns cost and depth of operation """
+        operation = get_operation_ast(self.document_ast, self.operation_name)
+
+        if operation is None:
+            return 0, 0
+
+        root_type = {
+            'mutation': self.schema.get_mutation_type,
+            'query': self.schema.get_query_type,
+            'subscription': self.schema.get_subscription_type
+        }[operation.operation]()
+        return self.get_cost(root_type, operation.selection_set, 0)
+
+    def get_argument_value(self, field_ast: ast.Field, name: str):
+        for argument in field_ast.arguments or []:
+            if argument.name.value == name:
+                if isinstance(argument.value, ast.Variable):
+                    return self.variables.get(argument.value.name.value)
+                elif isinstance(argument.value, ast.IntValue):
+                    return int(argument.value.value)
+
+        return None
+
+    def get_cost(self, parent_type, selection_set: ast.SelectionSet, depth: int) -> (int, int):
+        cost = 0
+        max_depth = depth
+
+        for field_type, field_ast in self.get_fields(parent_type, selection_set):
+            name = field_ast.name.value
+            field = field_type.fields.get(name) if not name.startswith('__') else None
+
+            if field is None:
+                continue
+
+            children_cost, children_depth = 0, depth + 1
+            named_type = get_named_type(field.type)
+
+            if field_ast.selection_set and isinstance(named_type, (GraphQLInterfaceType, GraphQLObjectType)):
+                children_cost, children_depth = self.get_cost(named_type, field_ast.selection_set, depth + 1)
+
+            cost += self.field_costs.get('{}.{}'.format(field_type.name, name), 1)
+            cost += children_cost * self.get_multiplier(parent_type, field, field_ast)
+            max_depth = max(max_depth, children_depth)
+
+        return cost, max_depth
+
+    def get_fields(self, parent_type, selection_set: ast.SelectionSet) -> list:
+        """ Returns list of (parent type, field) pairs with fields of fragments """
+        fields = []
+
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                fields.append((parent_type, selection))
+            else:
+                if isinstance(selection, ast.FragmentSpread):
+                    selection = self.fragments.get(selection.name.value)
+
+                    if selection is None:
+                        continue
+
+                fragment_type = parent_type
+
+                if selection.type_condition is not None:
+                    fragment_type = self.schema.get_type(selection.type_condition.name.value) or parent_type
+
+                if not isinstance(fragment_type, (GraphQLInterfaceType, GraphQLObjectType)):
+                    fragment_type = parent_type
+
+                fields += self.get_fields(fragment_type, selection.selection_set)
+
+        return fields
+
+    def get_multiplier(self, parent_type, field, field_ast: ast.Field) -> int:
+        if field_ast.name.value == 'edges' and 'pageInfo' in parent_type.fields:
+            # size of connection is already applied
+            return 1
+
+        limits = [self.get_argument_value(field_ast, name) for name in LIMIT_ARGUMENTS if name in field.args]
+        limits = [limit for limit in limits if limit is not None]
+
+        if limits:
+            return max(max(limits), 0)
+
+        field_type = field.type.of_type if isinstance(field.type, GraphQLNonNull) else field.type
+
+        if isinstance(field_type, GraphQLList) or any(name in field.args for name in LIMIT_ARGUMENTS):
+            return self.default_list_size
+
+        return 1
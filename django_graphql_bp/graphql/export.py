@@ -0,0 +1,102 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.query import QuerySet
+from django_graphql_bp.graphql.operations.fields import SearchConnectionField
+from graphene.utils.str_converters import to_snake_case
+
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson; charset=utf-8'}
+PAGINATION_ARGUMENTS = ('after', 'before', 'first', 'last')
+
+
+class ExportInfo:
+    """ Resolve info passed to resolver of exported field, only "context" (request) and "field_name" are available """
+    def __init__(self, context, field_name: str):
+        self.context = context
+        self.field_name = field_name
+
+
+class Echo:
+    """ File-like object for csv.writer which returns written line instead of buffering it """
+    def write(self, value: str) -> str:
+        return value
+
+
+class Export:
+    """
+    Streams all nodes of SearchConnectionField of schema's query, e.g. 'articles', as NDJSON or CSV. Nodes are filtered,
+    searched and sorted by field's arguments, e.g. {'query': 'graphql', 'sort': '-pub_date'}, and access rules of field
+    (policy and resolver) are applied to the user of request, same as for GraphQL operations. Rows are read with
+    server-side cursor in chunks of "chunk_size", so memory is constant.
+
+    Columns are concrete fields of node's model exposed by the node (e.g. password of UserNode is excluded), foreign
+    keys are exported as their values, e.g. author_id.
+    """
+    def __init__(self, schema, field_name: str, request, args: dict = None, columns: list = None,
+                 format: str = 'ndjson', chunk_size: int = 2000):
+        self.chunk_size = chunk_size
+        self.field_name = to_snake_case(field_name)
+        self.query_type = schema.get_query_type().graphene_type
+        self.field = self.query_type._meta.fields.get(self.field_name)
+        self.format = format
+        self.request = request
+        self.schema = schema
+
+        if not isinstance(self.field, SearchConnectionField):
+            raise ValueError('Field "{}" can not be exported.'.format(field_name))
+
+        if format not in CONTENT_TYPES:
+            raise ValueError('Format should be one of: {}.'.format(', '.join(sorted(CONTENT_TYPES))))
+
+        self.args = self.get_args(args or {})
+        self.columns = self.get_columns(columns)
+        self.query_set = self.get_query_set()
+
+    def __iter__(self):
+        rows = self.query_set.values_list(*self.columns).iterator(chunk_size=self.chunk_size)
+
+        if self.format == 'csv':
+            return self.iter_csv(rows)
+
+        return self.iter_ndjson(rows)
+
+    def get_args(self, args: dict) -> dict:
+        args = {to_snake_case(name): value for name, value in args.items()}
+
+        for name in args:
+            if name not in self.field.args or name in PAGINATION_ARGUMENTS:
+                raise ValueError('Argument "{}" is not supported by "{}" field.'.format(name, self.field_name))
+
+        return args
+
+    def get_columns(self, columns: list = None) -> list:
+        node_fields = self.field.node_type._meta.fields
+        available = [field.attname for field in self.field.model._meta.concrete_fields if field.name in node_fields]
+
+        if not columns:
+            return available
+
+        for column in columns:
+            if column not in available:
+                raise ValueError('Column should be one of: {}.'.format(', '.join(available)))
+
+        return list(columns)
+
+    def get_content_type(self) -> str:
+        return CONTENT_TYPES[self.format]
+
+    def get_query_set(self) -> QuerySet:
+        """ Raises PermissionError before streaming if field is not available to the user, same as GraphQL operation """
+        resolver = getattr(self.query_type, 'resolve_' + self.field_name, None)
+        return self.field.get_export_query_set(resolver, ExportInfo(self.request, self.field_name), self.args)
+
+    def iter_csv(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.columns)
+
+        for row in rows:
+            yield writer.writerow(row)
+
+    def iter_ndjson(self, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(self.columns, row)), cls=DjangoJSONEncoder) + '\n'
@@ -6,9 +6,54 @@ from django.forms.models import ModelMultipleChoiceField
 
 
 class UpdateForm(forms.ModelForm):
+    """
+    Model form which takes values of not submitted fields from instance. In partial mode (set "partial" to True) an
+    existing instance is validated and saved only by submitted fields, so not submitted columns (e.g. large text or m2m
+    relations) are neither read nor written.
+    """
+    partial = False
+
     def _clean_fields(self):
         for name, field in self.fields.items():
-            self.validate_field(field, name, self.get_field_value(field, name))
+            if not self.is_partial() or self.is_submitted(name):
+                self.validate_field(field, name, self.get_field_value(field, name))
+
+    def _get_validation_exclusions(self) -> list:
+        exclude = super(UpdateForm, self)._get_validation_exclusions()
+
+        if self.is_partial():
+            exclude += [name for name in self.fields if not self.is_submitted(name) and name not in exclude]
+
+        return exclude
+
+    def get_update_fields(self) -> [str]:
+        """ Submitted concrete fields which have been changed and fields updated on save (auto_now) """
+        opts = self.instance._meta
+        fields = [field.name for field in opts.concrete_fields if field.name in self.cleaned_data and
+                  field.name in self.changed_data and self.is_submitted(field.name)]
+
+        if fields:
+            fields += [field.name for field in opts.concrete_fields if getattr(field, 'auto_now', False)]
+
+        return fields
+
+    def is_partial(self) -> bool:
+        return self.partial and self.instance.pk is not None
+
+    def is_submitted(self, name: str) -> bool:
+        return self.add_prefix(name) in self.data or self.add_prefix(name) in self.files
+
+    def save(self, commit: bool = True) -> models.Model:
+        if not (commit and self.is_partial()):
+            return super(UpdateForm, self).save(commit)
+
+        if self.errors:
+            raise ValueError('The %s could not be changed because the data didn\'t validate.' % (
+                self.instance._meta.object_name))
+
+        self.instance.save(update_fields=self.get_update_fields())
+        self._save_m2m()
+        return self.instance
 
     def get_field_value(self, field, name: str):
         if field.disabled:
@@ -0,0 +1,93 @@
+import logging
+import random
+import time
+from django.conf import settings
+from graphql.execution.base import ResolveInfo
+from promise import is_thenable
+
+logger = logging.getLogger(__name__)
+
+
+class OperationTiming:
+    """
+    Duration of operation, number and duration of SQL queries (collected as database execute wrapper) and, if
+    "trace_resolvers" is True, duration of resolvers aggregated by field, e.g. {'Query.articles': [1, 0.012]}.
+    """
+    def __init__(self, trace_resolvers: bool = False):
+        self.duration = None
+        self.fields = {}
+        self.queries = 0
+        self.query_duration = 0
+        self.start = time.perf_counter()
+        self.trace_resolvers = trace_resolvers
+
+    def __call__(self, execute, sql: str, params, many: bool, context: dict):
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_duration += time.perf_counter() - start
+
+    def add(self, field: str, duration: float):
+        if field not in self.fields:
+            self.fields[field] = [0, 0]
+
+        self.fields[field][0] += 1
+        self.fields[field][1] += duration
+
+    def as_dict(self) -> dict:
+        return {
+            'duration': self.duration,
+            'queries': self.queries,
+            'queryDuration': self.query_duration,
+            'fields': {field: {'count': count, 'duration': duration} for field, (count, duration) in self.fields.items()}
+        }
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+
+    def get_server_timing(self) -> str:
+        """ Value of Server-Timing header, durations are in milliseconds """
+        metrics = ['graphql;dur={:.2f}'.format(self.duration * 1000), 'db;dur={:.2f}'.format(self.query_duration * 1000)]
+        fields = sorted(self.fields.items(), key=lambda item: -item[1][1])
+        metrics += ['{};dur={:.2f}'.format(field, duration * 1000) for field, (count, duration) in fields[:10]]
+        return ', '.join(metrics)
+
+    def log_if_slow(self, operation_name: str):
+        threshold = getattr(settings, 'GRAPHQL_SLOW_OPERATION_THRESHOLD', None)
+
+        if threshold is not None and self.duration >= threshold:
+            logger.warning('Slow GraphQL operation %s: %.3fs, %d SQL queries (%.3fs).', operation_name or '<anonymous>',
+                           self.duration, self.queries, self.query_duration)
+
+    @classmethod
+    def is_sampled(cls) -> bool:
+        return random.random() < getattr(settings, 'GRAPHQL_TIMING_SAMPLE_RATE', 0)
+
+
+class TimingMiddleware:
+    """
+    Times resolvers of operations sampled by GraphQLView (GRAPHQL_TIMING_SAMPLE_RATE), other operations are passed
+    through. Duration of resolver which returns promise (e.g. loader) is measured until the promise is resolved.
+    """
+    def resolve(self, next, root, info: ResolveInfo, **args: dict):
+        timing = getattr(info.context, 'graphql_timing', None)
+
+        if timing is None or not timing.trace_resolvers:
+            return next(root, info, **args)
+
+        field = '{}.{}'.format(info.parent_type.name, info.field_name)
+        start = time.perf_counter()
+        result = next(root, info, **args)
+
+        if is_thenable(result):
+            def add(value):
+                timing.add(field, time.perf_counter() - start)
+                return value
+
+            return result.then(add)
+
+        timing.add(field, time.perf_counter() - start)
+        return result
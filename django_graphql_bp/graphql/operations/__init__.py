@@ -1,4 +1,5 @@
 FORBIDDEN_ACCESS_ERROR = '403 Forbidden Access'
+TOO_MANY_REQUESTS_ERROR = '429 Too Many Requests'
 UNAUTHORIZED_ERROR = '401 Unauthorized'
 
 
@@ -8,3 +9,7 @@ def raise_forbidden_access_error():
 
 def raise_unathorized_error():
     raise PermissionError(UNAUTHORIZED_ERROR)
+
+
+def raise_too_many_requests_error():
+    raise PermissionError(TOO_MANY_REQUESTS_ERROR)
@@ -1,12 +1,144 @@
+import datetime
 import graphene
+import hashlib
+import json
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models.query import QuerySet
 from graphql.execution.base import ResolveInfo
+from graphql_relay.utils import base64, unbase64
 
 
 class CountableConnection(graphene.Connection):
+    """
+    Strategy of total count calculation is set by "count_strategy" attribute of subclass:
+        'exact' - COUNT(*) of filtered queryset;
+        'cached' - exact count cached for "count_cache_timeout" seconds by SQL of filtered queryset;
+        'estimate' - planner estimate, exact count is used if estimate is less than "count_estimate_threshold";
+        'capped' - exact count up to "count_cap", "count_cap" is returned for bigger sets.
+    """
+    COUNT_CACHED = 'cached'
+    COUNT_CAPPED = 'capped'
+    COUNT_ESTIMATE = 'estimate'
+    COUNT_EXACT = 'exact'
+
+    count_cache_timeout = 60
+    count_cap = 10000
+    count_estimate_threshold = 10000
+    count_strategy = COUNT_EXACT
+
     total_count = graphene.Int()
+    total_count_is_exact = graphene.Boolean(description='False if total count is an estimate or a lower bound')
+    total_count_strategy = graphene.String(description='Strategy used to calculate total count')
 
     class Meta:
         abstract = True
 
-    def resolve_total_count(self, info: ResolveInfo, **input: dict):
-        return self.iterable.count()
+    def count_cached(self) -> (int, bool):
+        try:
+            query = str(self.iterable.query)
+        except EmptyResultSet:
+            return 0, True
+
+        key = 'graphql:count:{}:{}'.format(
+            self.iterable.model._meta.label_lower, hashlib.md5(query.encode('utf-8')).hexdigest())
+        return cache.get_or_set(key, self.iterable.count, self.count_cache_timeout), True
+
+    def count_capped(self) -> (int, bool):
+        count = self.iterable.order_by()[:self.count_cap + 1].count()
+
+        if count > self.count_cap:
+            return self.count_cap, False
+
+        return count, True
+
+    def count_estimate(self) -> (int, bool):
+        connection = connections[self.iterable.db]
+
+        if connection.vendor != 'postgresql':
+            return self.count_exact()
+
+        try:
+            with connection.cursor() as cursor:
+                if not self.iterable.query.where:
+                    cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                                   [self.iterable.model._meta.db_table])
+                    estimate = cursor.fetchone()[0]
+                else:
+                    sql, params = self.iterable.order_by().query.sql_with_params()
+                    cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+                    plan = cursor.fetchone()[0]
+
+                    if isinstance(plan, str):
+                        plan = json.loads(plan)
+
+                    estimate = plan[0]['Plan']['Plan Rows']
+        except EmptyResultSet:
+            return 0, True
+
+        if estimate < self.count_estimate_threshold:
+            return self.count_exact()
+
+        return int(estimate), False
+
+    def count_exact(self) -> (int, bool):
+        length = getattr(self, 'length', None)
+
+        if length is None:
+            length = self.iterable.count()
+
+        return length, True
+
+    def get_total_count(self) -> (int, bool, str):
+        if not hasattr(self, '_total_count'):
+            strategy = self.count_strategy
+
+            if not isinstance(self.iterable, QuerySet):
+                strategy = self.COUNT_EXACT
+                self.length = len(self.iterable)
+
+            self._total_count = getattr(self, 'count_' + strategy)() + (strategy,)
+
+        return self._total_count
+
+    def resolve_total_count(self, info: ResolveInfo, **input: dict) -> int:
+        return self.get_total_count()[0]
+
+    def resolve_total_count_is_exact(self, info: ResolveInfo, **input: dict) -> bool:
+        return self.get_total_count()[1]
+
+    def resolve_total_count_strategy(self, info: ResolveInfo, **input: dict) -> str:
+        return self.get_total_count()[2]
+
+
+class KeysetCursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            # keep microseconds which are cut by DjangoJSONEncoder, otherwise cursor would not match its row
+            return o.isoformat()
+
+        return super(KeysetCursorEncoder, self).default(o)
+
+
+class KeysetCursor:
+    """ Opaque cursor which holds values of sort keys of an edge, e.g. [pub_date, pk] """
+    prefix = 'keyset:'
+
+    @classmethod
+    def decode(cls, cursor: str, length: int) -> list:
+        try:
+            value = unbase64(cursor)
+            values = json.loads(value[len(cls.prefix):]) if value.startswith(cls.prefix) else None
+        except (TypeError, ValueError):
+            values = None
+
+        if not isinstance(values, list) or len(values) != length:
+            raise ValueError('Cursor "{}" is invalid.'.format(cursor))
+
+        return values
+
+    @classmethod
+    def encode(cls, values: list) -> str:
+        return base64(cls.prefix + json.dumps(values, cls=KeysetCursorEncoder))
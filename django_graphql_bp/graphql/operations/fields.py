@@ -1,8 +1,18 @@
 import graphene
 from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
 from django.db.models.query import QuerySet
+from django_graphql_bp.graphql import cache
+from django_graphql_bp.graphql.operations.connections import KeysetCursor
+from django_graphql_bp.graphql.operations.optimizers import QuerySetOptimizer
+from django_graphql_bp.graphql.operations.policies import Policy
 from functools import partial
+from graphene.relay import PageInfo
 from graphene_django.filter import DjangoFilterConnectionField
+from graphene_django.utils import maybe_queryset
+from graphql.execution.base import ResolveInfo
+from graphql_relay.connection.arrayconnection import connection_from_list_slice, get_offset_with_default
 
 
 class OptionsInput(graphene.InputObjectType):
@@ -11,41 +21,101 @@ class OptionsInput(graphene.InputObjectType):
 
 
 class ConnectionSearchVector:
+    """
+    Full text search over fields of "vector" attribute: {field name => weight}, e.g. {'title': 'A', 'content': 'B'}.
+
+    By default vector is calculated for every row on every search. Set "search_field" to the name of a stored
+    django.contrib.postgres.search.SearchVectorField (backed by GinIndex) to filter and rank against it instead. Stored
+    field is kept up to date by django_graphql_bp.core.search.SearchVectorTrigger migration operation.
+    """
+    config = None  # Text search configuration, e.g. 'english'; default_text_search_config of database is used if None
+    search_field = None
     vector = None
 
     @classmethod
     def apply(cls, query: str, qs: QuerySet) -> QuerySet:
         if query:
-            search_query = SearchQuery('')
+            search_query = cls.get_search_query(query)
 
-            for query_word in query.split():
-                search_query = search_query | SearchQuery(query_word)
+            if cls.search_field is not None:
+                qs = qs.annotate(rank=cls.get_rank(F(cls.search_field), search_query))\
+                    .filter(**{cls.search_field: search_query}).order_by('-rank')
+            else:
+                vector = cls.get_vector()
 
-            if cls.vector is None:
-                raise NotImplementedError('Attribute "vector" of type dict must be implemented.')
+                if vector:
+                    qs = qs.annotate(search=vector, rank=cls.get_rank(vector, search_query))\
+                        .filter(search=search_query).order_by('-rank')
 
-            vector = None
+        return qs
 
-            for field, weight in cls.vector.items():
-                if not vector:
-                    vector = SearchVector(field, weight=weight)
-                else:
-                    vector += SearchVector(field, weight=weight)
+    @classmethod
+    def get_rank(cls, vector, search_query: SearchQuery) -> Cast:
+        """ ts_rank() returns real, it is cast to double precision, so rank kept in keyset cursor matches its row """
+        return Cast(SearchRank(vector, search_query), FloatField())
 
-            if vector:
-                qs = qs.annotate(search=vector, rank=SearchRank(vector, search_query)).filter(search=search_query)\
-                    .order_by('-rank')
+    @classmethod
+    def get_search_query(cls, query: str) -> SearchQuery:
+        search_query = SearchQuery('', config=cls.config)
 
-        return qs
+        for query_word in query.split():
+            search_query = search_query | SearchQuery(query_word, config=cls.config)
+
+        return search_query
+
+    @classmethod
+    def get_vector(cls) -> SearchVector:
+        if cls.vector is None:
+            raise NotImplementedError('Attribute "vector" of type dict must be implemented.')
+
+        vector = None
+
+        for field, weight in cls.vector.items():
+            if not vector:
+                vector = SearchVector(field, config=cls.config, weight=weight)
+            else:
+                vector += SearchVector(field, config=cls.config, weight=weight)
+
+        return vector
+
+    @classmethod
+    def update_search_field(cls, qs: QuerySet) -> int:
+        """ Recalculates stored search field of all rows of queryset with single UPDATE query """
+        if cls.search_field is None:
+            raise NotImplementedError('Attribute "search_field" of type str must be implemented.')
+
+        return qs.update(**{cls.search_field: cls.get_vector()})
 
 
 class SearchConnectionField(DjangoFilterConnectionField):
+    """
+    :param keyset: ordering used for keyset (seek) pagination instead of offset one, e.g. ('-pub_date', '-pk'). Fields
+        should be not nullable attributes of model and the last one should be unique. "sort" argument accepts the
+        first field of keyset or its reverse only, e.g. '-pub_date' or 'pub_date' for example above. Search results
+        without "sort" argument are ordered by rank and then by keyset, so cursors hold rank too.
+    :type keyset: tuple | None
+    :param cache_timeout: seconds to cache responses of query operations which select only fields with cache enabled,
+        responses are cached for anonymous and staff users by django_graphql_bp.graphql.views.GraphQLView
+    :type cache_timeout: int | None
+    :param cache_models: models (besides model of node) which changes should invalidate cached responses
+    :param policy: row level access rule which filters nodes available to user, e.g. OwnerPolicy('author')
+    :type policy: django_graphql_bp.graphql.operations.policies.Policy | None
+    """
     def __init__(self, type: type, fields=None, extra_filter_meta=None, filterset_class: type = None,
-                 search_vector_class: ConnectionSearchVector = None, *args, **kwargs):
+                 search_vector_class: ConnectionSearchVector = None, keyset: tuple = None, cache_timeout: int = None,
+                 cache_models: tuple = (), policy: Policy = None, *args, **kwargs):
+        self.cache_models = tuple(cache_models)
+        self.cache_timeout = cache_timeout
+        self.keyset = keyset
+        self.policy = policy
         self.search_vector_class = search_vector_class
         super(SearchConnectionField, self).__init__(
             type, fields, None, extra_filter_meta, filterset_class, *args, **kwargs)
 
+        if cache_timeout:
+            for model in self.get_cache_models():
+                cache.register(model)
+
     @classmethod
     def apply_additional_conditions(cls, args: dict, qs: QuerySet) -> QuerySet:
         return qs
@@ -79,14 +149,164 @@ class SearchConnectionField(DjangoFilterConnectionField):
 
     @classmethod
     def connection_resolver(cls, resolver, connection, default_manager, max_limit, enforce_first_or_last,
-                            filterset_class, filtering_args, search_vector_class, root, info, **args):
-        qs = cls.get_query_set(args, default_manager, filterset_class, filtering_args)
-        qs = cls.apply_filters(args, qs)
-        qs = cls.apply_search(args, qs, search_vector_class)
+                            filterset_class, filtering_args, search_vector_class, keyset, policy, root, info, **args):
+        qs = cls.get_filtered_query_set(
+            args, default_manager, filterset_class, filtering_args, search_vector_class, policy, info.context.user)
+        optimizer = cls.get_optimizer(info, connection, keyset or ())
+
+        if keyset:
+            qs = cls.apply_additional_conditions(args, qs)
+            return cls.keyset_connection_resolver(
+                optimizer.get_resolver(resolver), connection, optimizer.optimize(qs), max_limit,
+                enforce_first_or_last, keyset, root, info, **args)
+
         qs = cls.apply_sort(args, qs)
         qs = cls.apply_additional_conditions(args, qs)
         return super(DjangoFilterConnectionField, cls).connection_resolver(
-            resolver, connection, qs, max_limit, enforce_first_or_last, root, info, **args)
+            optimizer.get_resolver(resolver), connection, optimizer.optimize(qs), max_limit, enforce_first_or_last,
+            root, info, **args)
+
+    @classmethod
+    def get_keyset_condition(cls, ordering: tuple, values: list, is_after: bool) -> Q:
+        """ Expanded row comparison, e.g. (pub_date, pk) < (%s, %s) for ('-pub_date', '-pk') after cursor """
+        condition = Q()
+        equal = {}
+
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') == is_after else 'gt'
+            condition |= Q(**equal) & Q(**{'{}__{}'.format(name, lookup): value})
+            equal[name] = value
+
+        return condition
+
+    @classmethod
+    def get_keyset_ordering(cls, args: dict, keyset: tuple, qs: QuerySet = None) -> tuple:
+        """ Results of search without "sort" argument are ordered by rank first, keyset orders rows of equal rank """
+        sort = args.get('sort')
+        ordering = tuple(keyset)
+
+        if sort and sort != ordering[0]:
+            ordering = cls.reverse_ordering(ordering)
+
+            if sort != ordering[0]:
+                raise ValueError('Sort "{}" is not supported, use one of: "{}", "{}".'.format(
+                    sort, keyset[0], ordering[0]))
+
+        if not sort and qs is not None and 'rank' in qs.query.annotations:
+            ordering = ('-rank',) + ordering
+
+        return ordering
+
+    @classmethod
+    def get_keyset_values(cls, node, ordering: tuple) -> list:
+        return [getattr(node, field.lstrip('-')) for field in ordering]
+
+    @classmethod
+    def keyset_connection_resolver(cls, resolver, connection, qs: QuerySet, max_limit, enforce_first_or_last,
+                                   keyset: tuple, root, info: ResolveInfo, **args):
+        first = args.get('first')
+        last = args.get('last')
+
+        if enforce_first_or_last:
+            assert first or last, 'You must provide a `first` or `last` value to properly paginate the `{}` ' \
+                                  'connection.'.format(info.field_name)
+
+        if max_limit:
+            assert (first or 0) <= max_limit and (last or 0) <= max_limit, \
+                'Requesting more than {} records on the `{}` connection is not allowed.'.format(
+                    max_limit, info.field_name)
+
+            if not first and not last:
+                first = max_limit
+
+        iterable = maybe_queryset(resolver(root, info, **args))
+
+        if isinstance(iterable, QuerySet) and iterable is not qs:
+            qs = cls.merge_querysets(qs, iterable)
+
+        ordering = cls.get_keyset_ordering(args, keyset, qs)
+        page = qs
+
+        if args.get('after'):
+            page = page.filter(cls.get_keyset_condition(
+                ordering, KeysetCursor.decode(args['after'], len(ordering)), True))
+
+        if args.get('before'):
+            page = page.filter(cls.get_keyset_condition(
+                ordering, KeysetCursor.decode(args['before'], len(ordering)), False))
+
+        has_next_page = False
+        has_previous_page = False
+
+        if last and not first:
+            nodes = list(page.order_by(*cls.reverse_ordering(ordering))[:last + 1])
+            has_previous_page = len(nodes) > last
+            nodes = list(reversed(nodes[:last]))
+        else:
+            page = page.order_by(*ordering)
+            nodes = list(page[:first + 1]) if first else list(page)
+
+            if first:
+                has_next_page = len(nodes) > first
+                nodes = nodes[:first]
+
+            if last:
+                has_previous_page = len(nodes) > last
+                nodes = nodes[-last:]
+
+        edges = [
+            connection.Edge(node=node, cursor=KeysetCursor.encode(cls.get_keyset_values(node, ordering)))
+            for node in nodes
+        ]
+        result = connection(edges=edges, page_info=PageInfo(
+            start_cursor=edges[0].cursor if edges else None,
+            end_cursor=edges[-1].cursor if edges else None,
+            has_previous_page=has_previous_page,
+            has_next_page=has_next_page
+        ))
+        result.iterable = qs
+        return result
+
+    @classmethod
+    def resolve_connection(cls, connection, default_manager, args: dict, iterable):
+        """ Slices forward pages without COUNT(*), total count is calculated by connection only if requested """
+        if iterable is None:
+            iterable = default_manager
+
+        iterable = maybe_queryset(iterable)
+
+        if not isinstance(iterable, QuerySet) or args.get('last') or args.get('before'):
+            return super(SearchConnectionField, cls).resolve_connection(connection, default_manager, args, iterable)
+
+        if iterable is not default_manager:
+            iterable = cls.merge_querysets(maybe_queryset(default_manager), iterable)
+
+        first = args.get('first')
+        start = get_offset_with_default(args.get('after'), -1) + 1
+        # one extra row shows if there is a next page
+        nodes = list(iterable[start:start + first + 1] if first is not None else iterable[start:])
+        result = connection_from_list_slice(
+            nodes,
+            args,
+            slice_start=start,
+            list_length=start + len(nodes),
+            list_slice_length=len(nodes),
+            connection_type=connection,
+            edge_type=connection.Edge,
+            pageinfo_type=PageInfo
+        )
+        result.iterable = iterable
+
+        if (first is None or len(nodes) <= first) and (nodes or not start):
+            # last page has been fetched, so count is known
+            result.length = start + len(nodes)
+
+        return result
+
+    @classmethod
+    def reverse_ordering(cls, ordering: tuple) -> tuple:
+        return tuple(field[1:] if field.startswith('-') else '-' + field for field in ordering)
 
     def get_resolver(self, parent_resolver):
         return partial(
@@ -98,9 +318,51 @@ class SearchConnectionField(DjangoFilterConnectionField):
             self.enforce_first_or_last,
             self.filterset_class,
             self.filtering_args,
-            self.search_vector_class
+            self.search_vector_class,
+            self.keyset,
+            self.policy
         )
 
+    def get_cache_models(self) -> tuple:
+        return (self.model,) + self.cache_models
+
+    @classmethod
+    def get_optimizer(cls, info: ResolveInfo, connection, required_fields: tuple) -> QuerySetOptimizer:
+        return QuerySetOptimizer(info, connection._meta.node, required_fields)
+
+    @classmethod
+    def get_filtered_query_set(cls, args: dict, default_manager, filterset_class: type, filtering_args: dict,
+                               search_vector_class: ConnectionSearchVector, policy: Policy, user) -> QuerySet:
+        qs = cls.get_query_set(args, default_manager, filterset_class, filtering_args)
+
+        if policy is not None:
+            qs = policy.filter(qs, user)
+
+        qs = cls.apply_filters(args, qs)
+        return cls.apply_search(args, qs, search_vector_class)
+
+    def get_export_query_set(self, resolver, info: ResolveInfo, args: dict) -> QuerySet:
+        """
+        All nodes of connection (without pagination) with the same filters, search, sort and policy, and merged with
+        queryset of field's resolver, see django_graphql_bp.graphql.export
+        """
+        qs = self.get_filtered_query_set(
+            args, self.get_manager(), self.filterset_class, self.filtering_args, self.search_vector_class, self.policy,
+            info.context.user)
+
+        if self.keyset:
+            qs = qs.order_by(*self.get_keyset_ordering(args, self.keyset, qs))
+        else:
+            qs = self.apply_sort(args, qs)
+
+        qs = self.apply_additional_conditions(args, qs)
+        iterable = maybe_queryset(resolver(None, info, **args)) if resolver is not None else None
+
+        if isinstance(iterable, QuerySet):
+            qs = self.merge_querysets(qs, iterable)
+
+        return qs
+
     @classmethod
     def get_query_set(cls, args: dict, default_manager, filterset_class: type, filtering_args: dict) -> QuerySet:
         filter_kwargs = {k: v for k, v in args.items() if k in filtering_args}
@@ -0,0 +1,182 @@
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from django.db import models
+from django_graphql_bp.graphql import tracing
+from graphene import Dynamic
+from graphene_django import DjangoObjectType
+from graphql.execution.base import ResolveInfo
+from promise import Promise
+from promise.dataloader import DataLoader
+
+PAGINATION_ARGUMENTS = ('after', 'before', 'first', 'last')
+
+
+class FieldLoader(DataLoader):
+    """
+    Loader which runs batch query after resolvers have returned, so the query is attributed to field path of the
+    first load of the batch (see tracing.Tracer) instead of the path being resolved at that moment. Loads of other
+    paths batched with it, e.g. "author" of articles and of their comments, are counted under the first path.
+
+    Instances are loaded by default manager of model in both directions of relation, so e.g. deleted rows of
+    SoftDeleteModel are neither loaded by foreign key nor listed in reverse relation.
+    """
+    def __init__(self, *args, **kwargs):
+        super(FieldLoader, self).__init__(*args, **kwargs)
+        self.context = None
+        self.path = None
+
+    def load_field(self, info: ResolveInfo, key) -> Promise:
+        self.context = info.context
+
+        if self.path is None:
+            self.path = tracing.get_field_path(info)
+
+        return self.load(key)
+
+    @contextmanager
+    def traced_batch(self):
+        path, self.path = self.path, None
+
+        with tracing.field_path(self.context, path):
+            yield
+
+
+class ForeignKeyLoader(FieldLoader):
+    """ Loads instances of model by value of field (usually pk) with one IN (...) query per batch """
+    def __init__(self, model: type, field: models.Field, *args, **kwargs):
+        self.field = field
+        self.model = model
+        super(ForeignKeyLoader, self).__init__(*args, **kwargs)
+
+    def batch_load_fn(self, keys: list) -> Promise:
+        with self.traced_batch():
+            queryset = self.model._default_manager.filter(**{self.field.name + '__in': keys})
+            instances = {getattr(instance, self.field.attname): instance for instance in queryset}
+
+        return Promise.resolve([instances.get(key) for key in keys])
+
+
+class ReverseForeignKeyLoader(FieldLoader):
+    """
+    Loads lists of related instances by value of their foreign key with one IN (...) query per batch. Related instances
+    are taken from "queryset" if it is set, e.g. filtered by filterset of connection field.
+    """
+    def __init__(self, model: type, field: models.ForeignKey, queryset: models.QuerySet = None, *args, **kwargs):
+        self.field = field
+        self.model = model
+        self.queryset = queryset
+        super(ReverseForeignKeyLoader, self).__init__(*args, **kwargs)
+
+    def batch_load_fn(self, keys: list) -> Promise:
+        instances = defaultdict(list)
+        queryset = self.model._default_manager.all() if self.queryset is None else self.queryset
+
+        with self.traced_batch():
+            for instance in queryset.filter(**{self.field.attname + '__in': keys}):
+                instances[getattr(instance, self.field.attname)].append(instance)
+
+        return Promise.resolve([instances[key] for key in keys])
+
+
+def get_loader(info: ResolveInfo, loader_class: type, *args, key: tuple = None) -> DataLoader:
+    """
+    Returns loader shared by all resolvers of the request, so loads of one execution tick are batched. Loaders are
+    shared by arguments or by "key" if arguments are not hashable by value (e.g. querysets).
+    """
+    if info.context is None:
+        return loader_class(*args)
+
+    if not hasattr(info.context, 'graphql_loaders'):
+        info.context.graphql_loaders = {}
+
+    key = (loader_class,) + (args if key is None else key)
+
+    if key not in info.context.graphql_loaders:
+        info.context.graphql_loaders[key] = loader_class(*args)
+
+    return info.context.graphql_loaders[key]
+
+
+def get_foreign_key_resolver(field: models.ForeignKey):
+    def resolver(root: models.Model, info: ResolveInfo, **args: dict):
+        if field.is_cached(root):
+            # e.g. has been loaded with select_related
+            return getattr(root, field.name)
+
+        value = getattr(root, field.attname)
+
+        if value is None:
+            return None
+
+        loader = get_loader(info, ForeignKeyLoader, field.related_model, field.target_field)
+        return loader.load_field(info, value)
+
+    return resolver
+
+
+def get_reverse_foreign_key_resolver(relation: models.ManyToOneRel):
+    accessor_name = relation.get_accessor_name()
+    connection_fields = {}
+
+    def get_connection_field(info: ResolveInfo):
+        """ Field of node type, e.g. DjangoFilterConnectionField with filterset of related model """
+        node_type = info.parent_type.graphene_type
+
+        if node_type not in connection_fields:
+            field = node_type._meta.fields[accessor_name]
+            connection_fields[node_type] = field.get_type() if isinstance(field, Dynamic) else field
+
+        return connection_fields[node_type]
+
+    def resolver(root: models.Model, info: ResolveInfo, **args: dict):
+        manager = getattr(root, accessor_name)
+        field = get_connection_field(info)
+        filtering_args = getattr(field, 'filtering_args', {})
+        filters = {name: value for name, value in args.items() if name in filtering_args}
+
+        if any(name not in PAGINATION_ARGUMENTS and name not in filtering_args for name in args):
+            # other arguments are applied to queryset by connection field
+            return manager
+
+        if not filters and accessor_name in getattr(root, '_prefetched_objects_cache', {}):
+            return list(manager.all())
+
+        queryset = None
+
+        if filters:
+            # filterset of connection field is not applied to list, so related instances are filtered by loader
+            queryset = field.filterset_class(
+                data=filters, queryset=relation.related_model._default_manager.all(), request=info.context).qs
+
+        value = getattr(root, relation.field.target_field.attname)
+        loader = get_loader(
+            info, ReverseForeignKeyLoader, relation.related_model, relation.field, queryset,
+            key=(relation.related_model, relation.field, json.dumps(filters, default=str, sort_keys=True)))
+        return loader.load_field(info, value)
+
+    return resolver
+
+
+class DjangoBatchObjectType(DjangoObjectType):
+    """
+    Resolves foreign key and reverse foreign key fields through request-scoped loaders, so a page of nodes costs one
+    query per relation instead of one query per node. Fields with own resolve_<name> method are left as is.
+    """
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def __init_subclass_with_meta__(cls, **options: dict):
+        super(DjangoBatchObjectType, cls).__init_subclass_with_meta__(**options)
+        relations = {}
+
+        for field in cls._meta.model._meta.get_fields():
+            if field.many_to_one and field.concrete:
+                relations[field.name] = get_foreign_key_resolver(field)
+            elif field.one_to_many and isinstance(field, models.ManyToOneRel):
+                relations[field.get_accessor_name()] = get_reverse_foreign_key_resolver(field)
+
+        for name in cls._meta.fields:
+            if name in relations and not hasattr(cls, 'resolve_' + name):
+                setattr(cls, 'resolve_' + name, relations[name])
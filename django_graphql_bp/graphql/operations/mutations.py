@@ -1,13 +1,19 @@
 import graphene
 import json
 import re
+from collections import Counter
 from django import forms
+from django.conf import settings
+from django.core import signing
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.core.handlers.wsgi import WSGIRequest
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django_graphql_bp.core.helpers import ObjectHelper
-from django_graphql_bp.graphql.operations import raise_forbidden_access_error, raise_unathorized_error
+from django_graphql_bp.graphql import cache
+from django_graphql_bp.graphql.forms import UpdateForm
+from django_graphql_bp.graphql.operations import raise_forbidden_access_error, raise_too_many_requests_error, \
+    raise_unathorized_error
 from graphql.execution.base import ResolveInfo
 
 
@@ -15,10 +21,22 @@ class MutationAbstract:
     ok = graphene.Boolean()
     errors = graphene.List(graphene.String)
 
+    throttles = ()  # Set django_graphql_bp.graphql.operations.throttling.Throttle list to limit attempts
+
     @classmethod
     def check_access(cls, info: ResolveInfo, input: dict):
         pass
 
+    @classmethod
+    def check_throttles(cls, info: ResolveInfo, input: dict):
+        """ Rejects attempt before any work (e.g. password hashing) if one of throttles is exceeded """
+        if not getattr(settings, 'GRAPHQL_THROTTLING', True):
+            return
+
+        for throttle in cls.throttles:
+            if throttle.check(info, input):
+                raise_too_many_requests_error()
+
     @classmethod
     def get_context_file_by_name(cls, info: ResolveInfo, name: str) -> InMemoryUploadedFile:
         files = cls.get_context_files_by_name(info.context, name)
@@ -39,8 +57,33 @@ class MutationAbstract:
 
         return files
 
+    @classmethod
+    def get_object(cls, info: ResolveInfo, model: type, pk) -> models.Model:
+        """ Loads instance once per mutation, so access checks and form binding share the same instance """
+        if info.context is None:
+            return cls.get_queryset(info, model).get(pk=pk)
+
+        if getattr(info.context, 'graphql_instances', None) is None:
+            info.context.graphql_instances = {}
+
+        key = (model, model._meta.pk.to_python(pk))
+
+        if key not in info.context.graphql_instances:
+            info.context.graphql_instances[key] = cls.get_queryset(info, model).get(pk=pk)
+
+        return info.context.graphql_instances[key]
+
+    @classmethod
+    def get_queryset(cls, info: ResolveInfo, model: type) -> models.QuerySet:
+        return model.objects.all()
+
     @classmethod
     def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'MutationAbstract':
+        if info.context is not None:
+            # identity map is scoped to one mutation, instances changed by previous mutations are loaded again
+            info.context.graphql_instances = {}
+
+        cls.check_throttles(info, input)
         cls.check_access(info, input)
         cls.validate_required_attributes()
         return cls()
@@ -79,6 +122,27 @@ class MutationAccess(MutationAbstract):
     is_update = False
     is_delete = False
     model = None
+    policy = None  # Set django_graphql_bp.graphql.operations.policies.Policy to check access to instances by database
+
+    @classmethod
+    def get_object(cls, info: ResolveInfo, model: type, pk) -> models.Model:
+        try:
+            return super(MutationAccess, cls).get_object(info, model, pk)
+        except model.DoesNotExist:
+            if cls.policy is not None and model is cls.model:
+                # instance is not available to user
+                raise_forbidden_access_error()
+
+            raise
+
+    @classmethod
+    def get_queryset(cls, info: ResolveInfo, model: type) -> models.QuerySet:
+        qs = super(MutationAccess, cls).get_queryset(info, model)
+
+        if cls.policy is not None and model is cls.model:
+            qs = cls.policy.filter(qs, info.context.user)
+
+        return qs
 
     @classmethod
     def get_model_from_input(cls, info: ResolveInfo, input: dict) -> models.Model:
@@ -91,7 +155,7 @@ class MutationAccess(MutationAbstract):
         if cls.is_update and not input_value:
             model = cls.get_model_from_instance(info, input)
         else:
-            model = ObjectHelper.multi_getattr(model_class.objects.get(pk=input_value), cls.input_access)
+            model = ObjectHelper.multi_getattr(cls.get_object(info, model_class, input_value), cls.input_access)
 
         return model
 
@@ -101,11 +165,12 @@ class MutationAccess(MutationAbstract):
 
     @classmethod
     def check_access(cls, info: ResolveInfo, input: dict):
-        """ Only authorized user who is in staff """
+        """ Only authorized staff user, or any authorized user to instances available by policy if it is set """
         if not info.context.user.is_authenticated:
             raise_unathorized_error()
 
-        if not info.context.user.is_staff:
+        if (cls.policy is None or cls.is_create) and not info.context.user.is_staff:
+            # policy filters existing instances only
             raise_forbidden_access_error()
 
 
@@ -164,7 +229,22 @@ class MutationCreate(MutationAbstract):
 
 
 class MutationUpdate(MutationCreate):
+    """
+    Updates instance with "pk" input. Form needs the current row, so instance is loaded by query scoped with policy of
+    MutationAccess and locked until it is saved in the same transaction, the row cannot change between the access check
+    and the write.
+    """
     model = None  # Set model of django.db.models.Model type
+    partial = True  # Validate and save only submitted fields if form is UpdateForm
+
+    @classmethod
+    def get_form(cls, info: ResolveInfo, input: dict) -> forms.ModelForm:
+        form = super(MutationUpdate, cls).get_form(info, input)
+
+        if isinstance(form, UpdateForm):
+            form.partial = cls.partial
+
+        return form
 
     @classmethod
     def validate_required_attributes(cls):
@@ -173,7 +253,17 @@ class MutationUpdate(MutationCreate):
 
     @classmethod
     def get_instance(cls, info: ResolveInfo, input: dict) -> models.Model:
-        return cls.model.objects.get(pk=input.get('pk'))
+        return cls.get_object(info, cls.model, input.get('pk'))
+
+    @classmethod
+    def get_queryset(cls, info: ResolveInfo, model: type) -> models.QuerySet:
+        qs = super(MutationUpdate, cls).get_queryset(info, model)
+        return qs.select_for_update(of=('self',)) if model is cls.model else qs
+
+    @classmethod
+    def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'MutationUpdate':
+        with transaction.atomic():
+            return super(MutationUpdate, cls).mutate_and_get_payload(root, info, **input)
 
 
 class MutationDelete(MutationAbstract):
@@ -188,7 +278,7 @@ class MutationDelete(MutationAbstract):
 
     @classmethod
     def get_instance(cls, info: ResolveInfo, input: dict) -> models.Model:
-        return cls.model.objects.get(pk=input.get('pk'))
+        return cls.get_object(info, cls.model, input.get('pk'))
 
     @classmethod
     def after_delete(cls, info: ResolveInfo, input: dict, instance: models.Model) -> 'MutationDelete':
@@ -198,6 +288,26 @@ class MutationDelete(MutationAbstract):
     def delete(cls, info: ResolveInfo, input: dict, instance: models.Model):
         instance.delete()
 
+    @classmethod
+    def update_instance(cls, info: ResolveInfo, instance: models.Model, **values: dict):
+        """
+        Sets values with one UPDATE query of given columns only, post_save is not sent. Query is scoped by get_queryset,
+        so policy of MutationAccess is checked by the same query.
+        """
+        model = instance._meta.model
+
+        for field in instance._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                values[field.name] = field.pre_save(instance, False)
+
+        if not cls.get_queryset(info, model).filter(pk=instance.pk).update(**values):
+            raise model.DoesNotExist('%s matching query does not exist.' % model._meta.object_name)
+
+        for name, value in values.items():
+            setattr(instance, name, value)
+
+        cache.invalidate(instance._meta.model)
+
     @classmethod
     def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'MutationDelete':
         super(MutationDelete, cls).mutate_and_get_payload(root, info, **input)
@@ -207,9 +317,338 @@ class MutationDelete(MutationAbstract):
 
 
 class MutationSoftDelete(MutationDelete):
-    is_deleted_attribute = 'is_deleted'
-
+    """ Marks instance of django_graphql_bp.core.models.SoftDeleteModel as deleted by its "is_deleted_attribute" """
     @classmethod
     def delete(cls, info: ResolveInfo, input: dict, instance: models.Model):
-        setattr(instance, cls.is_deleted_attribute, True)
-        instance.save()
+        cls.update_instance(info, instance, **{instance.is_deleted_attribute: True})
+
+
+class MutationRequestUpload(MutationAbstract):
+    """
+    Returns presigned POST to upload file of "field" of "model" directly to storage (e.g. S3MediaStorage) instead of
+    posting it through Django. Client posts "uploadFields" (JSON object) and "file" to "url" and passes signed "key" to
+    related MutationConfirmUpload.
+    """
+    key = graphene.String()
+    upload_fields = graphene.String()
+    url = graphene.String()
+
+    allowed_extension = None  # Set list of allowed extensions if validation required
+    expires_in = 3600
+    field = None  # Set name of django.db.models.FileField of model
+    max_size = None  # Set maximum size of file in bytes if validation required
+    model = None  # Set model of django.db.models.Model type
+
+    @classmethod
+    def validate_required_attributes(cls):
+        cls.validate_required_attribute('field', str)
+        cls.validate_required_attribute('model', models.Model)
+
+    @classmethod
+    def get_name(cls, info: ResolveInfo, input: dict) -> str:
+        """ Name of file in storage generated by "upload_to" of field """
+        filename = input.get('filename', '')
+        extension = filename.split('.')[-1]
+
+        if cls.allowed_extension and extension not in cls.allowed_extension:
+            raise NameError('File extension should be: {}.'.format(', '.join(cls.allowed_extension)))
+
+        return cls.model._meta.get_field(cls.field).generate_filename(cls.model(), filename)
+
+    @classmethod
+    def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'MutationRequestUpload':
+        super(MutationRequestUpload, cls).mutate_and_get_payload(root, info, **input)
+        storage = cls.model._meta.get_field(cls.field).storage
+
+        if not hasattr(storage, 'get_presigned_upload'):
+            raise NotImplementedError('Storage {} does not support direct uploads.'.format(storage.__class__.__name__))
+
+        name = cls.get_name(info, input)
+        upload = storage.get_presigned_upload(name, input.get('content_type'), cls.max_size, cls.expires_in)
+        return cls(ok=True, key=signing.dumps(name, salt=get_upload_salt(cls.model, cls.field)),
+                   upload_fields=json.dumps(upload['fields']), url=upload['url'])
+
+
+class MutationConfirmUpload(MutationCreate):
+    """
+    Creates instance with file uploaded by client after MutationRequestUpload, file itself is not downloaded. Key is
+    accepted once, so one upload is not attached to several instances: "field" should be unique, concurrent confirms of
+    the same key are rejected by its unique index.
+    """
+    expires_in = 3600
+    field = None  # Set name of django.db.models.FileField of model
+
+    @classmethod
+    def validate_required_attributes(cls):
+        cls.validate_required_attribute('field', str)
+        cls.validate_required_attribute('form', forms.ModelForm)
+
+    @classmethod
+    def before_save(cls, info: ResolveInfo, input: dict, form: forms.ModelForm) -> bool:
+        file = getattr(form.instance, cls.field)
+
+        if form.instance._meta.model._base_manager.filter(**{cls.field: file.name}).exists():
+            form.add_error(cls.field, 'File has already been confirmed.')
+            return False
+
+        if not file.storage.exists(file.name):
+            form.add_error(cls.field, 'File has not been uploaded.')
+            return False
+
+        return True
+
+    @classmethod
+    def save(cls, info: ResolveInfo, input: dict, form: forms.ModelForm):
+        with transaction.atomic():
+            super(MutationConfirmUpload, cls).save(info, input, form)
+
+    @classmethod
+    def validate_and_save_form(cls, info: ResolveInfo, input: dict, form: forms.ModelForm) -> 'MutationConfirmUpload':
+        try:
+            return super(MutationConfirmUpload, cls).validate_and_save_form(info, input, form)
+        except IntegrityError:
+            file = getattr(form.instance, cls.field)
+
+            if not form.instance._meta.model._base_manager.filter(**{cls.field: file.name}).exists():
+                raise
+
+            form.add_error(cls.field, 'File has already been confirmed.')
+            return cls.validation_error(form)
+
+    @classmethod
+    def get_form(cls, info: ResolveInfo, input: dict) -> forms.ModelForm:
+        model = cls.form._meta.model
+
+        try:
+            name = signing.loads(input.get('key'), salt=get_upload_salt(model, cls.field), max_age=cls.expires_in)
+        except signing.BadSignature:
+            raise PermissionError('Upload key is invalid or expired.')
+
+        # initial value of file field is taken by form if file is not posted
+        return cls.form(input, {}, instance=model(**{cls.field: name}))
+
+
+def get_upload_salt(model: type, field: str) -> str:
+    return 'django_graphql_bp.upload.{}.{}'.format(model._meta.label_lower, field)
+
+
+class MutationBulkCreate(MutationAbstract):
+    """
+    Creates instances from list of "items" input with one INSERT query. All items are validated with "form" and written
+    in one transaction only if all of them are valid, otherwise validation errors are returned in order of items.
+    Files of item are posted under "<field name>.<index of item>.originFileObj" names.
+    """
+    validation_errors = graphene.List(graphene.String)
+
+    form = None  # Set form of django.forms.ModelForm type
+    nodes = None  # Set nodes of graphene.List(graphene_django.DjangoObjectType)
+
+    @classmethod
+    def validation_error(cls, forms_list: [forms.ModelForm]) -> 'MutationBulkCreate':
+        return cls(ok=False, validation_errors=[json.dumps(form.errors) if form.errors else None for form in forms_list])
+
+    @classmethod
+    def validation_success(cls, instances: [models.Model]) -> 'MutationBulkCreate':
+        return cls(ok=True, nodes=instances)
+
+    @classmethod
+    def validate_required_attributes(cls):
+        cls.validate_required_attribute('form', forms.ModelForm)
+
+    @classmethod
+    def before_save(cls, info: ResolveInfo, input: dict, forms_list: [forms.ModelForm]) -> bool:
+        return True
+
+    @classmethod
+    def get_model(cls) -> type:
+        return cls.form._meta.model
+
+    @classmethod
+    def save(cls, info: ResolveInfo, input: dict, forms_list: [forms.ModelForm]) -> [models.Model]:
+        instances = [form.save(commit=False) for form in forms_list]
+        cls.get_model().objects.bulk_create(instances)
+        return instances
+
+    @classmethod
+    def validate_and_save_forms(cls, info: ResolveInfo, input: dict,
+                                forms_list: [forms.ModelForm]) -> 'MutationBulkCreate':
+        if all([form.is_valid() for form in forms_list]) and cls.before_save(info, input, forms_list):
+            with transaction.atomic():
+                instances = cls.save(info, input, forms_list)
+
+                for form in forms_list:
+                    form.save_m2m()
+
+            # bulk writes do not send post_save signals
+            cache.invalidate(cls.get_model())
+            return cls.validation_success(instances)
+        else:
+            return cls.validation_error(forms_list)
+
+    @classmethod
+    def get_form(cls, info: ResolveInfo, input: dict, item: dict, index: int, instance: models.Model = None):
+        return cls.form(item, cls.get_item_files(info, index), instance=instance)
+
+    @classmethod
+    def get_forms(cls, info: ResolveInfo, input: dict) -> [forms.ModelForm]:
+        return [cls.get_form(info, input, item, index) for index, item in enumerate(cls.get_items(input))]
+
+    @classmethod
+    def get_item_files(cls, info: ResolveInfo, index: int) -> dict:
+        files = {}
+        expression = re.compile(r'(.+)\.{}\.originFileObj$'.format(index))
+
+        for key, file in info.context.FILES.items():
+            match = expression.match(key)
+
+            if match:
+                files[match.group(1)] = file
+
+        return files
+
+    @classmethod
+    def get_items(cls, input: dict) -> [dict]:
+        return input.get('items') or []
+
+    @classmethod
+    def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'MutationBulkCreate':
+        super(MutationBulkCreate, cls).mutate_and_get_payload(root, info, **input)
+        return cls.validate_and_save_forms(info, input, cls.get_forms(info, input))
+
+
+class MutationBulkUpdate(MutationBulkCreate):
+    """
+    Updates instances from list of "items" input with "pk" of instances with one bulk UPDATE query. Instances are loaded
+    with one query and locked until they are saved, same as instance of MutationUpdate.
+    """
+    model = None  # Set model of django.db.models.Model type
+    partial = True  # Validate only submitted fields of items if form is UpdateForm
+
+    @classmethod
+    def before_save(cls, info: ResolveInfo, input: dict, forms_list: [forms.ModelForm]) -> bool:
+        """ Each instance is updated by one item only """
+        counts = Counter(form.instance.pk for form in forms_list)
+
+        for form in forms_list:
+            if counts[form.instance.pk] > 1:
+                form.add_error(None, 'Item with the same pk has already been submitted.')
+
+        return max(counts.values(), default=0) <= 1 and super(MutationBulkUpdate, cls).before_save(
+            info, input, forms_list)
+
+    @classmethod
+    def get_form(cls, info: ResolveInfo, input: dict, item: dict, index: int, instance: models.Model = None):
+        form = super(MutationBulkUpdate, cls).get_form(info, input, item, index, instance)
+
+        if isinstance(form, UpdateForm):
+            form.partial = cls.partial
+
+        return form
+
+    @classmethod
+    def validate_required_attributes(cls):
+        cls.validate_required_attribute('form', forms.ModelForm)
+        cls.validate_required_attribute('model', models.Model)
+
+    @classmethod
+    def get_forms(cls, info: ResolveInfo, input: dict) -> [forms.ModelForm]:
+        """
+        Instances are loaded with one query into identity map of get_object(), so instance that does not exist or is not
+        available by policy of MutationAccess raises the same error as for single update (and bulk delete)
+        """
+        items = cls.get_items(input)
+        instances = cls.get_instances(info, input, [item.get('pk') for item in items])
+
+        if info.context is not None:
+            info.context.graphql_instances.update(
+                {(cls.model, pk): instance for pk, instance in instances.items()})
+
+        return [cls.get_form(info, input, item, index, cls.get_object(info, cls.model, item.get('pk')))
+                for index, item in enumerate(items)]
+
+    @classmethod
+    def get_instances(cls, info: ResolveInfo, input: dict, pks: list) -> dict:
+        return cls.get_queryset(info, cls.model).in_bulk(pks)
+
+    @classmethod
+    def get_queryset(cls, info: ResolveInfo, model: type) -> models.QuerySet:
+        qs = super(MutationBulkUpdate, cls).get_queryset(info, model)
+        return qs.select_for_update(of=('self',)) if model is cls.model else qs
+
+    @classmethod
+    def get_model(cls) -> type:
+        return cls.model
+
+    @classmethod
+    def get_update_fields(cls, input: dict, forms_list: [forms.ModelForm]) -> [str]:
+        """ Submitted fields of forms and fields updated on save (auto_now) """
+        fields = set()
+
+        for form in forms_list:
+            fields.update(name for name in form.fields if name in form.data or name in form.files)
+
+        for field in cls.model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                fields.add(field.name)
+
+        return sorted(fields)
+
+    @classmethod
+    def save(cls, info: ResolveInfo, input: dict, forms_list: [forms.ModelForm]) -> [models.Model]:
+        instances = [form.save(commit=False) for form in forms_list]
+        fields = cls.get_update_fields(input, forms_list)
+
+        for field in cls.model._meta.concrete_fields:
+            if field.name in fields:
+                for instance in instances:
+                    # sets auto_now values and commits files
+                    setattr(instance, field.attname, field.pre_save(instance, False))
+
+        if fields:
+            cls.model.objects.bulk_update(instances, fields)
+
+        return instances
+
+    @classmethod
+    def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'MutationBulkUpdate':
+        with transaction.atomic():
+            return super(MutationBulkUpdate, cls).mutate_and_get_payload(root, info, **input)
+
+
+class MutationBulkDelete(MutationAbstract):
+    """ Deletes instances by list of "pks" input with one DELETE ... WHERE pk IN (...) query """
+    model = None  # Set model of django.db.models.Model type
+    pks = graphene.List(graphene.Int)  # Need to return pks for client UI to update cache
+
+    @classmethod
+    def validate_required_attributes(cls):
+        cls.validate_required_attribute(attribute='model', base_type=models.Model)
+
+    @classmethod
+    def after_delete(cls, info: ResolveInfo, input: dict) -> 'MutationBulkDelete':
+        return cls(ok=True, pks=input.get('pks'))
+
+    @classmethod
+    def delete(cls, info: ResolveInfo, input: dict, pks: list):
+        """
+        Deletes all instances or none of them: if any of them does not exist or is not available by policy of
+        MutationAccess, the same error as for single delete is raised
+        """
+        qs = cls.get_queryset(info, cls.model).filter(pk__in=pks)
+        available = set(qs.values_list('pk', flat=True))
+
+        for pk in pks:
+            if pk not in available:
+                # raises DoesNotExist or, for instance not available by policy, forbidden access error
+                cls.get_object(info, cls.model, pk)
+
+        qs.delete()
+
+    @classmethod
+    def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'MutationBulkDelete':
+        super(MutationBulkDelete, cls).mutate_and_get_payload(root, info, **input)
+
+        with transaction.atomic():
+            cls.delete(info, input, input.get('pks') or [])
+
+        return cls.after_delete(info, input)
@@ -0,0 +1,130 @@
+from django.db.models.fields.reverse_related import ForeignObjectRel
+from django.db.models.query import QuerySet
+from django_graphql_bp.graphql.operations.loaders import PAGINATION_ARGUMENTS
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.utils import maybe_queryset
+from graphql.execution.base import ResolveInfo
+from graphql.language import ast
+
+INTERFACE_FIELDS = ('id', 'pk')  # resolved from primary key
+
+
+class QuerySetOptimizer:
+    """
+    Walks selection set of connection's nodes (including fragments) and applies to queryset:
+        select_related - for selected forward foreign keys, e.g. author;
+        prefetch_related - for selected reverse relations and many to many fields without filtering arguments, e.g.
+            images (filtered ones are loaded by ReverseForeignKeyLoader);
+        only - for selected columns, so large not requested columns (e.g. Article.content) are not fetched.
+
+    Columns are not restricted if a selected field is not a model field, unless node lists columns it depends on in
+    "field_dependencies" attribute, e.g. field_dependencies = {'renditions': ('image',)}.
+    """
+    def __init__(self, info: ResolveInfo, node: type, required_fields: tuple = ()):
+        self.info = info
+        self.model = node._meta.model
+        self.only = {self.model._meta.pk.name}
+        self.prefetch_related = set()
+        self.select_related = set()
+        self.is_restricted = True
+
+        for field in required_fields:
+            self.only.add(field.lstrip('-'))
+
+        for field_ast in info.field_asts:
+            for edges in self.get_fields(field_ast.selection_set, 'edges'):
+                for node_ast in self.get_fields(edges.selection_set, 'node'):
+                    self.collect(node, node_ast.selection_set)
+
+    def collect(self, node: type, selection_set: ast.SelectionSet):
+        model_fields = self.get_model_fields(self.model)
+        dependencies = getattr(node, 'field_dependencies', {})
+
+        for field_ast in self.get_fields(selection_set):
+            name = to_snake_case(field_ast.name.value)
+
+            if name.startswith('__') or name in INTERFACE_FIELDS:
+                continue
+
+            if name in dependencies:
+                self.only.update(dependencies[name])
+                continue
+
+            field = model_fields.get(name)
+
+            if field is None:
+                self.is_restricted = False
+            elif (field.many_to_one or field.one_to_one) and field.concrete:
+                self.only.add(field.name)
+                self.select_related.add(field.name)
+                self.collect_related(field.name, field.related_model, field_ast.selection_set)
+            elif field.is_relation:
+                if all(argument.name.value in PAGINATION_ARGUMENTS for argument in field_ast.arguments or ()):
+                    self.prefetch_related.add(name)
+            else:
+                self.only.add(field.name)
+
+    def collect_related(self, path: str, model: type, selection_set: ast.SelectionSet):
+        model_fields = self.get_model_fields(model)
+
+        for field_ast in self.get_fields(selection_set):
+            field = model_fields.get(to_snake_case(field_ast.name.value))
+
+            if field is not None and field.concrete and (field.many_to_one or field.one_to_one):
+                self.select_related.add(path + '__' + field.name)
+                self.collect_related(path + '__' + field.name, field.related_model, field_ast.selection_set)
+
+    def get_fields(self, selection_set: ast.SelectionSet, name: str = None) -> [ast.Field]:
+        fields = []
+
+        if selection_set is None:
+            return fields
+
+        for selection in selection_set.selections:
+            if isinstance(selection, ast.Field):
+                if name is None or selection.name.value == name:
+                    fields.append(selection)
+            elif isinstance(selection, ast.FragmentSpread):
+                fragment = self.info.fragments.get(selection.name.value)
+
+                if fragment is not None:
+                    fields += self.get_fields(fragment.selection_set, name)
+            elif isinstance(selection, ast.InlineFragment):
+                fields += self.get_fields(selection.selection_set, name)
+
+        return fields
+
+    def get_model_fields(self, model: type) -> dict:
+        fields = {}
+
+        for field in model._meta.get_fields():
+            if isinstance(field, ForeignObjectRel):
+                fields[field.get_accessor_name()] = field
+            else:
+                fields[field.name] = field
+
+        return fields
+
+    def get_resolver(self, resolver):
+        """ Optimizes querysets returned by field's resolver, otherwise they override optimized one on merge """
+        def optimized_resolver(root, info: ResolveInfo, **args: dict):
+            iterable = maybe_queryset(resolver(root, info, **args))
+
+            if isinstance(iterable, QuerySet):
+                iterable = self.optimize(iterable)
+
+            return iterable
+
+        return optimized_resolver
+
+    def optimize(self, qs: QuerySet) -> QuerySet:
+        if self.select_related:
+            qs = qs.select_related(*sorted(self.select_related))
+
+        if self.prefetch_related:
+            qs = qs.prefetch_related(*sorted(self.prefetch_related))
+
+        if self.is_restricted:
+            qs = qs.only(*sorted(self.only))
+
+        return qs
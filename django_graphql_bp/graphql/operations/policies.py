@@ -0,0 +1,46 @@
+from django.db.models import Q
+from django.db.models.query import QuerySet
+
+
+class Policy:
+    """ Row level access rule compiled to queryset filter, so access is checked by database in the same query """
+    def filter(self, qs: QuerySet, user) -> QuerySet:
+        condition = self.get_condition(user)
+
+        if condition is None:
+            return qs.none()
+
+        return qs.filter(condition)
+
+    def get_condition(self, user) -> Q:
+        """ Returns condition of rows available to user, None if no rows are available """
+        raise NotImplementedError('Function get_condition for Policy class should be implemented.')
+
+
+class StaffPolicy(Policy):
+    """ All rows are available to staff user only """
+    def get_condition(self, user) -> Q:
+        if user.is_authenticated and user.is_staff:
+            return Q()
+
+        return None
+
+
+class OwnerPolicy(StaffPolicy):
+    """
+    Rows available to their owner (and staff if "staff" is True). Owner is referenced by dotted path from model to user
+    (same as "input_access" and "instance_access" of MutationAccess), e.g. 'author' for Article, 'article.author' for
+    ArticleImage or 'pk' for User.
+    """
+    def __init__(self, path: str, staff: bool = True):
+        self.lookup = path.replace('.', '__')
+        self.staff = staff
+
+    def get_condition(self, user) -> Q:
+        if self.staff and user.is_authenticated and user.is_staff:
+            return Q()
+
+        if not user.is_authenticated:
+            return None
+
+        return Q(**{self.lookup: user.pk})
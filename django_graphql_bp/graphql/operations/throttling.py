@@ -0,0 +1,124 @@
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+from django_graphql_bp.core.cache import LRUCache
+from graphql.execution.base import ResolveInfo
+
+
+def take_token(bucket: tuple, now: float, capacity: int, period: float) -> (tuple, float):
+    """
+    Token bucket of "capacity" tokens refilled in "period" seconds. Returns new state of bucket (tokens, updated) and
+    0 if token is taken, otherwise seconds until the next token.
+    """
+    rate = capacity / period
+    tokens, updated = bucket or (capacity, now)
+    tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+
+    return (tokens, now), (1 - tokens) / rate
+
+
+class LocalBackend:
+    """
+    Buckets of the current process in LRU cache of GRAPHQL_THROTTLE_MAX_SIZE keys (10000 by default), so memory is
+    bounded. Evicted bucket starts full again.
+    """
+    def __init__(self):
+        self.buckets = LRUCache(getattr(settings, 'GRAPHQL_THROTTLE_MAX_SIZE', 10000))
+        self.lock = threading.Lock()
+
+    def clear(self):
+        self.buckets.clear()
+
+    def take(self, key: str, capacity: int, period: float) -> float:
+        with self.lock:
+            bucket, retry_after = take_token(self.buckets.get(key), time.monotonic(), capacity, period)
+            self.buckets.set(key, bucket, period)
+
+        return retry_after
+
+
+class CacheBackend:
+    """
+    Buckets in GRAPHQL_THROTTLE_CACHE cache ('default' by default) shared by all processes, e.g. memcached or redis.
+    Read and write of bucket are not atomic, so concurrent attempts may slightly exceed the limit.
+    """
+    def __init__(self):
+        self.cache = caches[getattr(settings, 'GRAPHQL_THROTTLE_CACHE', 'default')]
+
+    def clear(self):
+        pass  # keys expire in period of their throttle
+
+    def take(self, key: str, capacity: int, period: float) -> float:
+        key = 'graphql:throttle:{}'.format(hashlib.sha256(key.encode('utf-8')).hexdigest())
+        bucket, retry_after = take_token(self.cache.get(key), time.time(), capacity, period)
+        self.cache.set(key, bucket, period)
+        return retry_after
+
+
+_backend = None
+
+
+def get_backend():
+    """ Process-wide backend of GRAPHQL_THROTTLE_BACKEND setting, e.g. LocalBackend (default) or CacheBackend """
+    global _backend
+
+    if _backend is None:
+        _backend = import_string(getattr(
+            settings, 'GRAPHQL_THROTTLE_BACKEND', 'django_graphql_bp.graphql.operations.throttling.LocalBackend'))()
+
+    return _backend
+
+
+class Throttle:
+    """
+    Allows "capacity" attempts per "period" seconds (refilled evenly) for every key, e.g. IP address. Limits can be
+    changed by GRAPHQL_THROTTLE_RATES setting, e.g. {'login_ip': (20, 60)}.
+    """
+    def __init__(self, scope: str, capacity: int, period: float):
+        self.capacity = capacity
+        self.period = period
+        self.scope = scope
+
+    def check(self, info: ResolveInfo, input: dict) -> float:
+        """ Returns 0 if attempt is allowed, otherwise seconds until the next allowed attempt """
+        key = self.get_key(info, input)
+
+        if not key:
+            return 0
+
+        rates = getattr(settings, 'GRAPHQL_THROTTLE_RATES', {})
+        capacity, period = rates.get(self.scope, (self.capacity, self.period))
+        return get_backend().take('{}:{}'.format(self.scope, key), capacity, period)
+
+    def get_key(self, info: ResolveInfo, input: dict) -> str:
+        raise NotImplementedError('Function get_key for Throttle class should be implemented.')
+
+
+class IPThrottle(Throttle):
+    """
+    Keyed by REMOTE_ADDR or by GRAPHQL_THROTTLE_IP_HEADER (e.g. 'HTTP_X_REAL_IP') if it is set by proxy. Only the last
+    address of comma separated header (e.g. 'HTTP_X_FORWARDED_FOR') is used, as it is appended by the proxy and the
+    rest comes from client.
+    """
+    def get_key(self, info: ResolveInfo, input: dict) -> str:
+        if info.context is None:
+            return None
+
+        address = info.context.META.get(getattr(settings, 'GRAPHQL_THROTTLE_IP_HEADER', 'REMOTE_ADDR'))
+        return address.split(',')[-1].strip() if address else address
+
+
+class InputThrottle(Throttle):
+    """ Keyed by normalized value of input field, e.g. email """
+    def __init__(self, scope: str, capacity: int, period: float, field: str = 'email'):
+        super(InputThrottle, self).__init__(scope, capacity, period)
+        self.field = field
+
+    def get_key(self, info: ResolveInfo, input: dict) -> str:
+        return str(input.get(self.field) or '').strip().lower()
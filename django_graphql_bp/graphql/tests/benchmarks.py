@@ -0,0 +1,73 @@
+import statistics
+import time
+import tracemalloc
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_graphql_bp.graphql.backends import get_backend
+from graphene import Schema
+
+
+class Benchmark:
+    """
+    Measures operations executed against schema with the same backend as GraphQLView. Every operation is executed
+    "warmup" times without measuring, "repeat" times to measure wall time (seconds) and once more to count queries and
+    peak memory allocated by Python (bytes), so tracing doesn't slow down timed runs. Results are plain dicts to dump
+    to JSON.
+    """
+    def __init__(self, schema: Schema, repeat: int = 5, warmup: int = 1):
+        self.backend = get_backend()
+        self.repeat = repeat
+        self.results = []
+        self.schema = schema
+        self.warmup = warmup
+
+    def execute(self, operation: str, context, variables: dict = None):
+        result = self.schema.execute(operation, context_value=context, variable_values=variables, backend=self.backend)
+
+        if result.errors:
+            raise RuntimeError('Operation has failed: {}'.format('; '.join(str(error) for error in result.errors)))
+
+        return result
+
+    def run(self, name: str, operation: str, context_factory, variables: dict = None, **extra: dict) -> dict:
+        """
+        :param context_factory: callable which returns new context (e.g. HttpRequest) for every execution, so request
+            scoped caches (loaders, identity map) are not shared by executions
+        :param extra: additional attributes of result, e.g. scale
+        """
+        for _ in range(self.warmup):
+            self.execute(operation, context_factory(), variables)
+
+        durations = []
+
+        for _ in range(self.repeat):
+            context = context_factory()
+            start = time.perf_counter()
+            self.execute(operation, context, variables)
+            durations.append(time.perf_counter() - start)
+
+        context = context_factory()
+
+        with CaptureQueriesContext(connection) as queries:
+            tracemalloc.start()
+
+            try:
+                self.execute(operation, context, variables)
+                peak_memory = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        result = {
+            'name': name,
+            'runs': self.repeat,
+            'time': {
+                'max': max(durations),
+                'median': statistics.median(durations),
+                'min': min(durations)
+            },
+            'queries': len(queries),
+            'peak_memory': peak_memory
+        }
+        result.update(extra)
+        self.results.append(result)
+        return result
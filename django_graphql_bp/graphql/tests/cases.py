@@ -1,5 +1,7 @@
 import json
 import random
+import re
+from collections import Counter
 from django_graphql_bp.graphql.operations import FORBIDDEN_ACCESS_ERROR, UNAUTHORIZED_ERROR
 from django_graphql_bp.graphql.tests import constructors
 from django_graphql_bp.user.forms import CreateUserForm
@@ -7,10 +9,11 @@ from django_graphql_bp.user.models import User
 from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.db import models
+from django.db import connection, models
 from django.db.models.fields.files import ImageFieldFile
 from django.http import HttpRequest
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils.module_loading import import_string
 from graphene import Schema
 from graphene.test import Client
@@ -18,6 +21,46 @@ from importlib import import_module
 
 
 class OperationTestCase(TestCase):
+    """
+    SQL queries of every executed operation are captured to "captured_queries". Declare budgets to check them for every
+    execution of operation, failure message reports duplicated query shapes (usually N+1 problem):
+        query_budgets = {'articles': 3}  # {operation name => maximum number of queries}
+        query_time_budgets = {'articles': 0.05}  # {operation name => maximum total time of queries in seconds}
+    """
+    captured_queries = []
+    query_budgets = {}
+    query_time_budgets = {}
+
+    def assert_queries(self, queries: [dict], max_count: int = None, max_time: float = None):
+        report = self.get_queries_report(queries)
+
+        if max_count is not None:
+            self.assertLessEqual(
+                len(queries), max_count,
+                'Check if {} queries are within budget of {} queries.\n{}'.format(len(queries), max_count, report))
+
+        if max_time is not None:
+            total_time = sum(float(query['time']) for query in queries)
+            self.assertLessEqual(
+                total_time, max_time,
+                'Check if {:.4f}s of queries is within budget of {}s.\n{}'.format(total_time, max_time, report))
+
+    def assert_no_duplicate_queries(self, queries: [dict]):
+        self.assertFalse(self.get_duplicate_queries(queries), 'Check if queries are not duplicated.\n{}'.format(
+            self.get_queries_report(queries)))
+
+    def execute_operation(self, operation: constructors.Operation, context: HttpRequest) -> {}:
+        with CaptureQueriesContext(connection) as queries:
+            result = Client(self.get_schema()).execute(operation.get_result(), context_value=context)
+
+        self.captured_queries = queries.captured_queries
+        name = operation.get_name()
+
+        if name in self.query_budgets or name in self.query_time_budgets:
+            self.assert_queries(self.captured_queries, self.query_budgets.get(name), self.query_time_budgets.get(name))
+
+        return result
+
     def get_data(self, context: HttpRequest, args: dict):
         if context is None:
             context = self.get_context_value()
@@ -73,6 +116,11 @@ class OperationTestCase(TestCase):
 
         return context
 
+    def get_duplicate_queries(self, queries: [dict]) -> [(str, int)]:
+        """ Query shapes (SQL with values replaced by placeholders) executed more than once and their counts """
+        shapes = Counter(self.get_query_shape(query['sql']) for query in queries)
+        return [(shape, count) for shape, count in shapes.most_common() if count > 1]
+
     def get_forbidden_access_message(self) -> str:
         return FORBIDDEN_ACCESS_ERROR
 
@@ -82,6 +130,22 @@ class OperationTestCase(TestCase):
     def get_operation_field_value(self, result: dict, operation_name: str, attribute_name: str):
         return result['data'][operation_name][attribute_name]
 
+    def get_queries_report(self, queries: [dict]) -> str:
+        lines = ['{} queries:'.format(len(queries))]
+        lines += ['  {}s {}'.format(query['time'], query['sql']) for query in queries]
+        duplicates = self.get_duplicate_queries(queries)
+
+        if duplicates:
+            lines.append('Duplicated query shapes:')
+            lines += ['  {} x {}'.format(count, shape) for shape, count in duplicates]
+
+        return '\n'.join(lines)
+
+    def get_query_shape(self, sql: str) -> str:
+        sql = re.sub(r"'(?:[^']|'')*'", '%s', sql)
+        sql = re.sub(r'\b\d+(?:\.\d+)?\b', '%s', sql)
+        return re.sub(r'\((?:%s, )+%s\)', '(%s, ...)', sql)
+
     def get_random_price(self) -> float:
         return float(round(random.uniform(0.01, 9.99), 2))
 
@@ -170,7 +234,7 @@ class MutationTestCase(OperationTestCase):
 
     def get_mutation_result(self, context: HttpRequest, args: dict) -> {}:
         context, args = self.get_data(context, args)
-        return Client(self.get_schema()).execute(self.get_mutation(**args).get_result(), context_value=context)
+        return self.execute_operation(self.get_mutation(**args), context)
 
     def get_node_attribute_value(self, result: dict, attribute_name: str):
         return self.get_operation_field_value(result, self.get_mutation().get_name(), 'node')[attribute_name]
@@ -236,7 +300,7 @@ class QueryTestCase(OperationTestCase):
 
     def get_query_result(self, context: HttpRequest, args: dict) -> {}:
         context, args = self.get_data(context, args)
-        return Client(self.get_schema()).execute(self.get_query(**args).get_result(), context_value=context)
+        return self.execute_operation(self.get_query(**args), context)
 
     def raised_error_test(self, error_message: str, context: HttpRequest = None, args: dict = None):
         result = self.get_query_result(context, args)
@@ -0,0 +1,256 @@
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from django.conf import settings
+from graphql.execution.base import ResolveInfo
+from graphql.language import ast
+
+DURATION_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+OTHER = 'other'  # label of operations and fields over GRAPHQL_TRACING_MAX_OPERATIONS and GRAPHQL_TRACING_MAX_FIELDS
+
+
+class Histogram:
+    """ Cumulative histogram in Prometheus format, the last bucket is +Inf """
+    def __init__(self, buckets: tuple):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def get_cumulative_counts(self) -> list:
+        counts, total = [], 0
+
+        for count in self.counts:
+            total += count
+            counts.append(total)
+
+        return counts
+
+
+class MetricsRegistry:
+    """
+    In-process aggregates of traced operations: histograms of duration, number and duration of SQL queries per
+    operation, and totals of SQL queries per operation and field path. Every process has own registry, so metrics
+    endpoint of every process (worker) should be scraped.
+    """
+    def __init__(self):
+        self.fields = {}
+        self.lock = threading.Lock()
+        self.operations = {}
+
+    def get_field_key(self, operation: str, field: str) -> tuple:
+        """ Number of field labels is limited too, e.g. if schema is large """
+        key = (operation, field)
+
+        if key not in self.fields and len(self.fields) >= getattr(settings, 'GRAPHQL_TRACING_MAX_FIELDS', 1000):
+            return operation, OTHER
+
+        return key
+
+    def get_operation_label(self, operation_name: str) -> str:
+        """ Number of labels is limited, as operation names come from clients """
+        operation_name = operation_name or 'anonymous'
+
+        if operation_name not in self.operations and \
+                len(self.operations) >= getattr(settings, 'GRAPHQL_TRACING_MAX_OPERATIONS', 100):
+            return OTHER
+
+        return operation_name
+
+    def observe(self, tracer: 'Tracer'):
+        with self.lock:
+            operation = self.get_operation_label(tracer.operation_name)
+
+            if operation not in self.operations:
+                self.operations[operation] = {
+                    'duration': Histogram(getattr(settings, 'GRAPHQL_TRACING_BUCKETS', DURATION_BUCKETS)),
+                    'queries': Histogram(QUERIES_BUCKETS),
+                    'query_duration': Histogram(getattr(settings, 'GRAPHQL_TRACING_BUCKETS', DURATION_BUCKETS)),
+                }
+
+            histograms = self.operations[operation]
+            histograms['duration'].observe(tracer.duration)
+            histograms['queries'].observe(tracer.queries)
+            histograms['query_duration'].observe(tracer.query_duration)
+
+            for field, (count, duration) in tracer.fields.items():
+                totals = self.fields.setdefault(self.get_field_key(operation, field), [0, 0])
+                totals[0] += count
+                totals[1] += duration
+
+    def render(self) -> str:
+        """ Metrics in Prometheus text exposition format """
+        lines = []
+
+        with self.lock:
+            for name, key, description in (
+                    ('graphql_operation_duration_seconds', 'duration', 'Duration of GraphQL operations.'),
+                    ('graphql_operation_sql_queries', 'queries', 'Number of SQL queries per GraphQL operation.'),
+                    ('graphql_operation_sql_duration_seconds', 'query_duration',
+                     'Duration of SQL queries per GraphQL operation.')):
+                lines += ['# HELP {} {}'.format(name, description), '# TYPE {} histogram'.format(name)]
+
+                for operation, histograms in sorted(self.operations.items()):
+                    lines += self.render_histogram(name, {'operation': operation}, histograms[key])
+
+            for name, index, description in (
+                    ('graphql_field_sql_queries_total', 0, 'Number of SQL queries by GraphQL field path.'),
+                    ('graphql_field_sql_duration_seconds_total', 1, 'Duration of SQL queries by GraphQL field path.')):
+                lines += ['# HELP {} {}'.format(name, description), '# TYPE {} counter'.format(name)]
+
+                for (operation, field), totals in sorted(self.fields.items()):
+                    lines.append('{}{} {}'.format(
+                        name, self.render_labels({'operation': operation, 'field': field}), totals[index]))
+
+        return '\n'.join(lines) + '\n'
+
+    def render_histogram(self, name: str, labels: dict, histogram: Histogram) -> list:
+        lines = []
+        bounds = [repr(float(bucket)) for bucket in histogram.buckets] + ['+Inf']
+
+        for bound, count in zip(bounds, histogram.get_cumulative_counts()):
+            lines.append('{}_bucket{} {}'.format(name, self.render_labels(dict(labels, le=bound)), count))
+
+        lines.append('{}_sum{} {}'.format(name, self.render_labels(labels), histogram.sum))
+        lines.append('{}_count{} {}'.format(name, self.render_labels(labels), histogram.count))
+        return lines
+
+    def render_labels(self, labels: dict) -> str:
+        return '{' + ','.join('{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"'))
+                              for name, value in sorted(labels.items())) + '}'
+
+    def reset(self):
+        with self.lock:
+            self.fields = {}
+            self.operations = {}
+
+
+registry = MetricsRegistry()
+
+
+class Tracer:
+    """
+    Database execute wrapper which attributes every SQL query to the operation and to the path of field being resolved
+    (e.g. "articles.edges.node.images", list indexes are omitted and aliases are replaced by names of schema fields),
+    "" for queries outside of resolvers. If
+    GRAPHQL_TRACING_SQL_COMMENTS is True, the query is tagged with comment, e.g.
+    /*field='articles',operation='Articles'*/, so it can be found in database logs and pg_stat_statements.
+    """
+    def __init__(self, operation_name: str):
+        self.duration = None
+        self.field_paths = {}  # response keys => path of schema fields, see get_field_path()
+        self.fields = {}
+        self.operation_name = operation_name
+        self.path = ''
+        self.queries = 0
+        self.query_duration = 0
+        self.sql_comments = getattr(settings, 'GRAPHQL_TRACING_SQL_COMMENTS', False)
+        self.start = time.perf_counter()
+
+    def __call__(self, execute, sql: str, params, many: bool, context: dict):
+        path = self.path
+
+        if self.sql_comments:
+            sql = '{} {}'.format(sql, self.get_sql_comment(path))
+
+        start = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            totals = self.fields.setdefault(path, [0, 0])
+            totals[0] += 1
+            totals[1] += duration
+            self.queries += 1
+            self.query_duration += duration
+
+    def finish(self):
+        self.duration = time.perf_counter() - self.start
+        registry.observe(self)
+
+    def get_sql_comment(self, path: str) -> str:
+        # names and paths of GraphQL are word characters, the rest is dropped to keep the comment and params safe
+        values = {'field': path, 'operation': self.operation_name or 'anonymous'}
+        return '/*{}*/'.format(','.join("{}='{}'".format(name, re.sub(r'[^\w.]', '', value))
+                                        for name, value in sorted(values.items())))
+
+
+def get_fields(selection_set: ast.SelectionSet, response_key: str, fragments: dict) -> [ast.Field]:
+    """ Fields selected under response key (alias or name), including ones of fragments """
+    fields = []
+
+    for selection in selection_set.selections if selection_set is not None else ():
+        if isinstance(selection, ast.Field):
+            if (selection.alias or selection.name).value == response_key:
+                fields.append(selection)
+        elif isinstance(selection, ast.InlineFragment):
+            fields += get_fields(selection.selection_set, response_key, fragments)
+        elif isinstance(selection, ast.FragmentSpread) and selection.name.value in fragments:
+            fields += get_fields(fragments[selection.name.value].selection_set, response_key, fragments)
+
+    return fields
+
+
+def get_field_path(info: ResolveInfo) -> str:
+    """
+    Path of schema fields being resolved in traced request, None if request is not traced. Response keys of path are
+    chosen by client (aliases), so they are replaced by field names to keep number of paths bounded by schema.
+    """
+    tracer = getattr(info.context, 'graphql_tracer', None)
+
+    if tracer is None:
+        return None
+
+    keys = tuple(key for key in info.path if not isinstance(key, int))
+
+    if keys not in tracer.field_paths:
+        names = []
+        selection_sets = [info.operation.selection_set]
+
+        for key in keys:
+            fields = [field for selection_set in selection_sets
+                      for field in get_fields(selection_set, key, info.fragments)]
+
+            if not fields:
+                break
+
+            names.append(fields[0].name.value)
+            selection_sets = [field.selection_set for field in fields]
+
+        tracer.field_paths[keys] = '.'.join(names)
+
+    return tracer.field_paths[keys]
+
+
+@contextmanager
+def field_path(context, path: str):
+    """ Attributes queries inside of the block to field path in tracer of the request if the request is traced """
+    tracer = getattr(context, 'graphql_tracer', None)
+
+    if tracer is None or path is None:
+        yield
+        return
+
+    parent_path = tracer.path
+    tracer.path = path
+
+    try:
+        yield
+    finally:
+        tracer.path = parent_path
+
+
+class TracingMiddleware:
+    """ Keeps path of field being resolved in tracer of the request, see GraphQLView """
+    def resolve(self, next, root, info: ResolveInfo, **args: dict):
+        with field_path(info.context, get_field_path(info)):
+            return next(root, info, **args)
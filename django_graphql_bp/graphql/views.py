@@ -0,0 +1,359 @@
+import hashlib
+import json
+import threading
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
+from django.views import View
+from django_graphql_bp.core import routers
+from django_graphql_bp.graphql import cache, tracing
+from django_graphql_bp.graphql.export import Export
+from django_graphql_bp.graphql.backends import get_backend
+from django_graphql_bp.graphql.middleware import OperationTiming, TimingMiddleware
+from django_graphql_bp.user import tokens
+from graphene.utils.str_converters import to_snake_case
+from graphene_django.settings import graphene_settings
+from graphene_django.views import GraphQLView as BaseGraphQLView, HttpError
+from graphql.execution import ExecutionResult
+from graphql.language import ast
+from graphql.language.printer import print_ast
+from graphql.utils.get_operation_ast import get_operation_ast
+
+PERSISTED_QUERY_NOT_FOUND_ERROR = 'PersistedQueryNotFound'
+
+
+class RequestBackend:
+    """
+    Backend of one request which asks backend of view for every document once, so the document is parsed, hashed and
+    counted in stats of backend once although view, response cache and router use it.
+    """
+    def __init__(self, backend):
+        self.backend = backend
+        self.documents = {}
+
+    def document_from_string(self, schema, document_string: str):
+        if document_string not in self.documents:
+            try:
+                self.documents[document_string] = self.backend.document_from_string(schema, document_string), None
+            except Exception as error:
+                self.documents[document_string] = None, error
+
+        document, error = self.documents[document_string]
+
+        if error is not None:
+            raise error
+
+        return document
+
+
+class GraphQLView(BaseGraphQLView):
+    """
+    Uses cached documents backend and supports Automatic Persisted Queries: client sends sha256 hash of query in
+    {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "..."}}} only. If the hash is unknown
+    "PersistedQueryNotFound" error is returned and client retries with both query and hash to store it. Queries are
+    stored in GRAPHQL_PERSISTED_QUERIES_CACHE cache ('default' by default).
+
+    Data of query operations is cached for anonymous and staff users if all selected root fields have "cache_timeout",
+    see SearchConnectionField. Responses are stored in GRAPHQL_RESPONSE_CACHE cache ('default' by default) if size of
+    data is not greater than GRAPHQL_RESPONSE_CACHE_MAX_SIZE bytes (1 MB by default).
+
+    Share of operations set by GRAPHQL_TIMING_SAMPLE_RATE (0 by default, 1 for all) gets durations of operation, SQL
+    queries and resolvers (aggregated by field) in "timing" of response extensions and, if GRAPHQL_SERVER_TIMING is
+    True, in Server-Timing header. Operations slower than GRAPHQL_SLOW_OPERATION_THRESHOLD seconds are logged.
+
+    If GRAPHQL_TRACING is True, SQL queries of every operation are attributed to operation and field path and
+    aggregated in process, see MetricsView.
+
+    Requests with "Authorization: Bearer <access token>" header are authorized by the token without session and user
+    queries, see django_graphql_bp.user.tokens.
+
+    Reads of query operations are routed to replicas by django_graphql_bp.core.routers.ReplicaRouter if it is set in
+    DATABASE_ROUTERS, reads of viewer are pinned to primary for DATABASE_PRIMARY_STICKINESS seconds after mutation.
+    """
+    persisted_query_lock = threading.Lock()
+    persisted_query_stats = {'hits': 0, 'misses': 0}  # of the current process, see MetricsView
+    persisted_query_timeout = None  # store queries until cache evicts them
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('backend', get_backend())
+
+        middleware = kwargs.get('middleware')
+        middleware = list(graphene_settings.MIDDLEWARE if middleware is None else middleware)
+
+        if getattr(settings, 'GRAPHQL_TIMING_SAMPLE_RATE', 0):
+            middleware.append(TimingMiddleware)
+
+        if getattr(settings, 'GRAPHQL_TRACING', False):
+            middleware.append(tracing.TracingMiddleware)
+
+        if middleware:
+            kwargs['middleware'] = middleware
+
+        super(GraphQLView, self).__init__(*args, **kwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        tokens.authenticate(request)
+        response = super(GraphQLView, self).dispatch(request, *args, **kwargs)
+        timing = getattr(request, 'graphql_timing', None)
+
+        if timing is not None and timing.trace_resolvers and getattr(settings, 'GRAPHQL_SERVER_TIMING', False):
+            response['Server-Timing'] = timing.get_server_timing()
+
+        return response
+
+    def get_backend(self, request) -> RequestBackend:
+        if getattr(request, 'graphql_backend', None) is None:
+            request.graphql_backend = RequestBackend(super(GraphQLView, self).get_backend(request))
+
+        return request.graphql_backend
+
+    def get_graphql_params(self, request, data: dict) -> tuple:
+        query, variables, operation_name, id = super(GraphQLView, self).get_graphql_params(request, data)
+        persisted_query = self.get_extensions(request, data).get('persistedQuery')
+
+        if persisted_query:
+            query = self.get_persisted_query(query, persisted_query.get('sha256Hash'))
+
+        return query, variables, operation_name, id
+
+    def get_extensions(self, request, data: dict) -> dict:
+        extensions = request.GET.get('extensions') or data.get('extensions') or {}
+
+        if isinstance(extensions, str):
+            try:
+                extensions = json.loads(extensions)
+            except ValueError:
+                raise HttpError(HttpResponseBadRequest('Extensions are invalid JSON.'))
+
+        return extensions
+
+    def get_persisted_query(self, query: str, query_hash: str) -> str:
+        cache = caches[getattr(settings, 'GRAPHQL_PERSISTED_QUERIES_CACHE', 'default')]
+        key = 'graphql:persisted-query:{}'.format(query_hash)
+
+        if query:
+            if hashlib.sha256(query.encode('utf-8')).hexdigest() != query_hash:
+                raise HttpError(HttpResponseBadRequest('Provided sha256Hash does not match query.'))
+
+            cache.set(key, query, self.persisted_query_timeout)
+            return query
+
+        query = cache.get(key)
+
+        with self.persisted_query_lock:
+            self.persisted_query_stats['hits' if query is not None else 'misses'] += 1
+
+        if query is None:
+            raise HttpError(HttpResponse(status=200), PERSISTED_QUERY_NOT_FOUND_ERROR)
+
+        return query
+
+    def execute_graphql_request(self, request, data: dict, query: str, variables: dict, operation_name: str,
+                                show_graphiql: bool = False) -> ExecutionResult:
+        timing = request.graphql_timing = OperationTiming(OperationTiming.is_sampled())
+        wrappers = [timing]
+
+        if getattr(settings, 'GRAPHQL_TRACING', False):
+            request.graphql_tracer = tracing.Tracer(operation_name)
+            wrappers.append(request.graphql_tracer)
+
+        with ExitStack() as stack:
+            for connection in connections.all():
+                for wrapper in wrappers:
+                    stack.enter_context(connection.execute_wrapper(wrapper))
+
+            stack.enter_context(routers.operation(
+                self.get_operation_type(request, query, operation_name), routers.get_viewer_key(request)))
+            result = self.execute_cached_graphql_request(
+                request, data, query, variables, operation_name, show_graphiql)
+
+        timing.finish()
+
+        if getattr(request, 'graphql_tracer', None) is not None:
+            request.graphql_tracer.finish()
+
+        timing.log_if_slow(operation_name)
+
+        if timing.trace_resolvers and result is not None:
+            result.extensions = dict(getattr(result, 'extensions', None) or {}, timing=timing.as_dict())
+
+        return result
+
+    def execute_cached_graphql_request(self, request, data: dict, query: str, variables: dict, operation_name: str,
+                                       show_graphiql: bool = False) -> ExecutionResult:
+        cache_key, cache_timeout = self.get_response_cache_params(request, query, variables, operation_name)
+
+        if cache_key is not None:
+            result = cache.get_cache().get(cache_key)
+
+            if result is not None:
+                return ExecutionResult(data=result)
+
+        result = super(GraphQLView, self).execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql)
+
+        if cache_key is not None and result is not None and not result.errors and not result.invalid:
+            size = len(json.dumps(result.data, cls=DjangoJSONEncoder))
+
+            if size <= getattr(settings, 'GRAPHQL_RESPONSE_CACHE_MAX_SIZE', 1024 * 1024):
+                cache.get_cache().set(cache_key, result.data, cache_timeout)
+
+        return result
+
+    def get_operation_type(self, request, query: str, operation_name: str) -> str:
+        """ Type of operation, e.g. 'query' or 'mutation', None if query is invalid """
+        operation = self.get_operation(request, query, operation_name)[1]
+        return operation.operation if operation is not None else None
+
+    def get_operation(self, request, query: str, operation_name: str) -> tuple:
+        """ Document of request and its operation to be executed, (None, None) if query is invalid """
+        if not query:
+            return None, None
+
+        try:
+            document = self.get_backend(request).document_from_string(self.schema, query)
+        except Exception:
+            return None, None
+
+        return document, get_operation_ast(document.document_ast, operation_name)
+
+    def get_response(self, request, data: dict, show_graphiql: bool = False) -> tuple:
+        """ Same as parent one, but with "extensions" of execution result in response """
+        query, variables, operation_name, id = self.get_graphql_params(request, data)
+        execution_result = self.execute_graphql_request(
+            request, data, query, variables, operation_name, show_graphiql)
+        status_code = 200
+
+        if execution_result:
+            response = {}
+
+            if execution_result.errors:
+                response['errors'] = [self.format_error(e) for e in execution_result.errors]
+
+            if execution_result.invalid:
+                status_code = 400
+            else:
+                response['data'] = execution_result.data
+
+            if getattr(execution_result, 'extensions', None):
+                response['extensions'] = execution_result.extensions
+
+            if self.batch:
+                response['id'] = id
+                response['status'] = status_code
+
+            result = self.json_encode(request, response, pretty=show_graphiql)
+        else:
+            result = None
+
+        return result, status_code
+
+    def get_response_cache_params(self, request, query: str, variables: dict, operation_name: str) -> tuple:
+        """ Returns key and timeout for response cache or (None, None) if response should not be cached """
+        viewer = self.get_viewer_class(request)
+
+        if viewer is None:
+            return None, None
+
+        document, operation = self.get_operation(request, query, operation_name)
+
+        if operation is None or operation.operation != 'query':
+            return None, None
+
+        fields = self.schema.get_query_type().graphene_type._meta.fields
+        models = []
+        timeouts = []
+
+        for selection in operation.selection_set.selections:
+            field = None
+
+            if isinstance(selection, ast.Field):
+                field = fields.get(to_snake_case(selection.name.value))
+
+            if not getattr(field, 'cache_timeout', None):
+                return None, None
+
+            models += field.get_cache_models()
+            timeouts.append(field.cache_timeout)
+
+        if not hasattr(document, 'normalized_hash'):
+            document.normalized_hash = hashlib.sha256(print_ast(document.document_ast).encode('utf-8')).hexdigest()
+
+        key = json.dumps(
+            [document.normalized_hash, operation_name, variables, viewer, cache.get_versions(models)],
+            cls=DjangoJSONEncoder, sort_keys=True)
+        return 'graphql:response:{}'.format(hashlib.sha256(key.encode('utf-8')).hexdigest()), min(timeouts)
+
+    def get_viewer_class(self, request) -> str:
+        """ Class of users who get the same responses, None if responses may depend on the user """
+        user = getattr(request, 'user', None)
+
+        if user is None or not user.is_authenticated:
+            return 'anonymous'
+
+        if user.is_staff:
+            return 'staff'
+
+        return None
+
+
+class MetricsView(View):
+    """
+    Aggregates of traced operations (GRAPHQL_TRACING setting), counters of document cache and persisted queries of the
+    current process in Prometheus text format. Every document and persisted query is counted once per operation.
+    """
+    backend = None  # backend of GraphQLView if it is not the default one
+
+    def get(self, request, *args, **kwargs) -> HttpResponse:
+        return HttpResponse(tracing.registry.render() + self.render_cache_metrics(),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    def render_cache_metrics(self) -> str:
+        stats = (self.backend or get_backend()).get_stats()
+
+        with GraphQLView.persisted_query_lock:
+            persisted_query_stats = dict(GraphQLView.persisted_query_stats)
+
+        lines = []
+
+        for name, metric_type, description, samples in (
+                ('graphql_document_cache_requests_total', 'counter', 'Lookups of parsed documents by result.',
+                 [('hit', stats['hits']), ('miss', stats['misses'])]),
+                ('graphql_document_cache_size', 'gauge', 'Number of cached documents.', [(None, stats['size'])]),
+                ('graphql_persisted_queries_total', 'counter', 'Lookups of persisted queries by result.',
+                 [('hit', persisted_query_stats['hits']), ('miss', persisted_query_stats['misses'])])):
+            lines += ['# HELP {} {}'.format(name, description), '# TYPE {} {}'.format(name, metric_type)]
+            lines += ['{}{} {}'.format(name, '{{result="{}"}}'.format(result) if result else '', value)
+                      for result, value in samples]
+
+        return '\n'.join(lines) + '\n'
+
+
+class ExportView(View):
+    """
+    Streams all nodes of connection field, e.g. GET /export?field=articles&format=csv&query=graphql&sort=-pk. Other
+    parameters are arguments of the field, "columns" is comma separated list of columns (all by default), format is
+    "ndjson" (default) or "csv". Access rules of field are applied, same as for GraphQL operations.
+    """
+    chunk_size = 2000
+    schema = None
+
+    def get(self, request, *args, **kwargs):
+        tokens.authenticate(request)
+        params = request.GET.dict()
+        field_name = params.pop('field', '')
+        columns = [column for column in params.pop('columns', '').split(',') if column]
+        format = params.pop('format', 'ndjson')
+
+        try:
+            export = Export(self.schema or graphene_settings.SCHEMA, field_name, request, params, columns, format,
+                            self.chunk_size)
+        except PermissionError as error:
+            return HttpResponseForbidden(str(error))
+        except ValueError as error:
+            return HttpResponseBadRequest(str(error))
+
+        return StreamingHttpResponse(export, content_type=export.get_content_type())
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpRequest
+from django_graphql_bp.graphql.export import Export
+from django_graphql_bp.user.models import User
+from graphene_django.settings import graphene_settings
+
+
+class Command(BaseCommand):
+    help = 'Streams all nodes of connection field of GraphQL schema, e.g. articles or users, as NDJSON or CSV with ' \
+           'the same filters, search, sort and access rules as GraphQL operations.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('field', help='Name of connection field of query, e.g. articles.')
+        parser.add_argument('--arg', action='append', default=[], dest='field_args',
+                            help='Argument of field as name=value, can be repeated, e.g. --arg sort=-pk.')
+        parser.add_argument('--chunk-size', default=2000, type=int, help='Number of rows fetched from cursor at once.')
+        parser.add_argument('--columns', help='Comma separated columns, all columns of node by default.')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default='ndjson')
+        parser.add_argument('--output', help='File to write to instead of standard output.')
+        parser.add_argument('--user', help='Email of user whose access rules are applied, anonymous by default.')
+
+    def handle(self, *args, **options):
+        request = HttpRequest()
+        request.user = AnonymousUser()
+
+        if options['user']:
+            request.user = User.objects.filter(email=options['user']).first()
+
+            if request.user is None:
+                raise CommandError('User "{}" does not exist.'.format(options['user']))
+
+        for arg in options['field_args']:
+            if '=' not in arg:
+                raise CommandError('Argument "{}" should be in name=value format.'.format(arg))
+
+        try:
+            export = Export(
+                graphene_settings.SCHEMA, options['field'], request,
+                dict(arg.split('=', 1) for arg in options['field_args']),
+                options['columns'].split(',') if options['columns'] else None, options['format'],
+                options['chunk_size'])
+        except (PermissionError, ValueError) as error:
+            raise CommandError(str(error))
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as file:
+                for line in export:
+                    file.write(line)
+        else:
+            for line in export:
+                self.stdout.write(line, ending='')
@@ -1,10 +1,9 @@
 import graphene
-from django_graphql_bp.graphql.operations import connections, interfaces
+from django_graphql_bp.graphql.operations import connections, interfaces, loaders
 from django_graphql_bp.user.models import User
-from graphene_django import DjangoObjectType
 
 
-class UserNode(DjangoObjectType):
+class UserNode(loaders.DjangoBatchObjectType):
     class Meta:
         connection_class = connections.CountableConnection
         exclude_fields = ['password']
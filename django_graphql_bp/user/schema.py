@@ -1,7 +1,9 @@
 import graphene
+from django.conf import settings
 from django_graphql_bp.core.imports import UserNode
-from django_graphql_bp.graphql.operations import fields, mutations, raise_forbidden_access_error, \
-    raise_unathorized_error
+from django_graphql_bp.graphql.operations import fields, mutations, policies, raise_forbidden_access_error, \
+    raise_unathorized_error, throttling
+from django_graphql_bp.user import tokens
 from django_graphql_bp.user.forms import CreateUserForm, UpdateUserForm
 from django_graphql_bp.user.models import User
 from django.contrib.auth import login, logout
@@ -10,32 +12,18 @@ from graphql.execution.base import ResolveInfo
 
 
 class UserAccess(mutations.MutationAccess):
+    """ Only authorized user who is in staff or owner """
     model = User
-
-    @classmethod
-    def check_user_access(cls, info: ResolveInfo, input: dict, user: User):
-        if not user.pk == info.context.user.pk:
-            raise_forbidden_access_error()
-
-    @classmethod
-    def check_access(cls, info: ResolveInfo, input: dict):
-        """ Only authorized user who is in staff or owner """
-        if not info.context.user.is_authenticated:
-            raise_unathorized_error()
-
-        if not info.context.user.is_staff:
-            if cls.is_create or cls.is_update:
-                user_input = cls.get_model_from_input(info, input)
-                cls.check_user_access(info, input, user_input)
-
-            if cls.is_update or cls.is_delete:
-                user_instance = cls.get_model_from_instance(info, input)
-                cls.check_user_access(info, input, user_instance)
+    policy = policies.OwnerPolicy('pk')
 
 
 class CreateUser(mutations.MutationCreate, graphene.relay.ClientIDMutation):
     form = CreateUserForm
     node = graphene.Field(UserNode)
+    throttles = (
+        throttling.IPThrottle('create_user_ip', 10, 3600),
+        throttling.InputThrottle('create_user_email', 3, 3600),
+    )
 
     class Input:
         email = graphene.String(required=True)
@@ -69,15 +57,21 @@ class DeleteUser(UserAccess, mutations.MutationDelete, graphene.relay.ClientIDMu
 
     @classmethod
     def delete(cls, info: ResolveInfo, input: dict, instance: User):
-        instance.is_active = False
-        instance.save()
+        cls.update_instance(info, instance, is_active=False)
 
 
 class LoginUser(mutations.MutationAbstract, graphene.relay.ClientIDMutation):
+    """ Logs user in session (unless GRAPHQL_SESSION_LOGIN is False) and returns tokens, see RefreshToken """
+    access_token = graphene.String()
     node = graphene.Field(UserNode)
+    refresh_token = graphene.String()
     validation_errors = graphene.String()
 
     form = AuthenticationForm
+    throttles = (
+        throttling.IPThrottle('login_ip', 30, 60),
+        throttling.InputThrottle('login_email', 10, 600),
+    )
 
     class Input:
         email = graphene.String(required=True)
@@ -89,7 +83,7 @@ class LoginUser(mutations.MutationAbstract, graphene.relay.ClientIDMutation):
 
     @classmethod
     def validation_success(cls, form: AuthenticationForm) -> 'LoginUser':
-        return cls(ok=True, node=form.get_user())
+        return cls(ok=True, node=form.get_user(), **tokens.create_tokens(form.get_user()))
 
     @classmethod
     def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'LoginUser':
@@ -100,13 +94,16 @@ class LoginUser(mutations.MutationAbstract, graphene.relay.ClientIDMutation):
         })
 
         if form.is_valid():
-            login(info.context, form.get_user())
+            if getattr(settings, 'GRAPHQL_SESSION_LOGIN', True):
+                login(info.context, form.get_user())
+
             return cls.validation_success(form)
         else:
             return cls.validation_error(form)
 
 
 class LogoutUser(mutations.MutationAccess, graphene.relay.ClientIDMutation):
+    """ Ends session or, for request authorized by access token, revokes the token and its refresh token """
     node = graphene.Field(UserNode)
     validation_errors = graphene.String()
 
@@ -114,7 +111,10 @@ class LogoutUser(mutations.MutationAccess, graphene.relay.ClientIDMutation):
     def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'LogoutUser':
         user = info.context.user
 
-        if user.is_authenticated:
+        if isinstance(user, tokens.TokenUser):
+            tokens.revoke(user.claims)
+            user = user.get_user()
+        elif user.is_authenticated:
             logout(info.context)
         else:
             user = None
@@ -122,15 +122,55 @@ class LogoutUser(mutations.MutationAccess, graphene.relay.ClientIDMutation):
         return cls(ok=True, node=user)
 
 
+class RefreshToken(mutations.MutationAbstract, graphene.relay.ClientIDMutation):
+    """ Returns new access token and rotated refresh token, current claims of user are loaded from database """
+    access_token = graphene.String()
+    node = graphene.Field(UserNode)
+    refresh_token = graphene.String()
+
+    class Input:
+        refresh_token = graphene.String(required=True)
+
+    @classmethod
+    def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'RefreshToken':
+        super(RefreshToken, cls).mutate_and_get_payload(root, info, **input)
+        user, user_tokens = tokens.refresh_tokens(input.get('refresh_token'))
+
+        if user is None:
+            raise_unathorized_error()
+
+        return cls(ok=True, node=user, **user_tokens)
+
+
+class RevokeToken(mutations.MutationAbstract, graphene.relay.ClientIDMutation):
+    """ Revokes refresh token and access token of request if it is authorized by token """
+    class Input:
+        refresh_token = graphene.String()
+
+    @classmethod
+    def mutate_and_get_payload(cls, root, info: ResolveInfo, **input: dict) -> 'RevokeToken':
+        super(RevokeToken, cls).mutate_and_get_payload(root, info, **input)
+
+        if input.get('refresh_token'):
+            tokens.revoke_token(input.get('refresh_token'), tokens.REFRESH_TOKEN)
+
+        if isinstance(info.context.user, tokens.TokenUser):
+            tokens.revoke(info.context.user.claims)
+
+        return cls(ok=True)
+
+
 class Query:
     current_user = graphene.Field(UserNode)
-    users = fields.SearchConnectionField(UserNode, sort=graphene.Argument(graphene.String))
+    users = fields.SearchConnectionField(
+        UserNode, policy=policies.OwnerPolicy('pk'), sort=graphene.Argument(graphene.String))
 
     def resolve_current_user(self, info: ResolveInfo, **input: dict) -> User:
-        return info.context.user
+        return tokens.get_user(info.context.user)
 
     def resolve_users(self, info: ResolveInfo, **input: dict) -> [User]:
-        if info.context.user.is_staff:
+        """ Staff user gets all users, other authorized user gets own record only """
+        if info.context.user.is_authenticated:
             return User.objects.all()
 
         raise_forbidden_access_error()
@@ -143,3 +183,5 @@ class Mutation:
 
     login_user = LoginUser.Field()
     logout_user = LogoutUser.Field()
+    refresh_token = RefreshToken.Field()
+    revoke_token = RevokeToken.Field()
@@ -1,6 +1,17 @@
+import json
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django_graphql_bp.core import routers
+from django_graphql_bp.graphql.operations import TOO_MANY_REQUESTS_ERROR, throttling
 from django_graphql_bp.graphql.tests import constructors, cases
+from django_graphql_bp.graphql.views import ExportView
+from django_graphql_bp.user import tokens
 from django_graphql_bp.user.models import User
 from graphene.test import Client
+from io import StringIO
+from unittest import mock
 
 
 class UserTestCase(cases.OperationTestCase):
@@ -8,6 +19,7 @@ class UserTestCase(cases.OperationTestCase):
 
     def setUp(self):
         super(UserTestCase, self).setUp()
+        throttling.get_backend().clear()
         self.user = self.create_test_user('user', {'username': 'user'})
         self.user2 = self.create_test_user('user2', {'username': 'user2'})
         self.staff = self.create_test_user('staff', {'username': 'staff'})
@@ -44,6 +56,15 @@ class UpdateUserTestCase(UserTestCase, cases.MutationTestCase):
     def test_update_user_by_owner(self):
         self.update_success_test(self.user, 'name', self.get_context_value(self.user))
 
+    def test_update_user_by_owner_loads_user_once(self):
+        context = self.get_context_value(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assert_success(self.get_mutation_result(context, {}))
+
+        loads = [query for query in queries if query['sql'].startswith('SELECT "%s"."id"' % User._meta.db_table)]
+        self.assertEqual(len(loads), 1, 'Check if user is loaded once for access check and form')
+
     def test_update_user_by_staff(self):
         self.update_success_test(self.user, 'name', self.get_context_value(self.staff))
 
@@ -71,6 +92,7 @@ class DeleteUserTestCase(UserTestCase, cases.MutationTestCase):
 class LoginUserTestCase(UserTestCase, cases.MutationTestCase):
     def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
         return constructors.Mutation('loginUser', {
+            'accessToken': '',
             'node': {
                 'pk': ''
             },
@@ -84,6 +106,35 @@ class LoginUserTestCase(UserTestCase, cases.MutationTestCase):
         result = self.get_mutation_result(self.get_context_value(), {})
         self.assert_success(result)
         self.assertEqual(self.user.pk, self.get_node_attribute_value(result, 'pk'), 'Check if user is logged in')
+        access_token = self.get_operation_field_value(result, 'loginUser', 'accessToken')
+        self.assertEqual(self.user.pk, tokens.get_token_user(access_token).pk, 'Check if access token is issued')
+
+    @override_settings(GRAPHQL_THROTTLE_RATES={'login_email': (1, 60)})
+    def test_log_in_throttled_by_email(self):
+        self.get_mutation_result(self.get_context_value(), {'password': 'wrong'})
+
+        with mock.patch('django.contrib.auth.forms.authenticate') as authenticate:
+            result = self.get_mutation_result(self.get_context_value(), {'email': ' ' + self.user.email.upper()})
+
+        self.assert_raised_error(result, TOO_MANY_REQUESTS_ERROR)
+        self.assertFalse(authenticate.called, 'Check if password is not checked')
+
+    @override_settings(GRAPHQL_THROTTLE_RATES={'login_ip': (1, 60)})
+    def test_log_in_throttled_by_ip(self):
+        context = self.get_context_value()
+        context.META['REMOTE_ADDR'] = '192.0.2.1'
+        self.get_mutation_result(context, {})
+        self.assert_raised_error(
+            self.get_mutation_result(context, {'email': self.user2.email}), TOO_MANY_REQUESTS_ERROR)
+
+    @override_settings(GRAPHQL_THROTTLE_IP_HEADER='HTTP_X_FORWARDED_FOR', GRAPHQL_THROTTLE_RATES={'login_ip': (1, 60)})
+    def test_log_in_throttled_by_forwarded_ip(self):
+        context = self.get_context_value()
+        context.META['HTTP_X_FORWARDED_FOR'] = '198.51.100.1, 192.0.2.1'
+        self.get_mutation_result(context, {})
+        context.META['HTTP_X_FORWARDED_FOR'] = '198.51.100.2, 192.0.2.1'
+        self.assert_raised_error(
+            self.get_mutation_result(context, {'email': self.user2.email}), TOO_MANY_REQUESTS_ERROR)
 
 
 class LogoutUserTestCase(UserTestCase, cases.MutationTestCase):
@@ -100,6 +151,67 @@ class LogoutUserTestCase(UserTestCase, cases.MutationTestCase):
         self.assert_success(result)
         self.assertEqual(self.user.pk, self.get_node_attribute_value(result, 'pk'), 'Check if user is logged out')
 
+    def test_log_out_token(self):
+        user_tokens = tokens.create_tokens(self.user)
+        self.assert_success(
+            self.get_mutation_result(self.get_context_value(tokens.get_token_user(user_tokens['access_token'])), {}))
+        self.assertFalse(
+            tokens.get_token_user(user_tokens['access_token']).is_authenticated, 'Check if access token is revoked')
+        self.assertEqual(
+            (None, None), tokens.refresh_tokens(user_tokens['refresh_token']),
+            'Check if paired refresh token is revoked')
+
+
+class RefreshTokenTestCase(UserTestCase, cases.MutationTestCase):
+    def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
+        return constructors.Mutation('refreshToken', {'accessToken': '', 'ok': '', 'refreshToken': ''}, {
+            'refreshToken': kwargs.get('refresh_token', tokens.create_token(self.user, tokens.REFRESH_TOKEN))
+        })
+
+    def test_access_token(self):
+        access_token = tokens.create_token(self.staff, tokens.ACCESS_TOKEN)
+
+        with self.assertNumQueries(0):
+            user = tokens.get_token_user(access_token)
+
+        self.assertTrue(user.is_authenticated and user.is_staff, 'Check if user is authorized by token claims')
+        self.assertEqual(self.staff, tokens.get_user(user), 'Check if user is loaded by token')
+
+    def test_refresh_token(self):
+        refresh_token = tokens.create_token(self.user, tokens.REFRESH_TOKEN)
+        result = self.get_mutation_result(self.get_context_value(), {'refresh_token': refresh_token})
+        self.assert_success(result)
+        access_token = self.get_operation_field_value(result, 'refreshToken', 'accessToken')
+        self.assertEqual(self.user.pk, tokens.get_token_user(access_token).pk, 'Check if access token is issued')
+        self.assert_raised_error(
+            self.get_mutation_result(self.get_context_value(), {'refresh_token': refresh_token}),
+            self.get_unauthorized_message())
+
+    def test_refresh_token_after_password_change(self):
+        refresh_token = tokens.create_token(self.user, tokens.REFRESH_TOKEN)
+        self.user.set_password('changed_password')
+        self.user.save()
+        self.assert_raised_error(
+            self.get_mutation_result(self.get_context_value(), {'refresh_token': refresh_token}),
+            self.get_unauthorized_message())
+
+
+class RevokeTokenTestCase(UserTestCase, cases.MutationTestCase):
+    def get_mutation(self, **kwargs: dict) -> constructors.Mutation:
+        return constructors.Mutation('revokeToken', {'ok': ''}, {
+            'refreshToken': kwargs.get('refresh_token', '')
+        })
+
+    def test_revoke_token(self):
+        user_tokens = tokens.create_tokens(self.user)
+        user = tokens.get_token_user(user_tokens['access_token'])
+        self.assert_success(
+            self.get_mutation_result(self.get_context_value(user), {'refresh_token': user_tokens['refresh_token']}))
+        self.assertFalse(
+            tokens.get_token_user(user_tokens['access_token']).is_authenticated, 'Check if access token is revoked')
+        self.assertIsNone(
+            tokens.get_claims(user_tokens['refresh_token'], tokens.REFRESH_TOKEN), 'Check if refresh token is revoked')
+
 
 class CurrentUserTestCase(UserTestCase, cases.QueryTestCase):
     def get_query(self) -> constructors.Query:
@@ -120,6 +232,8 @@ class CurrentUserTestCase(UserTestCase, cases.QueryTestCase):
 
 
 class UsersTestCase(UserTestCase, cases.QueryTestCase):
+    query_budgets = {'users': 1}
+
     def get_query(self) -> constructors.Query:
         return constructors.Query('users', {
             'edges': {
@@ -133,7 +247,77 @@ class UsersTestCase(UserTestCase, cases.QueryTestCase):
         self.raised_error_test(self.get_forbidden_access_message())
 
     def test_users_by_not_staff(self):
-        self.raised_error_test(self.get_forbidden_access_message(), self.get_context_value(self.user))
+        self.collection_success_test(self.get_context_value(self.user), 1)
+        result = self.get_query_result(self.get_context_value(self.user), {})
+        self.assertEqual(
+            self.get_operation_field_value(result, 'users', 'edges')[0]['node']['pk'], self.user.pk,
+            'Check if user gets own record only')
 
     def test_users_by_staff(self):
         self.collection_success_test(self.get_context_value(self.staff))
+
+
+class UsersExportTestCase(UserTestCase):
+    def export(self, *args: str) -> str:
+        output = StringIO()
+        call_command('graphql_export', 'users', *args, stdout=output)
+        return output.getvalue()
+
+    def test_export_by_unauthorized_user(self):
+        with self.assertRaisesMessage(CommandError, self.get_forbidden_access_message()):
+            self.export()
+
+    def test_export_by_not_staff(self):
+        rows = [json.loads(line) for line in self.export('--user', self.user.email).splitlines()]
+        self.assertEqual([self.user.pk], [row['id'] for row in rows], 'Check if user gets own record only')
+        self.assertNotIn('password', rows[0], 'Check if excluded fields are not exported')
+
+    def test_export_by_staff(self):
+        lines = self.export('--user', self.staff.email, '--format', 'csv', '--columns', 'id,email', '--arg',
+                            'sort=-id').splitlines()
+        self.assertEqual(['id,email'] + ['{},{}'.format(user.pk, user.email) for user in
+                                         User.objects.order_by('-pk')], lines, 'Check if all users are exported')
+
+    def test_export_view(self):
+        request = RequestFactory().get('/export', {'field': 'users', 'email': self.user2.email})
+        request.user = self.staff
+        response = ExportView.as_view(schema=self.get_schema())(request)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([self.user2.pk], [row['id'] for row in rows], 'Check if filters are applied')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTestCase(SimpleTestCase):
+    databases = {'default'}
+
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        routers._failed.clear()
+        routers.get_sticky_cache().delete(routers.get_sticky_key('user:1'))
+
+    def get_read_aliases(self, operation_type: str, viewer: str = None, count: int = 2) -> list:
+        aliases = []
+
+        for index in range(count):
+            with routers.operation(operation_type, viewer):
+                aliases.append(self.router.db_for_read(User))
+
+        return aliases
+
+    def test_query_reads_from_replicas(self):
+        with mock.patch.object(routers, 'is_available', return_value=True):
+            self.assertEqual(['replica1', 'replica2'], sorted(self.get_read_aliases('query')),
+                             'Check if replicas are used round-robin')
+
+    def test_mutation_pins_viewer_to_primary(self):
+        with mock.patch.object(routers, 'is_available', return_value=True):
+            self.assertEqual(['default'], self.get_read_aliases('mutation', 'user:1', 1))
+            self.assertEqual(['default', 'default'], self.get_read_aliases('query', 'user:1'),
+                             'Check if viewer reads own writes from primary')
+            self.assertNotIn('default', self.get_read_aliases('query', 'user:2'), 'Check if other viewers use replicas')
+
+    @override_settings(DATABASE_REPLICAS=['replica1', 'default'])
+    def test_failed_replica_is_skipped(self):
+        routers.mark_failed('replica1')
+        self.assertEqual(['default', 'default'], self.get_read_aliases('query'))
+        self.assertEqual('default', self.router.db_for_write(User))
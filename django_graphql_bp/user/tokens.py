@@ -0,0 +1,187 @@
+import threading
+import time
+import uuid
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+from django_graphql_bp.user.models import User
+
+ACCESS_TOKEN = 'access'
+REFRESH_TOKEN = 'refresh'
+
+
+class DenyList:
+    """
+    Ids of revoked tokens of the current process kept until tokens expire, so the list stays as small as number of
+    tokens revoked within GRAPHQL_REFRESH_TOKEN_LIFETIME.
+    """
+    def __init__(self):
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self.items
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, jti: str, expires: float):
+        now = time.time()
+
+        with self.lock:
+            self.items = {key: value for key, value in self.items.items() if value > now}
+
+            if expires > now:
+                self.items[jti] = expires
+
+    def clear(self):
+        with self.lock:
+            self.items = {}
+
+
+deny_list = DenyList()
+
+
+class TokenUser(AnonymousUser):
+    """
+    User of access token built from its claims without database queries. It is enough for access checks and policies
+    (pk, is_staff and is_active), get_user() loads User instance.
+    """
+    is_anonymous = False
+    is_authenticated = True
+
+    def __init__(self, claims: dict):
+        self.claims = claims
+        self.id = self.pk = claims['pk']
+        self.is_active = claims['is_active']
+        self.is_staff = claims['is_staff']
+        self.user = None
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, (TokenUser, User)) and self.pk == other.pk
+
+    def __hash__(self) -> int:
+        return hash(self.pk)
+
+    def __str__(self) -> str:
+        return 'TokenUser {}'.format(self.pk)
+
+    def get_user(self) -> User:
+        if self.user is None:
+            self.user = User.objects.get(pk=self.pk)
+
+        return self.user
+
+
+def get_lifetime(token_type: str) -> int:
+    if token_type == ACCESS_TOKEN:
+        return getattr(settings, 'GRAPHQL_ACCESS_TOKEN_LIFETIME', 300)
+
+    return getattr(settings, 'GRAPHQL_REFRESH_TOKEN_LIFETIME', 14 * 24 * 3600)
+
+
+def get_salt(token_type: str) -> str:
+    return 'django_graphql_bp.user.tokens.{}'.format(token_type)
+
+
+def create_claims(user: User, token_type: str) -> dict:
+    claims = {
+        'exp': int(time.time()) + get_lifetime(token_type),
+        'is_active': user.is_active,
+        'is_staff': user.is_staff,
+        'jti': uuid.uuid4().hex[:16],
+        'pk': user.pk,
+    }
+
+    if token_type == REFRESH_TOKEN:
+        # changed password makes refresh tokens invalid, same as sessions
+        claims['hash'] = user.get_session_auth_hash()
+
+    return claims
+
+
+def create_token(user: User, token_type: str) -> str:
+    return sign(create_claims(user, token_type), token_type)
+
+
+def create_tokens(user: User) -> dict:
+    """ Access token of the pair keeps id of refresh token, so revoke() of access token claims revokes both """
+    refresh_claims = create_claims(user, REFRESH_TOKEN)
+    access_claims = dict(
+        create_claims(user, ACCESS_TOKEN), refresh_exp=refresh_claims['exp'], refresh_jti=refresh_claims['jti'])
+    return {'access_token': sign(access_claims, ACCESS_TOKEN), 'refresh_token': sign(refresh_claims, REFRESH_TOKEN)}
+
+
+def get_claims(token: str, token_type: str) -> dict:
+    """ Claims of valid, not expired and not revoked token, otherwise None """
+    try:
+        claims = signing.loads(token, salt=get_salt(token_type))
+    except signing.BadSignature:
+        return None
+
+    if claims['exp'] <= time.time() or claims['jti'] in deny_list:
+        return None
+
+    return claims
+
+
+def get_token_user(token: str):
+    """ TokenUser of active user by access token, otherwise AnonymousUser """
+    claims = get_claims(token, ACCESS_TOKEN)
+
+    if claims is None or not claims['is_active']:
+        return AnonymousUser()
+
+    return TokenUser(claims)
+
+
+def authenticate(request):
+    """ Request with "Authorization: Bearer <access token>" header gets user of the token instead of session one """
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+
+    if authorization.startswith('Bearer '):
+        # invalid or expired token makes request anonymous, client should refresh it
+        request.user = get_token_user(authorization[len('Bearer '):].strip())
+
+
+def get_user(user):
+    """ User instance of request user, e.g. to resolve it as node """
+    if isinstance(user, TokenUser):
+        return user.get_user()
+
+    return user
+
+
+def refresh_tokens(token: str) -> (User, dict):
+    """ Rotates refresh token: it is revoked and new pair of tokens with current claims of user is returned """
+    claims = get_claims(token, REFRESH_TOKEN)
+
+    if claims is None:
+        return None, None
+
+    user = User.objects.filter(pk=claims['pk'], is_active=True).first()
+
+    if user is None or claims['hash'] != user.get_session_auth_hash():
+        return None, None
+
+    revoke(claims)
+    return user, create_tokens(user)
+
+
+def revoke(claims: dict):
+    """ Revokes token of claims and, for access token issued in pair, its refresh token """
+    deny_list.add(claims['jti'], claims['exp'])
+
+    if 'refresh_jti' in claims:
+        deny_list.add(claims['refresh_jti'], claims['refresh_exp'])
+
+
+def sign(claims: dict, token_type: str) -> str:
+    return signing.dumps(claims, salt=get_salt(token_type), compress=True)
+
+
+def revoke_token(token: str, token_type: str):
+    claims = get_claims(token, token_type)
+
+    if claims is not None:
+        revoke(claims)
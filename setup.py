@@ -19,14 +19,17 @@ setup(
     packages=find_packages(),
     install_requires=[
         'boto3>=1.5',
-        'django>=2.0',
+        'django>=2.2',
         'django-autoslug-iplweb==1.9.4.dev0',
         'django-filter>=1.1',
-        'django-storages>=1.6',
+        'django-storages>=1.7',
         'django-uuid-upload-path>=1.0',
         'graphene-django>=2.0',
         'pillow>=5.0',
         'psycopg2-binary>=2.7'
     ],
-    python_requires='>=3'
+    extras_require={
+        'test': ['moto[s3]>=4.0,<6'],
+    },
+    python_requires='>=3.7'
 )